@@ -26,6 +26,7 @@ from datetime import datetime, timezone
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
+import http_cache
 from repo_checks import (
     build_github_headers,
     check_binary_files,
@@ -271,6 +272,8 @@ def main():
     else:
         print(report)
 
+    http_cache.print_summary()
+
 
 if __name__ == "__main__":
     main()
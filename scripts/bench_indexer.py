@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Parser throughput benchmark for bof_indexer.py.
+
+Generates a deterministic synthetic corpus of BOF repositories (README command
+tables and bullet lists, Aggressor .cna scripts, Havoc extensions, Stage1
+files and deep C source trees), then measures files/sec and entries/sec for
+each parser and for the whole parse_all_repos() pass. A parser's files are
+the ones it actually read, not the whole corpus.
+
+Usage:
+    python3 scripts/bench_indexer.py                          # temp corpus, 100 repos
+    python3 scripts/bench_indexer.py --repos 500 --scale 4
+    python3 scripts/bench_indexer.py --output baseline.json
+    python3 scripts/bench_indexer.py --compare baseline.json  # exit 1 on regression
+    python3 scripts/bench_indexer.py --generate-only /tmp/corpus
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from bof_indexer import (
+    PARSER_CLASSES,
+    RepoInfo,
+    RepoManifest,
+    clear_manifests,
+    get_manifest,
+    parse_all_repos,
+)
+
+REPO_KINDS = ["readme_table", "readme_bullet", "cna", "havoc", "stage1", "c_tree", "collection"]
+
+_VERBS = ["Enumerate", "Dump", "List", "Query", "Inject", "Spawn", "Read", "Modify", "Check", "Find"]
+_NOUNS = ["tokens", "sessions", "services", "registry keys", "LDAP objects", "ACLs",
+          "Kerberos tickets", "processes", "drivers", "shares", "scheduled tasks"]
+
+
+# =============================================================================
+# Corpus Generation
+# =============================================================================
+
+def _write(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(content)
+
+
+def _commands(rng: random.Random, count: int, prefix: str) -> list[tuple[str, str]]:
+    return [
+        (f"{prefix}_{rng.choice(_NOUNS).split()[0].lower()}{i}",
+         f"{rng.choice(_VERBS)} {rng.choice(_NOUNS)} on the target host")
+        for i in range(count)
+    ]
+
+
+def _readme_table(root: Path, rng: random.Random, scale: int) -> None:
+    rows = "".join(f"|{name}|{name} [--target host]|{desc}. See [docs](https://example.com/{name}).|\n"
+                   for name, desc in _commands(rng, 15 * scale, "tbl"))
+    prose = "Some introductory prose about the toolkit.\n\n" * (5 * scale)
+    _write(root / "README.md", f"# Toolkit\n\n{prose}|Command|Usage|Notes|\n|---|---|---|\n{rows}\n"
+                               "## Modules\n\n|**BOF**|**Use**|\n|--|--|\n"
+                               + "".join(f"|**{n}**|{d}|\n" for n, d in _commands(rng, 5 * scale, "mod")))
+
+
+def _readme_bullet(root: Path, rng: random.Random, scale: int) -> None:
+    bullets = "".join(f"- {name}: {desc}\n" for name, desc in _commands(rng, 10 * scale, "bul"))
+    _write(root / "README.md", f"# Collection\n\nAvailable BOFs:\n\n{bullets}\n- todo: not a sentence\n")
+
+
+def _cna(root: Path, rng: random.Random, scale: int) -> None:
+    for pack in range(max(1, scale)):
+        lines = []
+        for name, desc in _commands(rng, 20 * scale, f"cna{pack}"):
+            lines.append(f"# {desc}\nalias {name} {{\n    local('$barch $handle $data');\n"
+                         f"    btask($1, \"Running {name}\");\n}}\n")
+            if rng.random() < 0.6:
+                lines.append(f'beacon_command_register("{name}", "{desc}",\n'
+                             f'    "Usage: {name} [args]");\n')
+        _write(root / f"pack{pack}" / f"pack{pack}.cna", "\n".join(lines))
+
+
+def _havoc(root: Path, rng: random.Random, scale: int) -> None:
+    for mod in range(max(1, scale)):
+        body = ["from havoc import Demon, RegisterCommand, RegisterModule\n"]
+        for name, desc in _commands(rng, 10 * scale, f"hv{mod}"):
+            body.append(f"def {name}(demon_id, *args):\n    return Demon(demon_id).ConsoleWrite(0, '{name}')\n\n"
+                        f'RegisterCommand({name}, "", "{name}", "{desc}", 0, "[args]", "")\n')
+        _write(root / "havoc" / f"ext{mod}.py", "\n".join(body))
+    _write(root / "build.py", "import os\n\nprint('helper script, not havoc')\n" * (10 * scale))
+
+
+def _stage1(root: Path, rng: random.Random, scale: int) -> None:
+    for name, desc in _commands(rng, 5 * scale, "s1"):
+        _write(root / "stage1" / f"{name}_bof.s1.py",
+               f"class Bof:\n    name = '{name}'\n    description = '{desc}'\n")
+
+
+def _c_tree(root: Path, rng: random.Random, scale: int) -> None:
+    for name, desc in _commands(rng, 6 * scale, "src"):
+        depth = rng.randint(1, 2 + scale)
+        base = root.joinpath(*[f"level{d}" for d in range(depth)], name)
+        _write(base / f"{name}.c", "#include <windows.h>\n#include \"beacon.h\"\n\nvoid go(char *a, int l) {}\n")
+        for helper in range(rng.randint(0, 3)):
+            _write(base / f"helper{helper}.c", "int helper(void) { return 0; }\n")
+        if rng.random() < 0.5:
+            _write(base / "README.md", f"# {name}\n\n{desc}\n")
+        if rng.random() < 0.3:
+            _write(base / f"{name}.x64.o", "\0" * 64)
+
+
+def _collection(root: Path, rng: random.Random, scale: int) -> None:
+    for kind in ("readme_table", "cna", "havoc", "stage1", "c_tree"):
+        _GENERATORS[kind](root / kind, rng, scale)
+    _readme_table(root, rng, scale)
+
+
+_GENERATORS = {
+    "readme_table": _readme_table,
+    "readme_bullet": _readme_bullet,
+    "cna": _cna,
+    "havoc": _havoc,
+    "stage1": _stage1,
+    "c_tree": _c_tree,
+    "collection": _collection,
+}
+
+
+def generate_corpus(out_dir: str, repos: int = 100, scale: int = 1, seed: int = 1337) -> list[RepoInfo]:
+    """Write a deterministic synthetic corpus and return RepoInfo objects for it.
+
+    Repos are laid out as <out_dir>/<owner>__<name>, like the indexer's clone
+    directory, and cycle through REPO_KINDS.
+    """
+    repo_infos = []
+    for i in range(repos):
+        kind = REPO_KINDS[i % len(REPO_KINDS)]
+        owner, name = f"bench{i % 13}", f"{kind}-{i}"
+        path = Path(out_dir) / f"{owner}__{name}"
+        if not path.exists():
+            _GENERATORS[kind](path, random.Random(seed * 100003 + i), scale)
+        repo_infos.append(RepoInfo(
+            url=f"https://github.com/{owner}/{name}",
+            owner=owner,
+            name=name,
+            local_path=str(path),
+            clone_success=True,
+        ))
+    return repo_infos
+
+
+# =============================================================================
+# Measurement
+# =============================================================================
+
+def _throughput(seconds: float, files: int, entries: int) -> dict:
+    seconds = max(seconds, 1e-9)
+    return {
+        "seconds": round(seconds, 6),
+        "files": files,
+        "entries": entries,
+        "files_per_sec": round(files / seconds, 1),
+        "entries_per_sec": round(entries / seconds, 1),
+    }
+
+
+@contextmanager
+def _files_read():
+    """Collect the (repo, path) of every file read through a manifest."""
+    read = set()
+    real_open = RepoManifest._open
+
+    def counting_open(manifest, rel_path, *args, **kwargs):
+        read.add((manifest.root, rel_path))
+        return real_open(manifest, rel_path, *args, **kwargs)
+
+    RepoManifest._open = counting_open
+    try:
+        yield read
+    finally:
+        RepoManifest._open = real_open
+
+
+def run_benchmark(repos: list[RepoInfo], repeat: int = 3) -> dict:
+    """Measure each parser and the full parse pass; best of `repeat` runs."""
+    results = {}
+
+    clear_manifests()
+    started = time.perf_counter()
+    file_counts = {r.local_path: len(get_manifest(r.local_path).files) for r in repos}
+    total_files = sum(file_counts.values())
+    results["manifest"] = _throughput(time.perf_counter() - started, total_files, 0)
+
+    # Individual parsers run against warm manifests so only parsing is timed;
+    # file contents are re-read every time
+    for parser_cls in PARSER_CLASSES:
+        best, entries = None, 0
+        for _ in range(repeat):
+            for repo in repos:
+                get_manifest(repo.local_path).clear_documents()
+            parser = parser_cls()
+            count = 0
+            with _files_read() as read:
+                started = time.perf_counter()
+                for repo in repos:
+                    if parser.can_parse(repo.local_path):
+                        count += len(parser.parse(repo.local_path, repo.url))
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            entries = count
+        results[parser_cls.name] = _throughput(best, len(read), entries)
+
+    best, entries = None, 0
+    for _ in range(repeat):
+        clear_manifests()
+        with _files_read() as read:
+            started = time.perf_counter()
+            entries = len(parse_all_repos(repos))
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    results["parse_all_repos"] = _throughput(best, len(read), entries)
+
+    return results
+
+
+def compare_results(current: dict, baseline: dict, threshold: float = 0.15) -> list[str]:
+    """Return a message for every stage whose throughput dropped by more than threshold.
+
+    Entry-count changes are reported too, since they indicate parser output
+    changed rather than just speed.
+    """
+    regressions = []
+    for stage, base in baseline.get("results", baseline).items():
+        cur = current.get(stage)
+        if not cur:
+            continue
+        if cur["entries"] != base["entries"]:
+            regressions.append(f"{stage}: entry count changed {base['entries']} -> {cur['entries']}")
+        metric = "entries_per_sec" if base["entries"] else "files_per_sec"
+        if base[metric] and cur[metric] < base[metric] * (1 - threshold):
+            drop = (1 - cur[metric] / base[metric]) * 100
+            regressions.append(f"{stage}: {metric} {base[metric]:.0f} -> {cur[metric]:.0f} (-{drop:.0f}%)")
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    print(f"{'stage':<22} {'seconds':>9} {'files/s':>11} {'entries':>8} {'entries/s':>11}")
+    for stage, r in results.items():
+        print(f"{stage:<22} {r['seconds']:>9.4f} {r['files_per_sec']:>11.0f} "
+              f"{r['entries']:>8} {r['entries_per_sec']:>11.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bof_indexer parser throughput")
+    parser.add_argument("--corpus", help="Corpus directory (generated if missing; default: temp dir)")
+    parser.add_argument("--repos", type=int, default=100, help="Number of synthetic repos (default: 100)")
+    parser.add_argument("--scale", type=int, default=1, help="Size multiplier for each repo (default: 1)")
+    parser.add_argument("--seed", type=int, default=1337, help="Corpus seed (default: 1337)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, best is kept (default: 3)")
+    parser.add_argument("--output", help="Write results JSON here (use as a future --compare baseline)")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed throughput drop vs. baseline before flagging (default: 0.15)")
+    parser.add_argument("--generate-only", metavar="DIR", help="Only write the corpus to DIR and exit")
+    args = parser.parse_args()
+
+    if args.generate_only:
+        repos = generate_corpus(args.generate_only, args.repos, args.scale, args.seed)
+        print(f"Generated {len(repos)} repos in {args.generate_only}")
+        return
+
+    with tempfile.TemporaryDirectory(prefix="bof-bench-") as tmp:
+        corpus = args.corpus or tmp
+        repos = generate_corpus(corpus, args.repos, args.scale, args.seed)
+        print(f"Benchmarking {len(repos)} repos (scale {args.scale}, seed {args.seed}) in {corpus}\n",
+              file=sys.stderr)
+        results = run_benchmark(repos, args.repeat)
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "corpus": {"repos": args.repos, "scale": args.scale, "seed": args.seed},
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("corpus", {}) not in ({}, {"repos": args.repos, "scale": args.scale, "seed": args.seed}):
+            print(f"Warning: baseline corpus {baseline['corpus']} differs from this run", file=sys.stderr)
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs. {args.compare}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\nNo regressions vs. {args.compare} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,16 +14,32 @@ import re
 import json
 import subprocess
 import argparse
+import ast
+import bisect
+import fnmatch
+import functools
+import hashlib
+import io
+import mmap
+import multiprocessing
+import random
+import shutil
 import sys
+import tarfile
+import tempfile
+import threading
+import time
 import requests
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 from collections import defaultdict
 
 sys.path.insert(0, str(Path(__file__).parent))
 from sanitize import sanitize_description, sanitize_name
+import http_cache
 from typing import Optional
-from dataclasses import dataclass, field, asdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, fields, asdict, astuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 
 # =============================================================================
@@ -52,8 +68,160 @@ class RepoInfo:
     clone_success: bool = False
     bofs_found: list = field(default_factory=list)
     parse_formats_found: list = field(default_factory=list)
+    formats_detected: list = field(default_factory=list)  # parsers whose can_parse matched
+    files_skipped: list = field(default_factory=list)  # see RepoManifest.skipped
+    parsed_blobs: list = field(default_factory=list)  # see RepoManifest.parsed_blobs
     stars: int = 0
     last_updated: str = ""
+    size_kb: int = 0  # repository size reported by the GitHub API
+    head_sha: str = ""
+    clone_error: str = ""  # failure kind of the last clone attempt (classify_git_failure)
+    clone_attempts: int = 0
+    metadata_error: str = ""  # failure kind of the REST metadata lookup (_http_failure)
+    metadata_source: str = ""  # "api", "store" (MetadataStore) or "index" (existing index)
+    backoff: list = field(default_factory=list)  # stages held back by the FailureLedger
+
+
+# =============================================================================
+# Run Profiling
+# =============================================================================
+
+class RunProfile:
+    """Wall-clock timings for a single indexer run.
+
+    Records each main() step, clone time per repo, and parse time plus entry
+    count per parser per repo. Safe to update from worker threads.
+    """
+
+    def __init__(self):
+        self.stages: list[dict] = []
+        self.clones: list[dict] = []
+        self.parses: list[dict] = []
+        self._lock = threading.Lock()
+        self._current: Optional[tuple[str, float]] = None
+        self._started = time.perf_counter()
+
+    def begin(self, stage: str) -> None:
+        """Start timing a stage, ending the previous one."""
+        self.end()
+        self._current = (stage, time.perf_counter())
+
+    def end(self) -> None:
+        if self._current:
+            stage, started = self._current
+            self.stages.append({"stage": stage, "seconds": round(time.perf_counter() - started, 4)})
+            self._current = None
+
+    def record_clone(self, repo: RepoInfo, seconds: float) -> None:
+        with self._lock:
+            self.clones.append({"repository": repo.url, "seconds": round(seconds, 4),
+                                "success": repo.clone_success,
+                                "fetched": repo.clone_attempts > 0})
+
+    def record_parse(self, repo_url: str, timings: list[tuple[str, float, int]]) -> None:
+        with self._lock:
+            for parser_name, seconds, count in timings:
+                self.parses.append({"repository": repo_url, "parser": parser_name,
+                                    "seconds": round(seconds, 4), "entries": count})
+
+    def to_dict(self) -> dict:
+        self.end()
+        return {
+            "total_seconds": round(time.perf_counter() - self._started, 4),
+            "stages": self.stages,
+            "clones": self.clones,
+            "parses": self.parses,
+        }
+
+    def write(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def print_report(self, top_n: int = 10) -> None:
+        data = self.to_dict()
+        print(f"\nTiming profile ({data['total_seconds']:.1f}s total):")
+        for stage in data["stages"]:
+            print(f"  {stage['stage']}: {stage['seconds']:.2f}s")
+        slow_clones = sorted(data["clones"], key=lambda c: -c["seconds"])[:top_n]
+        if slow_clones:
+            print(f"\n  Slowest clones:")
+            for c in slow_clones:
+                status = "" if c["success"] else " (failed)"
+                print(f"    {c['seconds']:7.2f}s  {c['repository']}{status}")
+        slow_parses = sorted(data["parses"], key=lambda p: -p["seconds"])[:top_n]
+        if slow_parses:
+            print(f"\n  Slowest parser runs:")
+            for p in slow_parses:
+                print(f"    {p['seconds']:7.2f}s  {p['parser']:<20} {p['entries']:>4} entries  "
+                      f"{p['repository']}")
+
+
+class JobTimings:
+    """Clone and parse seconds per repo from earlier runs, for scheduling.
+
+    Kept in the cache dir and updated from each run's RunProfile. Only work
+    that actually ran is recorded: reused clones and cached parses keep the
+    previous figure.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        if not path:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.records = json.load(f).get("repos", {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            pass
+
+    def seconds(self, repo: RepoInfo, kind: str) -> Optional[float]:
+        """Recorded "clone" or "parse" seconds for the repo, if any."""
+        return self.records.get(repo.url.lower(), {}).get(kind)
+
+    def update(self, profile: RunProfile) -> None:
+        for clone in profile.clones:
+            if clone["success"] and clone["fetched"]:
+                self.records.setdefault(clone["repository"].lower(), {})["clone"] = clone["seconds"]
+        parse_seconds = defaultdict(float)
+        for parse in profile.parses:
+            parse_seconds[parse["repository"].lower()] += parse["seconds"]
+        for key, seconds in parse_seconds.items():
+            self.records.setdefault(key, {})["parse"] = round(seconds, 4)
+
+    def save(self, repos: list[RepoInfo]) -> None:
+        """Write the timings, dropping repos no longer in the catalog."""
+        keep = {r.url.lower() for r in repos}
+        self.records = {k: v for k, v in self.records.items() if k in keep}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"repos": self.records}, f)
+        os.replace(tmp_path, self.path)
+
+
+def longest_first(repos: list[RepoInfo], kind: str,
+                  timings: Optional[JobTimings] = None) -> list[RepoInfo]:
+    """Repos ordered by expected clone or parse cost, most expensive first.
+
+    Starting the big jobs first keeps one large repo from running alone at
+    the end of a step while the other workers sit idle. The cost is the
+    time recorded in an earlier run, else the API size scaled by the seconds
+    per KB seen for repos that have both; repos with neither count as the
+    median. The sort is stable, so without any of this the catalog order
+    is kept.
+    """
+    recorded = [timings.seconds(r, kind) if timings else None for r in repos]
+    pairs = [(s, r.size_kb) for s, r in zip(recorded, repos) if s is not None and r.size_kb]
+    per_kb = (sum(s for s, _ in pairs) / sum(kb for _, kb in pairs) if pairs
+              else 1 / CLONE_MIN_KB_PER_SECOND)
+    costs = [s if s is not None else (r.size_kb * per_kb if r.size_kb else None)
+             for s, r in zip(recorded, repos)]
+    known = sorted(c for c in costs if c is not None)
+    median = known[len(known) // 2] if known else 0.0
+    order = sorted(range(len(repos)),
+                   key=lambda i: -(costs[i] if costs[i] is not None else median))
+    return [repos[i] for i in order]
 
 
 # =============================================================================
@@ -127,52 +295,784 @@ def extract_repo_urls_from_catalog(catalog_path: str) -> list[RepoInfo]:
 # Repository Cloning
 # =============================================================================
 
-def clone_repo(repo: RepoInfo, repos_dir: str, timeout: int = 60) -> RepoInfo:
-    """Clone a single repository with depth=1."""
+CLONE_TMP_PREFIX = ".tmp-"
+
+
+def _git_env() -> dict:
+    """Environment for non-interactive git subprocesses."""
+    # Use GIT_TERMINAL_PROMPT=0 to disable authentication prompts
+    env = os.environ.copy()
+    env["GIT_TERMINAL_PROMPT"] = "0"
+    return env
+
+
+# Failure kinds worth retrying; "not_found" and "error" are not
+TRANSIENT_CLONE_FAILURES = ("timeout", "network", "rate_limited")
+
+_GIT_FAILURE_PATTERNS = [
+    ("rate_limited", re.compile(r'\b429\b|rate limit', re.IGNORECASE)),
+    ("not_found", re.compile(
+        r'not found|\b404\b|does not appear to be a git repository|does not exist'
+        r'|could not read Username|Authentication failed', re.IGNORECASE)),
+    ("network", re.compile(
+        r'Could not resolve host|Connection (reset|refused|timed out)|Operation timed out'
+        r'|early EOF|RPC failed|hung up unexpectedly|unable to access|SSL|\b50[0234]\b',
+        re.IGNORECASE)),
+]
+
+
+def classify_git_failure(stderr: str) -> str:
+    """Failure kind for a failed git clone/fetch, from its stderr.
+
+    A private, deleted or renamed GitHub repo makes git ask for credentials,
+    which counts as "not_found" like an explicit 404.
+    """
+    for kind, pattern in _GIT_FAILURE_PATTERNS:
+        if pattern.search(stderr or ""):
+            return kind
+    return "error"
+
+
+def _http_failure(status_code: int) -> str:
+    if status_code == 404:
+        return "not_found"
+    if status_code in (403, 429):
+        return "rate_limited"
+    return "network" if status_code >= 500 else "error"
+
+
+# Clone timeouts scale with the repo size the API reports (RepoInfo.size_kb)
+CLONE_TIMEOUT = 60
+CLONE_TIMEOUT_MAX = 900
+CLONE_MIN_KB_PER_SECOND = 512
+# Attempts per repo when failures are transient, and the backoff between them
+CLONE_ATTEMPTS = 3
+CLONE_RETRY_BASE_DELAY = 2.0
+CLONE_RETRY_MAX_DELAY = 60.0
+
+
+def clone_timeout(size_kb: int) -> int:
+    """Seconds to allow a clone of a repo this size (0 = unknown)."""
+    return min(CLONE_TIMEOUT_MAX, CLONE_TIMEOUT + size_kb // CLONE_MIN_KB_PER_SECOND)
+
+
+def _retry_delay(attempt: int, failure: str) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    base = CLONE_RETRY_BASE_DELAY * (4 if failure == "rate_limited" else 1)
+    return random.uniform(0, min(CLONE_RETRY_MAX_DELAY, base * 2 ** attempt))
+
+
+class AdaptiveConcurrency:
+    """Limit on in-flight clones, adjusted from throughput and failures.
+
+    A transient failure halves the limit. Otherwise, after every window of
+    completed clones the limit takes one step, keeping direction while
+    clones per second improve and reversing when they drop, so it settles
+    where adding clones stops paying off. It never exceeds `maximum`,
+    which is the size of the thread pool that runs the clones.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1):
+        self.maximum = max(maximum, 1)
+        self.minimum = min(max(minimum, 1), self.maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.lowest = self.highest = self.limit
+        self.retries = 0
+        self._in_flight = 0
+        self._next_ticket = 0
+        self._serving = 0
+        self._cond = threading.Condition()
+        self._step = 1
+        self._last_rate: Optional[float] = None
+        self._window_start = time.monotonic()
+        self._window_done = 0
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot, waiting while the limit is reached.
+
+        Slots are granted in the order they were asked for, so the order
+        jobs were submitted in (see longest_first) is kept.
+        """
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._serving or self._in_flight >= self.limit:
+                self._cond.wait()
+            self._serving += 1
+            self._in_flight += 1
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def record(self, transient_failure: bool) -> None:
+        """Report a finished attempt."""
+        with self._cond:
+            if transient_failure:
+                self.retries += 1
+                self._set_limit(self.limit // 2)
+                self._step = 1
+                self._last_rate = None
+                return
+            self._window_done += 1
+            if self._window_done >= max(self.limit, 4):
+                rate = self._window_done / max(time.monotonic() - self._window_start, 1e-6)
+                if self._last_rate is not None and rate < self._last_rate:
+                    self._step = -self._step
+                self._last_rate = rate
+                self._set_limit(self.limit + self._step)
+
+    def _set_limit(self, limit: int) -> None:
+        self.limit = min(max(limit, self.minimum), self.maximum)
+        self.lowest = min(self.lowest, self.limit)
+        self.highest = max(self.highest, self.limit)
+        self._window_start = time.monotonic()
+        self._window_done = 0
+        self._cond.notify_all()
+
+
+def sparse_checkout_patterns() -> list[str]:
+    """Sparse-checkout patterns covering every file a parser reads."""
+    patterns = []
+    for parser_cls in PARSER_CLASSES:
+        for pattern in parser_cls.checkout_patterns:
+            if pattern not in patterns:
+                patterns.append(pattern)
+    return patterns
+
+
+def _clone_into(url: str, target_path: str, timeout: int, mode: str = "full",
+                ref_name: str = "") -> str:
+    """Clone url into a temp dir next to target_path, then rename it into place.
+
+    An interrupted or timed-out clone never leaves a partial tree at
+    target_path, so an existing directory is always a complete clone.
+
+    mode="sparse" makes a blobless partial clone and checks out only the
+    files matched by sparse_checkout_patterns(); other paths stay visible to
+    the parsers through the tree listing (see RepoManifest.from_git_tree).
+    mode="bare" makes a bare clone with no working tree; the parsers read its
+    tree listing and blobs directly (see GitObjectReader). mode="shared" is a
+    bare clone that borrows objects from shared_objects (see
+    SharedObjectStore), so forks download common objects once; its HEAD is
+    kept in the store as refs/bof/<ref_name> (default: target_path's base
+    name, which callers cloning to a temp path must override). mode="tarball"
+    streams the GitHub archive instead (see _download_tarball); other hosts
+    fall back to a full clone.
+
+    Returns "" on success, otherwise the kind of failure (see
+    classify_git_failure).
+    """
+    if mode == "tarball":
+        match = GITHUB_REPO_PATTERN.match(url)
+        if match:
+            return _download_tarball(match.group(1), match.group(2), target_path, timeout)
+        mode = "full"
+    if mode == "shared":
+        return _clone_shared(url, target_path, timeout, ref_name)
+    parent = os.path.dirname(target_path)
+    tmp_path = tempfile.mkdtemp(prefix=f"{CLONE_TMP_PREFIX}{os.path.basename(target_path)}.",
+                                dir=parent)
+    clone_args = [
+        "git", "clone",
+        "--depth=1",
+        "--single-branch",
+        "--no-tags",
+        "--quiet",
+    ]
+    if mode == "sparse":
+        clone_args += ["--filter=blob:none", "--no-checkout"]
+    elif mode == "bare":
+        clone_args += ["--bare"]
+    try:
+        result = subprocess.run(
+            clone_args + [url, tmp_path],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            env=_git_env()
+        )
+        if result.returncode != 0:
+            return classify_git_failure(result.stderr)
+        if mode == "sparse":
+            # The checkout fetches only the blobs matched by the patterns
+            for sparse_args in (["sparse-checkout", "set", "--no-cone", *sparse_checkout_patterns()],
+                                ["checkout", "--quiet"]):
+                result = subprocess.run(
+                    ["git", "-C", tmp_path, *sparse_args],
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout,
+                    env=_git_env()
+                )
+                if result.returncode != 0:
+                    return classify_git_failure(result.stderr)
+        os.rename(tmp_path, target_path)
+        return ""
+    except subprocess.TimeoutExpired:
+        return "timeout"
+    except Exception:
+        return "error"
+    finally:
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+# The shared object store is repacked, and objects nothing references any
+# more are expired, at most this often (see SharedObjectStore.prune)
+SHARED_STORE_GC_DAYS = 7
+
+
+class SharedObjectStore:
+    """One bare repository whose objects every "shared" clone borrows.
+
+    A shared clone is a bare repo whose objects/info/alternates points here.
+    Its fetch offers the store's refs as haves, so objects already fetched
+    for a fork or copy are not downloaded again, and the packs it does
+    receive are then moved into the store (absorb). The store lives in the
+    cache dir, so later runs only fetch what changed upstream; prune keeps
+    it from growing without bound.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def attach(self, repo_path: str) -> None:
+        """Point a bare repo at the store. The repo also adopts the store's
+        shallow commits, without which git cannot walk borrowed history."""
+        with self._lock:
+            if not os.path.isdir(os.path.join(self.path, "objects")):
+                subprocess.run(["git", "init", "--quiet", "--bare", self.path],
+                               capture_output=True, timeout=60, check=True)
+            objects = os.path.join(os.path.abspath(self.path), "objects")
+            with open(os.path.join(repo_path, "objects", "info", "alternates"), 'w') as f:
+                f.write(objects + "\n")
+            self._merge_shallow(self.path, repo_path)
+
+    def absorb(self, repo_path: str, ref_name: str) -> None:
+        """Move a shared clone's packs into the store and keep its HEAD
+        reachable there as refs/bof/<ref_name>.
+
+        Raises subprocess.CalledProcessError if the ref cannot be set: the
+        clone would otherwise borrow objects the store may later expire.
+        """
+        with self._lock:
+            pack_dir = os.path.join(repo_path, "objects", "pack")
+            store_pack_dir = os.path.join(self.path, "objects", "pack")
+            for name in sorted(os.listdir(pack_dir)):
+                if not name.endswith(".pack"):
+                    continue
+                base = name[:-len(".pack")]
+                # The index goes last: git only uses a pack once its .idx exists
+                for ext in (".pack", ".rev", ".idx"):
+                    if os.path.exists(os.path.join(pack_dir, base + ext)):
+                        shutil.move(os.path.join(pack_dir, base + ext),
+                                    os.path.join(store_pack_dir, base + ext))
+                for ext in (".keep", ".promisor"):
+                    if os.path.exists(os.path.join(pack_dir, base + ext)):
+                        os.remove(os.path.join(pack_dir, base + ext))
+            self._merge_shallow(repo_path, self.path)
+            subprocess.run(["git", "--git-dir", self.path, "update-ref",
+                            f"refs/bof/{ref_name}", get_head_sha(repo_path)],
+                           capture_output=True, timeout=60, check=True)
+
+    def prune(self, repos: list[RepoInfo], now: Optional[float] = None) -> None:
+        """Drop the refs of repos no longer in `repos` (the catalog) and
+        trim the shallow list to the commits the remaining refs point at.
+
+        Every SHARED_STORE_GC_DAYS the store is also repacked with git gc,
+        which expires objects left unreferenced after git's usual grace
+        period, so clones still borrowing them keep working meanwhile.
+        """
+        keep = {f"refs/bof/{r.owner}__{r.name}" for r in repos}
+        now = now or time.time()
+        marker = os.path.join(self.path, "bof-last-gc")
+        with self._lock:
+            try:
+                listing = subprocess.run(
+                    ["git", "--git-dir", self.path, "for-each-ref",
+                     "--format=%(objectname) %(refname)", "refs/bof/"],
+                    capture_output=True, text=True, timeout=60, check=True)
+                tips, stale = set(), []
+                for line in listing.stdout.splitlines():
+                    sha, _, ref = line.partition(' ')
+                    if ref in keep:
+                        tips.add(sha)
+                    else:
+                        stale.append(ref)
+                if stale:
+                    subprocess.run(["git", "--git-dir", self.path, "update-ref", "--stdin"],
+                                   input="".join(f"delete {ref}\n" for ref in stale),
+                                   capture_output=True, text=True, timeout=60, check=True)
+                self._trim_shallow(tips)
+                last_gc = os.path.getmtime(marker) if os.path.exists(marker) else 0
+                collect = now - last_gc >= SHARED_STORE_GC_DAYS * 86400
+                if collect:
+                    subprocess.run(["git", "--git-dir", self.path, "gc", "--quiet"],
+                                   capture_output=True, timeout=1800, check=True)
+                    with open(marker, 'w'):
+                        pass
+                    os.utime(marker, (now, now))
+            except (subprocess.SubprocessError, OSError) as e:
+                print(f"  Shared object store: pruning failed ({e!r})")
+                return
+        print(f"  Shared object store: {len(tips)} refs kept, {len(stale)} removed"
+              + (", repacked" if collect else ""))
+
+    def _trim_shallow(self, tips: set[str]) -> None:
+        """Keep only the shallow commits that are still ref tips; the rest
+        belong to removed repos or to heads replaced by a refresh."""
+        path = os.path.join(self.path, "shallow")
+        try:
+            with open(path, 'r') as f:
+                commits = {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return
+        commits &= tips
+        if commits:
+            with open(path, 'w') as f:
+                f.write("".join(f"{sha}\n" for sha in sorted(commits)))
+        else:
+            os.remove(path)
+
+    @staticmethod
+    def _merge_shallow(source: str, target: str) -> None:
+        """Add source's shallow commits to target's."""
+        commits = set()
+        for git_dir in (source, target):
+            try:
+                with open(os.path.join(git_dir, "shallow"), 'r') as f:
+                    commits.update(line.strip() for line in f if line.strip())
+            except FileNotFoundError:
+                pass
+        if commits:
+            with open(os.path.join(target, "shallow"), 'w') as f:
+                f.write("".join(f"{sha}\n" for sha in sorted(commits)))
+
+
+# Set from --cache-dir in main()
+shared_objects = SharedObjectStore(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 ".bof-cache", "objects.git"))
+
+
+def _is_shared(repo_path: str) -> bool:
+    return os.path.exists(os.path.join(repo_path, "objects", "info", "alternates"))
+
+
+def _clone_shared(url: str, target_path: str, timeout: int, ref_name: str = "") -> str:
+    """Shallow-fetch url into a new bare repo that borrows from shared_objects.
+
+    Like _clone_into, the repo is built in a temp dir and renamed into place.
+    Its HEAD is kept in the store as refs/bof/<ref_name>, by default
+    target_path's base name.
+    """
+    tmp_path = tempfile.mkdtemp(prefix=f"{CLONE_TMP_PREFIX}{os.path.basename(target_path)}.",
+                                dir=os.path.dirname(target_path))
+    try:
+        for args in (["init", "--quiet", "--bare", "--template=", tmp_path],
+                     ["-C", tmp_path, "config", "remote.origin.url", url],
+                     ["-C", tmp_path, "symbolic-ref", "HEAD", "refs/heads/bof"]):
+            subprocess.run(["git", *args], capture_output=True, timeout=60, check=True)
+        shared_objects.attach(tmp_path)
+        # unpackLimit=1 keeps even small fetches as a pack, for absorb()
+        result = subprocess.run(
+            ["git", "-C", tmp_path, "-c", "fetch.unpackLimit=1", "fetch", "--depth=1",
+             "--no-tags", "--quiet", "origin", "+HEAD:refs/heads/bof"],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            env=_git_env()
+        )
+        if result.returncode != 0:
+            return classify_git_failure(result.stderr)
+        shared_objects.absorb(tmp_path, ref_name or os.path.basename(target_path))
+        os.rename(tmp_path, target_path)
+        return ""
+    except subprocess.TimeoutExpired:
+        return "timeout"
+    except (subprocess.SubprocessError, OSError):
+        return "error"
+    finally:
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+# Archive of the default branch's HEAD; override (e.g. a mirror or a local
+# test server) with BOF_TARBALL_URL using {owner} and {name} placeholders
+TARBALL_URL_TEMPLATE = os.environ.get(
+    "BOF_TARBALL_URL", "https://codeload.github.com/{owner}/{name}/tar.gz/HEAD")
+# Written in place of .git by tarball fetches: HEAD SHA and the full file listing
+TREE_LISTING_FILE = ".bof-tree.json"
+
+
+def _matches_checkout_patterns(rel_path: str, patterns: list[str]) -> bool:
+    """Whether rel_path is selected by sparse_checkout_patterns()-style
+    patterns ("/X" anchors at the repo root, "X" matches any base name)."""
+    name = rel_path.rsplit('/', 1)[-1]
+    for pattern in patterns:
+        if pattern.startswith('/'):
+            if fnmatch.fnmatchcase(rel_path, pattern[1:]):
+                return True
+        elif fnmatch.fnmatchcase(name, pattern):
+            return True
+    return False
+
+
+def _download_tarball(owner: str, name: str, target_path: str, timeout: int) -> str:
+    """Stream a repo's archive and keep only the files the parsers read.
+
+    The gzipped tar is read as a stream, member by member, so nothing but
+    the files matched by sparse_checkout_patterns() touches the disk. The
+    full file listing (with git blob SHAs computed from the extracted
+    contents) and the commit SHA from the archive's pax header are written
+    to TREE_LISTING_FILE for RepoManifest.from_listing and get_head_sha.
+    Like _clone_into, the tree is built in a temp dir and renamed into place.
+    """
+    url = TARBALL_URL_TEMPLATE.format(owner=owner, name=name)
+    patterns = sparse_checkout_patterns()
+    deadline = time.monotonic() + timeout
+    tmp_path = tempfile.mkdtemp(prefix=f"{CLONE_TMP_PREFIX}{os.path.basename(target_path)}.",
+                                dir=os.path.dirname(target_path))
+    try:
+        with requests.get(url, stream=True, timeout=timeout) as response:
+            if response.status_code != 200:
+                return _http_failure(response.status_code)
+            response.raw.decode_content = True
+            files = []
+            with tarfile.open(fileobj=response.raw, mode="r|gz") as archive:
+                for member in archive:
+                    if time.monotonic() > deadline:
+                        return "timeout"
+                    # Every path sits under a single "<owner>-<name>-<sha>/" directory
+                    _, _, rel = member.name.partition('/')
+                    if not _is_safe_member_path(rel) or not (member.isfile() or member.issym()) \
+                            or rel == TREE_LISTING_FILE \
+                            or any('.git' in part for part in rel.split('/')[:-1]):
+                        continue
+                    blob = ""
+                    if member.isfile() and _matches_checkout_patterns(rel, patterns):
+                        blob = _extract_member(archive, member, os.path.join(tmp_path, *rel.split('/')))
+                    files.append([rel, member.size if member.isfile() else 0, blob])
+                sha = archive.pax_headers.get("comment", "")
+        if not sha:
+            return "error"
+        with open(os.path.join(tmp_path, TREE_LISTING_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"sha": sha, "files": files}, f)
+        os.rename(tmp_path, target_path)
+        return ""
+    except requests.Timeout:
+        return "timeout"
+    except requests.RequestException:
+        return "network"
+    except (tarfile.TarError, OSError, EOFError):
+        return "error"
+    finally:
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _is_safe_member_path(rel: str) -> bool:
+    """Whether an archive member path stays inside the directory it is
+    extracted to (no absolute paths or ".." components)."""
+    if not rel or rel.startswith('/') or '\\' in rel:
+        return False
+    normalized = os.path.normpath(rel)
+    return normalized != '..' and not normalized.startswith('../') and normalized != '.'
+
+
+def _extract_member(archive: tarfile.TarFile, member: tarfile.TarInfo, path: str) -> str:
+    """Write one archive member to path; returns its git blob SHA."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    blob = hashlib.sha1(f"blob {member.size}\0".encode())
+    source = archive.extractfile(member)
+    with open(path, 'wb') as f:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            blob.update(chunk)
+            f.write(chunk)
+    return blob.hexdigest()
+
+
+def clone_repo(repo: RepoInfo, repos_dir: str, timeout: Optional[int] = None,
+               mode: str = "full") -> RepoInfo:
+    """Clone a single repository with depth=1.
+
+    An existing clone is reused as-is; a directory that is not a valid clone
+    (e.g. left behind by an older interrupted run) is replaced. The timeout
+    defaults to clone_timeout() for the repo's size.
+    """
     local_path = os.path.join(repos_dir, f"{repo.owner}__{repo.name}")
     repo.local_path = local_path
+    repo.clone_error = ""
+    timeout = timeout or clone_timeout(repo.size_kb)
     
     if os.path.exists(local_path):
-        repo.clone_success = True
-        return repo
+        repo.head_sha = get_head_sha(local_path)
+        # A shared clone is only usable while the store it borrows from exists
+        if repo.head_sha and not (_is_shared(local_path)
+                                  and not os.path.isdir(shared_objects.path)):
+            repo.clone_success = True
+            return repo
+        shutil.rmtree(local_path, ignore_errors=True)
+    
+    repo.clone_attempts += 1
+    repo.clone_error = _clone_into(repo.url, local_path, timeout, mode)
+    repo.clone_success = not repo.clone_error
+    if repo.clone_success:
+        repo.head_sha = get_head_sha(local_path)
     
+    return repo
+
+
+def _is_bare(repo_path: str) -> bool:
+    """Whether repo_path is a bare clone (--fetch-mode bare)."""
+    return (os.path.isfile(os.path.join(repo_path, "HEAD"))
+            and os.path.isdir(os.path.join(repo_path, "objects")))
+
+
+def _git_dir(repo_path: str) -> str:
+    """The git directory of a clone (the clone itself when bare), or "" if
+    repo_path is not a clone (e.g. a tarball fetch)."""
+    if os.path.exists(os.path.join(repo_path, ".git")):
+        return os.path.join(repo_path, ".git")
+    return repo_path if _is_bare(repo_path) else ""
+
+
+def get_head_sha(repo_path: str) -> str:
+    """Return the HEAD commit SHA of a local clone, or "" if unavailable."""
+    # Pass the git dir explicitly; `git -C` would resolve HEAD of an
+    # enclosing repository when repo_path is not a clone.
+    git_dir = _git_dir(repo_path)
+    if not git_dir:
+        try:
+            # A tarball fetch (see _download_tarball)
+            with open(os.path.join(repo_path, TREE_LISTING_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f).get("sha", "")
+        except (OSError, ValueError, AttributeError):
+            return ""
     try:
-        # Use GIT_TERMINAL_PROMPT=0 to disable authentication prompts
-        env = os.environ.copy()
-        env["GIT_TERMINAL_PROMPT"] = "0"
-        
         result = subprocess.run(
-            [
-                "git", "clone",
-                "--depth=1",
-                "--single-branch",
-                "--no-tags",
-                "--quiet",
-                repo.url,
-                local_path
-            ],
+            ["git", "--git-dir", git_dir, "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+    except Exception:
+        return ""
+    if result.returncode != 0:
+        return ""
+    return result.stdout.strip()
+
+
+def get_remote_head_sha(url: str, timeout: int = 30) -> str:
+    """Return the SHA the remote's HEAD points at, or "" if the probe failed."""
+    try:
+        result = subprocess.run(
+            ["git", "ls-remote", url, "HEAD"],
             capture_output=True,
             text=True,
             timeout=timeout,
-            env=env
+            env=_git_env()
         )
-        repo.clone_success = result.returncode == 0
-    except subprocess.TimeoutExpired:
-        repo.clone_success = False
     except Exception:
-        repo.clone_success = False
-    
+        return ""
+    if result.returncode != 0:
+        return ""
+    for line in result.stdout.splitlines():
+        sha, _, ref = line.partition("\t")
+        if ref == "HEAD":
+            return sha.strip()
+    return ""
+
+
+def refresh_repo(repo: RepoInfo, remote_sha: str, timeout: Optional[int] = None,
+                 mode: str = "full") -> RepoInfo:
+    """Bring an existing clone up to the remote HEAD.
+
+    Tries a shallow fetch and hard reset first; if that fails (e.g. the
+    default branch was renamed) the repo is re-cloned and swapped in
+    atomically. The stale clone is kept when both attempts fail.
+    """
+    timeout = timeout or clone_timeout(repo.size_kb)
+    env = _git_env()
+    bare = _is_bare(repo.local_path)
+    shared = bare and _is_shared(repo.local_path)
+    # A tarball fetch has no git dir to fetch into and is always downloaded again
+    if _git_dir(repo.local_path):
+        try:
+            if shared:
+                shared_objects.attach(repo.local_path)
+            fetch = subprocess.run(
+                ["git", "-C", repo.local_path, "-c", "fetch.unpackLimit=1", "fetch",
+                 "--depth=1", "--no-tags", "--quiet", "origin", "HEAD"],
+                capture_output=True, text=True, timeout=timeout, env=env
+            )
+            if fetch.returncode == 0:
+                # A bare clone only needs its branch moved; there is no tree to reset
+                update_args = (["update-ref", "HEAD", "FETCH_HEAD"] if bare
+                               else ["reset", "--hard", "--quiet", "FETCH_HEAD"])
+                update = subprocess.run(
+                    ["git", "-C", repo.local_path, *update_args],
+                    capture_output=True, text=True, timeout=timeout, env=env
+                )
+                if update.returncode == 0:
+                    if not bare:
+                        subprocess.run(
+                            ["git", "-C", repo.local_path, "clean", "-ffdxq"],
+                            capture_output=True, text=True, timeout=timeout, env=env
+                        )
+                    if shared:
+                        shared_objects.absorb(repo.local_path,
+                                              os.path.basename(repo.local_path))
+                    repo.head_sha = get_head_sha(repo.local_path)
+                    if repo.head_sha == remote_sha:
+                        return repo
+        except subprocess.SubprocessError:
+            pass  # timed out, or absorb could not keep the new HEAD; re-clone
+
+    repos_dir, dir_name = os.path.split(repo.local_path)
+    fresh_path = os.path.join(repos_dir, f"{CLONE_TMP_PREFIX}new-{dir_name}")
+    shutil.rmtree(fresh_path, ignore_errors=True)
+    # The store ref is named after the final path, not the temp one
+    if not _clone_into(repo.url, fresh_path, timeout, mode, ref_name=dir_name):
+        stale_path = os.path.join(repos_dir, f"{CLONE_TMP_PREFIX}old-{dir_name}")
+        os.rename(repo.local_path, stale_path)
+        os.rename(fresh_path, repo.local_path)
+        shutil.rmtree(stale_path, ignore_errors=True)
+    repo.head_sha = get_head_sha(repo.local_path)
+    return repo
+
+
+def refresh_stale_clones(repos: list[RepoInfo], max_workers: int = 8,
+                         mode: str = "full") -> list[RepoInfo]:
+    """Probe remotes with git ls-remote and update clones whose HEAD moved."""
+    print(f"Checking {len(repos)} existing clones for upstream changes...")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        remote_shas = list(executor.map(lambda r: get_remote_head_sha(r.url), repos))
+
+    stale = [(repo, sha) for repo, sha in zip(repos, remote_shas)
+             if sha and sha != repo.head_sha]
+    unreachable = sum(1 for sha in remote_shas if not sha)
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda item: refresh_repo(*item, mode=mode), stale))
+
+    updated = sum(1 for repo, sha in stale if repo.head_sha == sha)
+    print(f"  {len(stale)} clones behind upstream, {updated} updated"
+          + (f", {unreachable} remotes unreachable (kept existing clone)" if unreachable else ""))
+    return repos
+
+
+def _remove_stale_temp_dirs(repos_dir: str) -> None:
+    """Delete temp clone dirs left behind by a killed run."""
+    for entry in os.listdir(repos_dir):
+        if entry.startswith(CLONE_TMP_PREFIX):
+            shutil.rmtree(os.path.join(repos_dir, entry), ignore_errors=True)
+
+
+def _timed_clone(repo: RepoInfo, repos_dir: str, mode: str,
+                 profile: Optional[RunProfile],
+                 limiter: Optional[AdaptiveConcurrency] = None) -> RepoInfo:
+    """Clone one repo, retrying transient failures with jittered backoff.
+
+    Each attempt holds a limiter slot and reports its outcome to it; the
+    backoff wait does not. A retry after a timeout gets twice the time.
+    """
+    started = time.perf_counter()
+    timeout = clone_timeout(repo.size_kb)
+    repo.clone_attempts = 0
+    for attempt in range(CLONE_ATTEMPTS):
+        if attempt:
+            if repo.clone_error == "timeout":
+                timeout = min(timeout * 2, CLONE_TIMEOUT_MAX)
+            time.sleep(_retry_delay(attempt, repo.clone_error))
+        with limiter.slot() if limiter else nullcontext():
+            clone_repo(repo, repos_dir, timeout=timeout, mode=mode)
+        transient = repo.clone_error in TRANSIENT_CLONE_FAILURES
+        if limiter:
+            limiter.record(transient)
+        if not transient:
+            break
+    if profile:
+        profile.record_clone(repo, time.perf_counter() - started)
     return repo
 
 
-def clone_all_repos(repos: list[RepoInfo], repos_dir: str, max_workers: int = 8) -> list[RepoInfo]:
-    """Clone all repositories in parallel."""
+def print_clone_summary(repos: list[RepoInfo], limiter: AdaptiveConcurrency) -> None:
+    """Failures by kind, retries and how the clone concurrency moved."""
+    failures = defaultdict(int)
+    for repo in repos:
+        if repo.clone_error:
+            failures[repo.clone_error] += 1
+    if failures:
+        print("  Failed: " + ", ".join(f"{n} {kind}" for kind, n in sorted(failures.items())))
+    recovered = sum(1 for r in repos if r.clone_success and r.clone_attempts > 1)
+    print(f"  Concurrency {limiter.lowest}-{limiter.highest} (ended at {limiter.limit}), "
+          f"{limiter.retries} transient failures retried, {recovered} repos recovered")
+
+
+def use_local_clone(repo: RepoInfo, repos_dir: str) -> RepoInfo:
+    """Point repo at an existing clone without touching the network (--skip-clone)."""
+    repo.local_path = os.path.join(repos_dir, f"{repo.owner}__{repo.name}")
+    repo.clone_success = os.path.exists(repo.local_path)
+    if repo.clone_success:
+        repo.head_sha = get_head_sha(repo.local_path)
+    return repo
+
+
+def fetch_repo(repo: RepoInfo, repos_dir: str, mode: str = "full", refresh: bool = False,
+               profile: Optional[RunProfile] = None,
+               limiter: Optional[AdaptiveConcurrency] = None) -> RepoInfo:
+    """Clone one repo, or with refresh=True bring an existing clone up to date.
+
+    Per-repo equivalent of clone_all_repos() for callers that want to act on
+    each clone as soon as it lands.
+    """
+    existed = os.path.exists(os.path.join(repos_dir, f"{repo.owner}__{repo.name}"))
+    _timed_clone(repo, repos_dir, mode, profile, limiter)
+    if refresh and existed and repo.clone_success:
+        remote_sha = get_remote_head_sha(repo.url)
+        if remote_sha and remote_sha != repo.head_sha:
+            refresh_repo(repo, remote_sha, mode=mode)
+    return repo
+
+
+def clone_all_repos(repos: list[RepoInfo], repos_dir: str, max_workers: int = 8,
+                    refresh: bool = False, mode: str = "full",
+                    profile: Optional[RunProfile] = None,
+                    timings: Optional[JobTimings] = None) -> list[RepoInfo]:
+    """Clone all repositories in parallel.
+
+    With refresh=True, clones that already existed before this run are
+    checked against their remote HEAD and updated in place when stale.
+    mode selects the clone style for new clones ("full", "sparse", "bare",
+    "shared" or "tarball").
+
+    max_workers is the starting concurrency; it adapts between 1 and twice
+    that (see AdaptiveConcurrency), and transient failures are retried.
+    Clones are started longest first (see longest_first). Repos held back
+    by the FailureLedger are left alone.
+    """
     os.makedirs(repos_dir, exist_ok=True)
+    _remove_stale_temp_dirs(repos_dir)
+    existing = {r.url for r in repos
+                if os.path.exists(os.path.join(repos_dir, f"{r.owner}__{r.name}"))}
+    all_repos = repos
+    repos = [r for r in repos if "clone" not in r.backoff]
     
     print(f"Cloning {len(repos)} repositories to {repos_dir}...")
     
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(clone_repo, repo, repos_dir): repo for repo in repos}
+    limiter = AdaptiveConcurrency(max_workers, maximum=max_workers * 2)
+    with ThreadPoolExecutor(max_workers=limiter.maximum) as executor:
+        futures = {executor.submit(_timed_clone, repo, repos_dir, mode, profile, limiter): repo
+                   for repo in longest_first(repos, "clone", timings)}
         
         completed = 0
         for future in as_completed(futures):
@@ -182,8 +1082,14 @@ def clone_all_repos(repos: list[RepoInfo], repos_dir: str, max_workers: int = 8)
     
     successful = sum(1 for r in repos if r.clone_success)
     print(f"Successfully cloned {successful}/{len(repos)} repositories")
+    print_clone_summary(repos, limiter)
+
+    if refresh:
+        warm = [r for r in repos if r.clone_success and r.url in existing]
+        if warm:
+            refresh_stale_clones(warm, max_workers=max_workers, mode=mode)
     
-    return repos
+    return all_repos
 
 
 class RateLimitError(Exception):
@@ -193,17 +1099,18 @@ class RateLimitError(Exception):
 
 # Thread-safe flag to signal rate limiting across all workers
 _rate_limited = False
-_rate_limit_lock = __import__('threading').Lock()
+_rate_limit_lock = threading.Lock()
 
 
 def fetch_repo_metadata(repo: RepoInfo, token: str = "") -> RepoInfo:
-    """Fetch repository stars and last-updated date from GitHub API."""
+    """Fetch repository stars, last-updated date and size from GitHub API."""
     global _rate_limited
     if "github.com/" not in repo.url:
         return repo
 
     # Skip if we've already been rate-limited
     if _rate_limited:
+        repo.metadata_error = "rate_limited"
         return repo
 
     headers = {"Accept": "application/vnd.github+json"}
@@ -212,7 +1119,7 @@ def fetch_repo_metadata(repo: RepoInfo, token: str = "") -> RepoInfo:
 
     api_url = f"https://api.github.com/repos/{repo.owner}/{repo.name}"
     try:
-        response = requests.get(api_url, headers=headers, timeout=20)
+        response = http_cache.get(api_url, headers=headers, timeout=20)
         if response.status_code == 403:
             remaining = response.headers.get("x-ratelimit-remaining", "")
             if remaining == "0":
@@ -222,22 +1129,66 @@ def fetch_repo_metadata(repo: RepoInfo, token: str = "") -> RepoInfo:
                         reset_ts = response.headers.get("x-ratelimit-reset", "")
                         reset_info = ""
                         if reset_ts:
-                            import time as _time
-                            reset_info = f" (resets at {_time.strftime('%H:%M:%S', _time.localtime(int(reset_ts)))})"
+                            reset_info = f" (resets at {time.strftime('%H:%M:%S', time.localtime(int(reset_ts)))})"
                         print(f"\n  WARNING: GitHub API rate limit hit{reset_info}. "
                               f"Set GITHUB_TOKEN env var for 5000 req/hr.", file=sys.stderr)
+                repo.metadata_error = "rate_limited"
                 return repo
         if response.status_code != 200:
+            repo.metadata_error = _http_failure(response.status_code)
             return repo
         data = response.json()
         repo.stars = int(data.get("stargazers_count", 0) or 0)
         repo.last_updated = (data.get("pushed_at") or "")[:10]
+        repo.size_kb = int(data.get("size", 0) or 0)
+        repo.metadata_source = "api"
     except Exception:
+        repo.metadata_error = "network"
         return repo
 
     return repo
 
 
+GRAPHQL_URL = "https://api.github.com/graphql"
+GRAPHQL_BATCH_SIZE = 100
+
+
+def fetch_metadata_batch(repos: list[RepoInfo], token: str) -> list[RepoInfo]:
+    """Fetch stars/last-updated/size for up to GRAPHQL_BATCH_SIZE repos in one GraphQL query.
+
+    Each repo is requested through an aliased repository() field. Returns
+    the repos that could not be resolved (missing, renamed, or the whole
+    request failed) so the caller can retry them over REST.
+    """
+    fields = []
+    for i, repo in enumerate(repos):
+        # JSON string literals are valid GraphQL string literals
+        fields.append(f"r{i}: repository(owner: {json.dumps(repo.owner)}, "
+                      f"name: {json.dumps(repo.name)}) {{ stargazerCount pushedAt diskUsage }}")
+    query = "query {\n  " + "\n  ".join(fields) + "\n}"
+    headers = {"Authorization": f"Bearer {token}"}
+
+    try:
+        response = requests.post(GRAPHQL_URL, json={"query": query}, headers=headers, timeout=30)
+        if response.status_code != 200:
+            return list(repos)
+        data = response.json().get("data") or {}
+    except Exception:
+        return list(repos)
+
+    failed = []
+    for i, repo in enumerate(repos):
+        node = data.get(f"r{i}")
+        if not node:
+            failed.append(repo)
+            continue
+        repo.stars = int(node.get("stargazerCount", 0) or 0)
+        repo.last_updated = (node.get("pushedAt") or "")[:10]
+        repo.size_kb = int(node.get("diskUsage", 0) or 0)
+        repo.metadata_source = "api"
+    return failed
+
+
 def load_existing_metadata(index_path: str) -> dict[str, tuple[int, str]]:
     """Load stars/last-updated from an existing bof-index.json as fallback."""
     meta = {}
@@ -259,9 +1210,91 @@ def load_existing_metadata(index_path: str) -> dict[str, tuple[int, str]]:
     return meta
 
 
+# A repo's metadata is refreshed once its TTL has passed. The TTL follows
+# activity: a repo last pushed N days ago is refreshed every
+# N * METADATA_TTL_FACTOR days, within the bounds below.
+METADATA_TTL_FACTOR = 0.1
+METADATA_TTL_MIN_DAYS = 1.0
+METADATA_TTL_MAX_DAYS = 30.0
+
+
+class MetadataStore:
+    """Stars, last-updated date and size per repo, with when they were fetched.
+
+    Lets a run look up only the repos whose metadata is due (see due_at)
+    instead of the whole catalog.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                records = json.load(f).get("repos", {})
+            if isinstance(records, dict):
+                self.records = records
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            pass
+
+    def _record(self, repo: RepoInfo) -> Optional[dict]:
+        """The repo's stored record, or None if it has none or it is malformed."""
+        record = self.records.get(repo.url.lower())
+        if not isinstance(record, dict) or not isinstance(record.get("fetched_at"), (int, float)):
+            return None
+        return record
+
+    def due_at(self, repo: RepoInfo) -> float:
+        """When the repo's metadata should next be fetched (0 = never fetched)."""
+        record = self._record(repo)
+        if not record:
+            return 0.0
+        fetched_at = record["fetched_at"]
+        try:
+            pushed = time.mktime(time.strptime(record.get("last_updated", ""), "%Y-%m-%d"))
+            idle_days = max(fetched_at - pushed, 0) / 86400
+        except (TypeError, ValueError):
+            idle_days = 0
+        ttl = min(max(idle_days * METADATA_TTL_FACTOR, METADATA_TTL_MIN_DAYS),
+                  METADATA_TTL_MAX_DAYS)
+        return fetched_at + ttl * 86400
+
+    def restore(self, repo: RepoInfo) -> bool:
+        record = self._record(repo)
+        if not record:
+            return False
+        repo.stars = record.get("stars", 0)
+        repo.last_updated = record.get("last_updated", "")
+        repo.size_kb = record.get("size_kb", 0)
+        repo.metadata_source = "store"
+        return True
+
+    def put(self, repo: RepoInfo, now: Optional[float] = None) -> None:
+        self.records[repo.url.lower()] = {
+            "stars": repo.stars, "last_updated": repo.last_updated,
+            "size_kb": repo.size_kb, "fetched_at": int(now or time.time()),
+        }
+
+    def save(self, repos: list[RepoInfo]) -> None:
+        """Write the store, dropping repos no longer in the catalog."""
+        keep = {r.url.lower() for r in repos}
+        self.records = {k: v for k, v in self.records.items() if k in keep}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"repos": self.records}, f)
+        os.replace(tmp_path, self.path)
+
+
 def enrich_repo_metadata(repos: list[RepoInfo], max_workers: int = 12,
-                         existing_index_path: str = "") -> list[RepoInfo]:
-    """Enrich repository list with stars/last-updated data."""
+                         existing_index_path: str = "",
+                         store: Optional[MetadataStore] = None,
+                         budget: int = 0) -> list[RepoInfo]:
+    """Enrich repository list with stars/last-updated/size data.
+
+    With a store, only repos whose metadata is due are looked up, at most
+    `budget` of them (most overdue first) when budget > 0; the rest keep
+    their stored values.
+    """
     global _rate_limited
     _rate_limited = False
 
@@ -274,8 +1307,39 @@ def enrich_repo_metadata(repos: list[RepoInfo], max_workers: int = 12,
     if not token:
         print("  Note: GITHUB_TOKEN not set; stars/updated metadata may be incomplete")
 
+    # GraphQL requires authentication; batch what we can and fall back to
+    # one REST call per repo for the rest. Repos the FailureLedger holds back
+    # are not looked up and keep their stored metadata (or the existing index's).
+    rest_repos = [r for r in repos if "metadata" not in r.backoff]
+    if store:
+        for repo in repos:
+            if "metadata" in repo.backoff:
+                store.restore(repo)
+        now = time.time()
+        github = [r for r in rest_repos if "github.com/" in r.url]
+        due = sorted((r for r in github if store.due_at(r) <= now), key=store.due_at)
+        deferred = due[budget:] if budget > 0 else []
+        due = due[:len(due) - len(deferred)]
+        due_ids = {id(r) for r in due}
+        for repo in github:
+            if id(repo) not in due_ids:
+                store.restore(repo)
+        print(f"  Metadata store: {len(github) - len(due) - len(deferred)} repos still fresh, "
+              f"{len(due)} due"
+              + (f", {len(deferred)} deferred to later runs (budget {budget})" if deferred else ""))
+        rest_repos = due
+    if token:
+        github_repos = [r for r in rest_repos if "github.com/" in r.url]
+        failed = []
+        for start in range(0, len(github_repos), GRAPHQL_BATCH_SIZE):
+            failed.extend(fetch_metadata_batch(github_repos[start:start + GRAPHQL_BATCH_SIZE], token))
+        batches = -(-len(github_repos) // GRAPHQL_BATCH_SIZE)
+        print(f"  GraphQL: {len(github_repos) - len(failed)}/{len(github_repos)} repos "
+              f"in {batches} requests")
+        rest_repos = failed
+
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(fetch_repo_metadata, repo, token): repo for repo in repos}
+        futures = {executor.submit(fetch_repo_metadata, repo, token): repo for repo in rest_repos}
         completed = 0
         for future in as_completed(futures):
             completed += 1
@@ -284,7 +1348,16 @@ def enrich_repo_metadata(repos: list[RepoInfo], max_workers: int = 12,
             except Exception:
                 pass
             if completed % 50 == 0:
-                print(f"  Metadata progress: {completed}/{len(repos)} repos")
+                print(f"  Metadata progress: {completed}/{len(rest_repos)} repos")
+
+    if store:
+        for repo in repos:
+            if repo.metadata_source == "api":
+                store.put(repo)
+        # A failed lookup keeps the last values fetched rather than the index's
+        restored = sum(store.restore(r) for r in due if r.metadata_source != "api")
+        if restored:
+            print(f"  Kept stored metadata for {restored} repos whose lookup failed")
 
     # Fill in missing metadata from existing index
     fallback_used = 0
@@ -294,6 +1367,7 @@ def enrich_repo_metadata(repos: list[RepoInfo], max_workers: int = 12,
             if existing[0] or existing[1]:
                 repo.stars = existing[0]
                 repo.last_updated = existing[1]
+                repo.metadata_source = "index"
                 fallback_used += 1
 
     enriched = sum(1 for r in repos if r.stars > 0 or r.last_updated)
@@ -307,6 +1381,782 @@ def enrich_repo_metadata(repos: list[RepoInfo], max_workers: int = 12,
     return repos
 
 
+# =============================================================================
+# Repository File Manifest
+# =============================================================================
+
+@dataclass
+class ManifestFile:
+    """A single file in a repository manifest."""
+    path: str  # relative to the repo root, "/"-separated
+    size: int
+    ext: str   # final suffix including the dot, case preserved (e.g. ".cna")
+    blob: str = ""  # git blob SHA; "" for untracked files or outside a clone
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def dir(self) -> str:
+        return self.path.rsplit('/', 1)[0] if '/' in self.path else ""
+
+
+def _env_megabytes(name: str, default: float) -> int:
+    try:
+        return int(float(os.environ.get(name, default)) * 1024 * 1024)
+    except ValueError:
+        return int(default * 1024 * 1024)
+
+
+# Limits on how much of a repository the parsers read (see RepoManifest.read_text)
+BINARY_SNIFF_BYTES = 8192
+MAX_FILE_BYTES = _env_megabytes("BOF_MAX_FILE_MB", 2)
+MAX_REPO_BYTES = _env_megabytes("BOF_MAX_REPO_MB", 64)
+
+
+def decode_text(data: bytes) -> str:
+    """Decode file bytes the way open(..., errors='ignore') in text mode does."""
+    return data.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+
+
+@functools.lru_cache(maxsize=None)
+def bytes_pattern(pattern: re.Pattern) -> re.Pattern:
+    """The bytes equivalent of a str regex, for scanning memory-mapped files."""
+    return re.compile(pattern.pattern.encode('utf-8'), pattern.flags & ~re.UNICODE)
+
+
+def group_text(match: Optional[re.Match], group: int = 1) -> str:
+    """A match group as str ("" if absent), for str and bytes patterns alike."""
+    value = match.group(group) if match else None
+    if value is None:
+        return ""
+    return decode_text(value) if isinstance(value, bytes) else value
+
+
+class RepoManifest:
+    """Listing of a repo's files built from a single directory walk.
+
+    Parsers query the manifest by extension, glob or exact path instead of
+    walking the tree themselves. Directories whose name contains ".git"
+    (.git, .github, ...) are excluded, matching what the parsers always
+    skipped. Files are kept in walk order so parser output stays stable.
+    """
+
+    def __init__(self, root: str, files: list[ManifestFile],
+                 object_store: Optional["GitObjectReader"] = None):
+        self.root = root
+        self.files = files
+        # Bare clones have no files on disk; contents come from the object store
+        self.object_store = object_store
+        self._paths = {f.path for f in files}
+        self._sizes = {f.path: f.size for f in files}
+        self._blobs = {f.path: f.blob for f in files if f.blob}
+        self._by_ext: dict[str, list[ManifestFile]] = defaultdict(list)
+        for f in files:
+            self._by_ext[f.ext].append(f)
+        self._documents: dict[str, Optional["MarkdownDocument"]] = {}
+        self._memo: dict[str, object] = {}
+        # Files not (fully) decoded, by path: {"path", "reason", "bytes"}
+        self.skipped: dict[str, dict] = {}
+        self.bytes_decoded = 0
+        # Set by parse_repo when per-file results may be shared (see extract)
+        self.blob_cache: Optional["BlobCache"] = None
+        self.parsed_blobs: set[str] = set()
+        self.blob_hits = 0
+        self.blob_misses = 0
+
+    @classmethod
+    def from_directory(cls, root: str) -> "RepoManifest":
+        blobs = cls._index_blobs(root)
+        files = []
+        for dir_path, dirs, names in os.walk(root):
+            dirs[:] = [d for d in dirs if '.git' not in d]
+            rel_dir = os.path.relpath(dir_path, root).replace(os.sep, '/')
+            for name in names:
+                rel = name if rel_dir == '.' else f"{rel_dir}/{name}"
+                try:
+                    size = os.path.getsize(os.path.join(dir_path, name))
+                except OSError:
+                    size = 0
+                ext = name[name.rfind('.'):] if '.' in name else ""
+                files.append(ManifestFile(path=rel, size=size, ext=ext, blob=blobs.get(rel, "")))
+        return cls(root, files)
+
+    @staticmethod
+    def _index_blobs(root: str) -> dict[str, str]:
+        """Blob SHA of every regular file in a clone's index ({} if not a clone)."""
+        if not os.path.exists(os.path.join(root, ".git")):
+            return {}
+        try:
+            result = subprocess.run(
+                ["git", "-C", root, "ls-files", "-s", "-z"],
+                capture_output=True,
+                timeout=60
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return {}
+        blobs = {}
+        for record in result.stdout.decode('utf-8', errors='replace').split('\0'):
+            # "<mode> <sha> <stage>\t<path>"; symlinks and submodules are left out
+            info, _, rel = record.partition('\t')
+            fields = info.split(' ')
+            if rel and len(fields) == 3 and fields[0] in ('100644', '100755'):
+                blobs[rel] = fields[1]
+        return blobs
+
+    @classmethod
+    def from_git_tree(cls, root: str, bare: bool = False) -> "RepoManifest":
+        """Build the manifest from HEAD's tree rather than the working tree.
+
+        Used for sparse checkouts, where most paths are tracked but not
+        materialized; such files are listed with size 0. With bare=True the
+        repo has no working tree at all: sizes come from the tree listing
+        and contents are read through a GitObjectReader.
+        """
+        result = subprocess.run(
+            ["git", "--git-dir", _git_dir(root), "ls-tree", "-r", "-z"]
+            + (["-l"] if bare else []) + ["HEAD"],
+            capture_output=True,
+            timeout=60
+        )
+        files = []
+        for record in result.stdout.decode('utf-8', errors='replace').split('\0'):
+            info, _, rel = record.partition('\t')
+            # "<mode> <type> <sha>[ <size>]"; with -l the size is space-padded
+            fields = info.split()
+            if not rel or fields[1:2] != ['blob']:
+                continue
+            if any('.git' in part for part in rel.split('/')[:-1]):
+                continue
+            name = rel.rsplit('/', 1)[-1]
+            if bare:
+                size = int(fields[3]) if fields[3:4] and fields[3].isdigit() else 0
+            else:
+                try:
+                    size = os.path.getsize(os.path.join(root, *rel.split('/')))
+                except OSError:
+                    size = 0
+            ext = name[name.rfind('.'):] if '.' in name else ""
+            files.append(ManifestFile(path=rel, size=size, ext=ext, blob=fields[2]))
+        return cls(root, files, GitObjectReader(root) if bare else None)
+
+    @classmethod
+    def from_listing(cls, root: str) -> "RepoManifest":
+        """Build the manifest from the listing a tarball fetch wrote
+        (TREE_LISTING_FILE); only the parsers' files were extracted."""
+        with open(os.path.join(root, TREE_LISTING_FILE), 'r', encoding='utf-8') as f:
+            listing = json.load(f)
+        files = []
+        for rel, size, blob in listing.get("files", []):
+            name = rel.rsplit('/', 1)[-1]
+            ext = name[name.rfind('.'):] if '.' in name else ""
+            files.append(ManifestFile(path=rel, size=size, ext=ext, blob=blob))
+        return cls(root, files)
+
+    def by_extension(self, ext: str) -> list[ManifestFile]:
+        """Files whose final suffix is exactly ext (e.g. ".cna")."""
+        return self._by_ext.get(ext, [])
+
+    def glob(self, pattern: str) -> list[ManifestFile]:
+        """Files whose base name matches a case-sensitive glob pattern."""
+        return [f for f in self.files if fnmatch.fnmatchcase(f.name, pattern)]
+
+    def exists(self, rel_path: str) -> bool:
+        return rel_path in self._paths
+
+    def abspath(self, rel_path: str) -> str:
+        return os.path.join(self.root, *rel_path.split('/'))
+
+    def relpath(self, path: str) -> str:
+        rel = os.path.relpath(path, self.root).replace(os.sep, '/')
+        return "" if rel == '.' else rel
+
+    def markdown(self, rel_path: str) -> Optional["MarkdownDocument"]:
+        """Tokenized contents of a README, read once and shared by all parsers.
+
+        Returns None if the file is not in the manifest or cannot be read.
+        """
+        if rel_path not in self._documents:
+            doc = None
+            if self.exists(rel_path):
+                if self.blob_cache and self._blobs.get(rel_path):
+                    def tokenize() -> Optional[dict]:
+                        read = self._read_markdown(rel_path)
+                        return read.to_dict() if read else None
+                    data = self.extract(rel_path, "markdown", tokenize)
+                    doc = MarkdownDocument.from_dict(data) if data else None
+                else:
+                    doc = self.extract(rel_path, "markdown", lambda: self._read_markdown(rel_path))
+            self._documents[rel_path] = doc
+        return self._documents[rel_path]
+
+    def _read_markdown(self, rel_path: str) -> Optional["MarkdownDocument"]:
+        with self.open_content(rel_path) as content:
+            if isinstance(content, str):
+                return MarkdownDocument(content)
+            if content is not None:
+                # Only the head of an oversized README is tokenized
+                self._skip(rel_path, "truncated", self._sizes.get(rel_path, len(content)))
+                return MarkdownDocument(decode_text(content[:MAX_FILE_BYTES]))
+        return None
+
+    def read_text(self, rel_path: str, limit: Optional[int] = None) -> Optional[str]:
+        """Decoded contents of a text file, or None if it was skipped.
+
+        Binary files (a NUL byte in the first BINARY_SNIFF_BYTES) are always
+        skipped. With limit, only the first `limit` characters are returned,
+        which is cheap enough for sniffing any file. Full reads of files over
+        MAX_FILE_BYTES, or past the repo's MAX_REPO_BYTES budget, are skipped
+        too. Every skip is recorded in self.skipped.
+        """
+        # A character is at most 4 UTF-8 bytes, so the head holds `limit` of them
+        head_only = limit is not None and limit * 4 <= BINARY_SNIFF_BYTES
+        read_limit = BINARY_SNIFF_BYTES if head_only else None
+        if self.object_store is not None:
+            # A blob that will be skipped is only read as far as the binary sniff
+            size = self._sizes.get(rel_path, 0)
+            if size > MAX_FILE_BYTES or self.bytes_decoded + size > MAX_REPO_BYTES:
+                read_limit = BINARY_SNIFF_BYTES
+        try:
+            with self._open(rel_path, read_limit) as f:
+                if self.object_store is None:
+                    size = f.seek(0, os.SEEK_END)
+                    f.seek(0)
+                head = f.read(BINARY_SNIFF_BYTES)
+                if b'\0' in head:
+                    self._skip(rel_path, "binary", size)
+                    return None
+                if head_only:
+                    return decode_text(head)[:limit]
+                if size > MAX_FILE_BYTES:
+                    self._skip(rel_path, "too_large", size)
+                    return None
+                if self.bytes_decoded + size > MAX_REPO_BYTES:
+                    self._skip(rel_path, "repo_budget", size)
+                    return None
+                self.bytes_decoded += size
+                text = decode_text(head + f.read())
+        except OSError:
+            return None
+        return text[:limit] if limit is not None else text
+
+    @contextmanager
+    def open_content(self, rel_path: str):
+        """Yield a text file's contents for a full scan.
+
+        Files up to MAX_FILE_BYTES come back as str (via read_text). Larger
+        text files come back as a read-only mmap, to be scanned with bytes
+        regexes (see bytes_pattern) rather than decoded. From an object
+        store only their first MAX_FILE_BYTES are read, as bytes scanned the
+        same way, and counted against MAX_REPO_BYTES. Skipped files yield
+        None.
+        """
+        try:
+            if self.object_store is not None:
+                size = self._sizes[rel_path]
+            else:
+                size = os.path.getsize(self.abspath(rel_path))
+        except (OSError, KeyError):
+            size = 0
+        if size <= MAX_FILE_BYTES:
+            yield self.read_text(rel_path)
+            return
+        
+        data = None
+        try:
+            if self.object_store is not None:
+                if self.bytes_decoded + MAX_FILE_BYTES > MAX_REPO_BYTES:
+                    self._skip(rel_path, "repo_budget", size)
+                else:
+                    with self._open(rel_path, MAX_FILE_BYTES) as f:
+                        data = f.getvalue()
+                    self.bytes_decoded += len(data)
+                    if b'\0' in data[:BINARY_SNIFF_BYTES]:
+                        self._skip(rel_path, "binary", size)
+                        data = None
+                    else:
+                        self._skip(rel_path, "truncated", size)
+            else:
+                with self._open(rel_path) as f:
+                    if b'\0' in f.read(BINARY_SNIFF_BYTES):
+                        self._skip(rel_path, "binary", size)
+                    else:
+                        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                        self._skip(rel_path, "mapped", size)
+        except (OSError, ValueError):
+            pass
+        try:
+            yield data
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def _open(self, rel_path: str, limit: Optional[int] = None):
+        """Binary file object for rel_path: the file on disk, or for a bare
+        clone the blob read through the object store (only its first
+        `limit` bytes, if given)."""
+        if self.object_store is not None:
+            blob = self._blobs.get(rel_path)
+            if not blob:
+                raise FileNotFoundError(rel_path)
+            return io.BytesIO(self.object_store.read(blob, limit))
+        return open(self.abspath(rel_path), 'rb')
+
+    def _skip(self, rel_path: str, reason: str, size: int) -> None:
+        self.skipped[rel_path] = {"path": rel_path, "reason": reason, "bytes": size}
+
+    def extract(self, rel_path: str, kind: str, compute, parsed: bool = True):
+        """Per-file parser output, computed once per distinct file content.
+
+        compute() reads rel_path and returns the parser's result for it. With
+        a blob cache attached and the file's git blob SHA known, a result any
+        repo (or an earlier run) stored for the same blob is returned without
+        reading the file, so the result must be JSON-serializable. Results
+        for files that were skipped or only partly read are not stored. A
+        hit still counts the file against the repo's read budget, so which
+        files are skipped does not depend on what the cache holds.
+
+        Files extracted with parsed=True (everything but content sniffs)
+        make up parsed_blobs, the fingerprint used to spot forks.
+        """
+        blob = self._blobs.get(rel_path, "")
+        if blob and parsed:
+            self.parsed_blobs.add(blob)
+        if not (blob and self.blob_cache):
+            return compute()
+        record = self.blob_cache.get(kind, blob)
+        if record is not None and parsed:
+            size = self._sizes.get(rel_path, 0)
+            # Only fully read files are stored, so one now over either cap
+            # was cached under larger caps; compute() records the skip
+            if size > MAX_FILE_BYTES or self.bytes_decoded + size > MAX_REPO_BYTES:
+                record = None
+            else:
+                self.bytes_decoded += size
+        if record is not None:
+            self.blob_hits += 1
+            return record["value"]
+        self.blob_misses += 1
+        value = compute()
+        if rel_path not in self.skipped:
+            self.blob_cache.put(kind, blob, value)
+        return value
+
+    def memo(self, key: str, compute):
+        """Compute a per-repo result once (e.g. a content sniff shared by
+        can_parse and parse); dropped together with the cached documents."""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def clear_documents(self) -> None:
+        """Drop cached file contents, reset the read budget and stop the
+        object store's reader; the listing itself is kept."""
+        self._documents.clear()
+        self._memo.clear()
+        self.skipped = {}
+        self.bytes_decoded = 0
+        if self.object_store is not None:
+            self.object_store.close()
+        self.blob_cache = None
+        self.parsed_blobs = set()
+        self.blob_hits = 0
+        self.blob_misses = 0
+
+
+class GitObjectReader:
+    """Reads blobs of a bare clone through one long-lived `git cat-file --batch`.
+
+    The process is started on the first read and stopped by close() (the
+    manifest does that once the repo is parsed); a later read starts it again.
+    """
+
+    def __init__(self, git_dir: str):
+        self.git_dir = git_dir
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def read(self, sha: str, limit: Optional[int] = None) -> bytes:
+        """The blob's contents, or only its first `limit` bytes; the rest
+        is drained from the pipe in chunks without being kept."""
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._process = subprocess.Popen(
+                    ["git", "--git-dir", self.git_dir, "cat-file", "--batch"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+            self._process.stdin.write(sha.encode('ascii') + b'\n')
+            self._process.stdin.flush()
+            # "<sha> <type> <size>\n<contents>\n", or "<sha> missing\n"
+            header = self._process.stdout.readline().split()
+            if len(header) != 3:
+                raise FileNotFoundError(sha)
+            size = int(header[2])
+            data = self._process.stdout.read(size if limit is None else min(size, limit))
+            remaining = size - len(data)
+            while remaining > 0:
+                chunk = self._process.stdout.read(min(remaining, 65536))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+            self._process.stdout.read(1)
+            return data
+
+    def close(self) -> None:
+        with self._lock:
+            if self._process is None:
+                return
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process.stdout.close()
+            self._process = None
+
+
+_manifests: dict[str, RepoManifest] = {}
+
+
+def clone_layout(repo_path: str) -> str:
+    """How the parsers read a clone: "bare" (bare and shared clones, from
+    the object store), "sparse", "tarball" (from the extracted listing) or
+    "full" (the working tree)."""
+    if _is_bare(repo_path):
+        return "bare"
+    if os.path.exists(os.path.join(repo_path, ".git", "info", "sparse-checkout")):
+        return "sparse"
+    if os.path.exists(os.path.join(repo_path, TREE_LISTING_FILE)):
+        return "tarball"
+    return "full"
+
+
+def get_manifest(repo_path: str) -> RepoManifest:
+    """Return the file manifest for repo_path, walking the tree on first use."""
+    manifest = _manifests.get(repo_path)
+    if manifest is None:
+        layout = clone_layout(repo_path)
+        if layout == "bare":
+            manifest = RepoManifest.from_git_tree(repo_path, bare=True)
+        elif layout == "sparse":
+            manifest = RepoManifest.from_git_tree(repo_path)
+        elif layout == "tarball":
+            manifest = RepoManifest.from_listing(repo_path)
+        else:
+            manifest = RepoManifest.from_directory(repo_path)
+        _manifests[repo_path] = manifest
+    return manifest
+
+
+def clear_manifests() -> None:
+    """Forget all cached manifests (e.g. after clones were updated)."""
+    _manifests.clear()
+
+
+# =============================================================================
+# Markdown Tokenizer
+# =============================================================================
+
+# Table headers the README table parser recognizes, as one pattern (MULTILINE
+# so ^ also matches line starts when searching a whole document)
+TABLE_HEADER_PATTERN = re.compile(
+    r'^\s*\|\s*(?:'
+    r'commands?\s*\|\s*usage\s*\|'     # |Command|Usage|Notes| (trustedsec style)
+    r'|commands?\s*\|.*\|'             # |Command|Description| or |Commands|Description|
+    r'|name\s*\|.*decr?iption.*\|'     # |Name|Description| (outflank style)
+    r'|\*?\*?bof\*?\*?\s*\|.*\|'       # |BOF|Description| or |**BOF**|**Use**| (atomiczsec/Adrenaline style with bold)
+    r'|tool\s*\|.*\|'                  # |Tool|Description|
+    r'|function\s*\|.*\|'              # |Function|Description|
+    r'|module\s*\|.*\|'                # |Module|Description|
+    r')',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Pattern for table separator row
+TABLE_SEPARATOR = re.compile(r'^\s*\|[\s\-:|]+\|')
+
+# Pattern for bullet list items with BOF name and description
+# Matches: - BOFName: Description
+# Matches: - [BOFName](url): Description
+# Excludes: bold entries (typically TODOs), names with spaces, URLs, registry keys
+BULLET_PATTERN = re.compile(
+    r'^\s*[-*]\s+'                        # Bullet point (- or *)
+    r'(?:\[([A-Za-z][A-Za-z0-9_-]*)\]\([^)]+\)|'  # [Name](url) - name must be identifier-like
+    r'([A-Za-z][A-Za-z0-9_-]*[A-Za-z0-9]))'       # Plain name (at least 2 chars, identifier-like)
+    r'\s*:\s+'                             # Colon separator with required space after
+    r'([A-Z].+)$',                         # Description must start with capital letter (sentence)
+    re.MULTILINE                           # Allow ^ to match line starts
+)
+
+
+@dataclass
+class MarkdownTable:
+    """A table that starts at a recognized header line.
+
+    header and each row are the stripped line split on "|", so cell indices
+    include the empty cells outside the outer pipes. Separator rows are
+    dropped.
+    """
+    header: list[str]
+    rows: list[list[str]]
+
+
+class MarkdownDocument:
+    """A README read once and tokenized into tables and bullet items on demand."""
+
+    def __init__(self, text: str):
+        self.text = text
+        # Split on "\n" only, like iterating over the file would
+        self.lines = text.split('\n')
+        self._tables: Optional[list[MarkdownTable]] = None
+        self._bullets: Optional[list[tuple[str, str]]] = None
+        self._flags: dict[str, object] = {}
+
+    def to_dict(self) -> dict:
+        """Everything the parsers query, for the blob cache (see RepoManifest.extract)."""
+        return {
+            "has_table_header": self.has_table_header(),
+            "has_bullet_items": self.has_bullet_items(),
+            "first_text_line": self.first_text_line(),
+            "tables": [[t.header, t.rows] for t in self.tables],
+            "bullets": self.bullets,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MarkdownDocument":
+        """A document restored from to_dict(); its text is not kept."""
+        doc = cls("")
+        doc._flags = {k: data[k] for k in ("has_table_header", "has_bullet_items",
+                                             "first_text_line")}
+        doc._tables = [MarkdownTable(header, rows) for header, rows in data["tables"]]
+        doc._bullets = [(name, desc) for name, desc in data["bullets"]]
+        return doc
+
+    def has_table_header(self) -> bool:
+        if "has_table_header" not in self._flags:
+            self._flags["has_table_header"] = TABLE_HEADER_PATTERN.search(self.text) is not None
+        return self._flags["has_table_header"]
+
+    def has_bullet_items(self) -> bool:
+        if "has_bullet_items" not in self._flags:
+            self._flags["has_bullet_items"] = BULLET_PATTERN.search(self.text) is not None
+        return self._flags["has_bullet_items"]
+
+    @property
+    def tables(self) -> list[MarkdownTable]:
+        if self._tables is None:
+            self._tables = self._tokenize_tables()
+        return self._tables
+
+    @property
+    def bullets(self) -> list[tuple[str, str]]:
+        """(name, description) for every line that is a "- Name: Description" item."""
+        if self._bullets is None:
+            self._bullets = []
+            for line in self.lines:
+                match = BULLET_PATTERN.match(line)
+                if match:
+                    # Group 1 is link text, Group 2 is plain name, Group 3 is description
+                    self._bullets.append((match.group(1) or match.group(2), match.group(3).strip()))
+        return self._bullets
+
+    def first_text_line(self) -> str:
+        """First non-empty line that is not a markdown heading, stripped."""
+        if "first_text_line" not in self._flags:
+            self._flags["first_text_line"] = next(
+                (line for line in (l.strip() for l in self.lines)
+                 if line and not line.startswith('#')), "")
+        return self._flags["first_text_line"]
+
+    def _tokenize_tables(self) -> list[MarkdownTable]:
+        tables = []
+        lines = self.lines
+        i = 0
+        while i < len(lines):
+            line = lines[i].strip()
+            i += 1
+            if not TABLE_HEADER_PATTERN.match(line):
+                continue
+            
+            table = MarkdownTable(header=line.split('|'), rows=[])
+            # Skip separator row
+            if i < len(lines) and TABLE_SEPARATOR.match(lines[i]):
+                i += 1
+            
+            while i < len(lines):
+                row = lines[i].strip()
+                if not row.startswith('|') or not row.endswith('|'):
+                    break
+                if not TABLE_SEPARATOR.match(row):
+                    table.rows.append(row.split('|'))
+                i += 1
+            tables.append(table)
+        return tables
+
+
+# =============================================================================
+# Aggressor Script Lexer
+# =============================================================================
+
+# One alternation, so a script is tokenized in a single left-to-right pass.
+# Strings are matched before comments can start inside them.
+SLEEP_TOKEN = re.compile(r"""
+    (?P<comment>\#[^\n]*)
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<word>[$@%&]?\w[\w-]*)
+  | (?P<punct>\S)
+""", re.VERBOSE)
+
+SLEEP_ESCAPE = re.compile(r'\\(.)')
+SLEEP_ESCAPES = {'n': ' ', 't': ' ', 'r': ' '}
+
+# How many lines above an alias are searched for a comment describing it
+ALIAS_COMMENT_WINDOW = 3
+
+
+@dataclass
+class AggressorCommand:
+    """A command defined in an Aggressor script."""
+    kind: str         # "register" (beacon_command_register) or "alias"
+    name: str
+    description: str  # register: its description argument; alias: comment above it
+    offset: int       # character offset of the defining keyword
+    line: int         # 0-based line of the defining keyword
+
+
+def _sleep_string(token: str) -> str:
+    """Value of a quoted Sleep string token."""
+    return SLEEP_ESCAPE.sub(lambda m: SLEEP_ESCAPES.get(m.group(1), m.group(1)), token[1:-1])
+
+
+def _sleep_literal(tokens: list[tuple[str, str, int]]) -> Optional[str]:
+    """Value of an argument made only of strings joined with ".", else None."""
+    if len(tokens) % 2 == 0:
+        return None
+    parts = []
+    for i, (kind, text, _) in enumerate(tokens):
+        if i % 2 == 0:
+            if kind != "string":
+                return None
+            parts.append(_sleep_string(text))
+        elif text != ".":
+            return None
+    return "".join(parts)
+
+
+def _sleep_call_args(tokens: list[tuple[str, str, int]], start: int,
+                     limit: int) -> tuple[list[list[tuple[str, str, int]]], int]:
+    """Split the arguments of a call whose "(" precedes tokens[start].
+
+    Stops at the closing ")" or once `limit` arguments are complete, and
+    returns the arguments with the index to resume scanning from.
+    """
+    args = [[]]
+    depth = 0
+    i = start
+    while i < len(tokens):
+        kind, text, _ = tokens[i]
+        i += 1
+        if kind == "comment":
+            continue
+        if kind == "punct":
+            if text in "([{":
+                depth += 1
+            elif text in ")]}":
+                if depth == 0:
+                    break
+                depth -= 1
+            elif text == "," and depth == 0:
+                if len(args) == limit:
+                    break
+                args.append([])
+                continue
+        args[-1].append(tokens[i - 1])
+    return args, i
+
+
+# Simplified definitions for scanning memory-mapped scripts too large to tokenize
+AGGRESSOR_REGISTER_BYTES = re.compile(
+    rb'beacon_command_register\s*\(\s*(["\'])((?:\\.|(?!\1)[^\\\n])+)\1'
+    rb'\s*,\s*(["\'])((?:\\.|(?!\3)[^\\\n])+)\3'
+)
+AGGRESSOR_ALIAS_BYTES = re.compile(rb'^[ \t]*alias\s+["\']?([\w-]+)["\']?\s*\{', re.MULTILINE)
+
+
+def scan_aggressor_bytes(data) -> list[AggressorCommand]:
+    """Regex-only scan of a bytes-like script (e.g. an mmap).
+
+    Finds single-string register arguments and aliases at the start of a
+    line; aliases get no description and lines are not tracked (-1).
+    """
+    commands = []
+    for m in AGGRESSOR_REGISTER_BYTES.finditer(data):
+        name = _sleep_string('"' + decode_text(m.group(2)) + '"').strip()
+        desc = _sleep_string('"' + decode_text(m.group(4)) + '"').strip()
+        if name and desc:
+            commands.append(AggressorCommand("register", name, desc, m.start(), -1))
+    for m in AGGRESSOR_ALIAS_BYTES.finditer(data):
+        commands.append(AggressorCommand("alias", decode_text(m.group(1)), "", m.start(1), -1))
+    return commands
+
+
+def scan_aggressor(content: str) -> list[AggressorCommand]:
+    """Find alias and beacon_command_register definitions in one pass.
+
+    Registrations whose name and description are string literals are
+    returned, including arguments split across lines or built with "."
+    concatenation. Aliases get the first whole-line comment found in the
+    ALIAS_COMMENT_WINDOW lines above them as their description. Text in
+    comments and strings is never mistaken for a definition.
+    """
+    tokens = [(m.lastgroup, m.group(), m.start()) for m in SLEEP_TOKEN.finditer(content)]
+    line_starts = [0] + [m.end() for m in re.finditer('\n', content)]
+    comments: dict[int, str] = {}  # line -> text of a comment that is the whole line
+    commands = []
+    
+    i = 0
+    while i < len(tokens):
+        kind, text, offset = tokens[i]
+        i += 1
+        if kind == "comment":
+            line = bisect.bisect_right(line_starts, offset) - 1
+            if not content[line_starts[line]:offset].strip():
+                comments[line] = text[1:].strip()
+        elif kind != "word":
+            continue
+        elif text == "alias":
+            # alias name { ... }  or  alias "name" { ... }
+            following = tokens[i:i + 2]
+            if len(following) < 2 or following[1][1] != "{":
+                continue
+            name_kind, name, _ = following[0]
+            if name_kind == "string":
+                name = _sleep_string(name)
+            elif name_kind != "word":
+                continue
+            if not re.fullmatch(r'[\w-]+', name):
+                continue
+            line = bisect.bisect_right(line_starts, offset) - 1
+            desc = next((comments[j] for j in range(max(0, line - ALIAS_COMMENT_WINDOW), line)
+                         if j in comments), "")
+            commands.append(AggressorCommand("alias", name, desc, offset, line))
+            i += 2
+        elif text == "beacon_command_register" and i < len(tokens) and tokens[i][1] == "(":
+            args, i = _sleep_call_args(tokens, i + 1, limit=2)
+            if len(args) < 2:
+                continue
+            name, desc = _sleep_literal(args[0]), _sleep_literal(args[1])
+            if name and name.strip() and desc and desc.strip():
+                line = bisect.bisect_right(line_starts, offset) - 1
+                commands.append(AggressorCommand("register", name.strip(), desc.strip(),
+                                                 offset, line))
+    
+    return commands
+
+
 # =============================================================================
 # Parsers for different documentation formats
 # =============================================================================
@@ -315,6 +2165,8 @@ class BOFParser:
     """Base class for BOF parsers."""
     
     name: str = "base"
+    # Files this parser reads, as sparse-checkout (gitignore-style) patterns
+    checkout_patterns: list[str] = []
     
     def can_parse(self, repo_path: str) -> bool:
         """Check if this parser can handle this repository."""
@@ -329,128 +2181,69 @@ class ReadmeTableParser(BOFParser):
     """Parse BOF information from README.md tables."""
     
     name = "readme_table"
-    
-    # Common table header patterns for BOF documentation (use MULTILINE for ^ to match line start)
-    TABLE_HEADER_PATTERNS = [
-        # |Command|Usage|Notes| (trustedsec style)
-        re.compile(r'^\s*\|\s*commands?\s*\|\s*usage\s*\|', re.IGNORECASE | re.MULTILINE),
-        # |Command|Description| or |Commands|Description|
-        re.compile(r'^\s*\|\s*commands?\s*\|.*\|', re.IGNORECASE | re.MULTILINE),
-        # |Name|Description| (outflank style)
-        re.compile(r'^\s*\|\s*name\s*\|.*decr?iption.*\|', re.IGNORECASE | re.MULTILINE),
-        # |BOF|Description| or |**BOF**|**Use**| (atomiczsec/Adrenaline style with bold)
-        re.compile(r'^\s*\|\s*\*?\*?bof\*?\*?\s*\|.*\|', re.IGNORECASE | re.MULTILINE),
-        # |Tool|Description|
-        re.compile(r'^\s*\|\s*tool\s*\|.*\|', re.IGNORECASE | re.MULTILINE),
-        # |Function|Description|
-        re.compile(r'^\s*\|\s*function\s*\|.*\|', re.IGNORECASE | re.MULTILINE),
-        # |Module|Description|
-        re.compile(r'^\s*\|\s*module\s*\|.*\|', re.IGNORECASE | re.MULTILINE),
-    ]
-    
-    # Pattern for table separator row
-    TABLE_SEPARATOR = re.compile(r'^\s*\|[\s\-:|]+\|')
+    checkout_patterns = ['/README.md', '/readme.md', '/Readme.md', '/README.MD']
     
     def find_readme_files(self, repo_path: str) -> list[str]:
         """Find README files in the repository."""
         readme_files = []
+        manifest = get_manifest(repo_path)
         for pattern in ['README.md', 'readme.md', 'Readme.md', 'README.MD']:
-            readme_path = os.path.join(repo_path, pattern)
-            if os.path.exists(readme_path):
-                readme_files.append(readme_path)
+            if manifest.exists(pattern):
+                readme_files.append(manifest.abspath(pattern))
                 break
         return readme_files
     
     def can_parse(self, repo_path: str) -> bool:
         """Check if README exists with BOF tables."""
-        readme_files = self.find_readme_files(repo_path)
-        if not readme_files:
-            return False
-        
-        for readme_path in readme_files:
-            try:
-                with open(readme_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    for pattern in self.TABLE_HEADER_PATTERNS:
-                        if pattern.search(content):
-                            return True
-            except:
-                pass
+        manifest = get_manifest(repo_path)
+        for readme_path in self.find_readme_files(repo_path):
+            doc = manifest.markdown(manifest.relpath(readme_path))
+            if doc and doc.has_table_header():
+                return True
         return False
     
     def parse(self, repo_path: str, repo_url: str) -> list[BOFEntry]:
         """Parse BOF entries from README tables."""
         entries = []
-        readme_files = self.find_readme_files(repo_path)
+        manifest = get_manifest(repo_path)
         
-        for readme_path in readme_files:
-            try:
-                with open(readme_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                
-                entries.extend(self._parse_tables(lines, readme_path, repo_url))
-            except Exception as e:
-                print(f"  Error parsing {readme_path}: {e}", file=sys.stderr)
+        for readme_path in self.find_readme_files(repo_path):
+            doc = manifest.markdown(manifest.relpath(readme_path))
+            if doc:
+                entries.extend(self._parse_tables(doc.tables, readme_path, repo_url))
         
         return entries
     
-    def _parse_tables(self, lines: list[str], source_file: str, repo_url: str) -> list[BOFEntry]:
+    def _parse_tables(self, tables: list[MarkdownTable], source_file: str,
+                      repo_url: str) -> list[BOFEntry]:
         """Extract BOF entries from markdown tables."""
         entries = []
-        i = 0
         
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            # Check if this line is a table header we recognize
-            is_header = False
+        for table in tables:
+            # Determine column indices - strip markdown bold markers for matching
             name_col_idx = 0
             desc_col_idx = 1
+            cols = [re.sub(r'\*+', '', c).strip().lower() for c in table.header]
+            for idx, col in enumerate(cols):
+                if col in ['command', 'commands', 'name', 'bof', 'tool', 'function', 'module']:
+                    name_col_idx = idx
+                elif 'description' in col or 'notes' in col or 'decription' in col or col == 'use':
+                    desc_col_idx = idx
             
-            for pattern in self.TABLE_HEADER_PATTERNS:
-                if pattern.match(line):
-                    is_header = True
-                    # Determine column indices - strip markdown bold markers for matching
-                    cols = [re.sub(r'\*+', '', c).strip().lower() for c in line.split('|')]
-                    for idx, col in enumerate(cols):
-                        if col in ['command', 'commands', 'name', 'bof', 'tool', 'function', 'module']:
-                            name_col_idx = idx
-                        elif 'description' in col or 'notes' in col or 'decription' in col or col == 'use':
-                            desc_col_idx = idx
-                    break
-            
-            if is_header:
-                i += 1
-                # Skip separator row
-                if i < len(lines) and self.TABLE_SEPARATOR.match(lines[i]):
-                    i += 1
-                
-                # Parse data rows
-                while i < len(lines):
-                    row = lines[i].strip()
-                    if not row.startswith('|') or not row.endswith('|'):
-                        break
-                    if self.TABLE_SEPARATOR.match(row):
-                        i += 1
-                        continue
+            for cols in table.rows:
+                if len(cols) > max(name_col_idx, desc_col_idx):
+                    name = self._clean_cell(cols[name_col_idx])
+                    desc = self._clean_cell(cols[desc_col_idx]) if desc_col_idx < len(cols) else ""
                     
-                    cols = row.split('|')
-                    if len(cols) > max(name_col_idx, desc_col_idx):
-                        name = self._clean_cell(cols[name_col_idx])
-                        desc = self._clean_cell(cols[desc_col_idx]) if desc_col_idx < len(cols) else ""
-                        
-                        # Skip if name looks like a header or is empty
-                        if name and not self._is_header_like(name):
-                            entries.append(BOFEntry(
-                                name=name,
-                                description=desc,
-                                repository=repo_url,
-                                source_file=os.path.basename(source_file),
-                                source_format=self.name
-                            ))
-                    i += 1
-            else:
-                i += 1
+                    # Skip if name looks like a header or is empty
+                    if name and not self._is_header_like(name):
+                        entries.append(BOFEntry(
+                            name=name,
+                            description=desc,
+                            repository=repo_url,
+                            source_file=os.path.basename(source_file),
+                            source_format=self.name
+                        ))
         
         return entries
     
@@ -478,76 +2271,49 @@ class ReadmeBulletParser(BOFParser):
     """Parse BOF information from README.md bullet lists with format: - BOFName: Description"""
     
     name = "readme_bullet"
-    
-    # Pattern for bullet list items with BOF name and description
-    # Matches: - BOFName: Description
-    # Matches: - [BOFName](url): Description
-    # Excludes: bold entries (typically TODOs), names with spaces, URLs, registry keys
-    BULLET_PATTERN = re.compile(
-        r'^\s*[-*]\s+'                        # Bullet point (- or *)
-        r'(?:\[([A-Za-z][A-Za-z0-9_-]*)\]\([^)]+\)|'  # [Name](url) - name must be identifier-like
-        r'([A-Za-z][A-Za-z0-9_-]*[A-Za-z0-9]))'       # Plain name (at least 2 chars, identifier-like)
-        r'\s*:\s+'                             # Colon separator with required space after
-        r'([A-Z].+)$',                         # Description must start with capital letter (sentence)
-        re.MULTILINE                           # Allow ^ to match line starts
-    )
+    checkout_patterns = ReadmeTableParser.checkout_patterns
     
     def find_readme_files(self, repo_path: str) -> list[str]:
         """Find README files in the repository."""
         readme_files = []
+        manifest = get_manifest(repo_path)
         for pattern in ['README.md', 'readme.md', 'Readme.md', 'README.MD']:
-            readme_path = os.path.join(repo_path, pattern)
-            if os.path.exists(readme_path):
-                readme_files.append(readme_path)
+            if manifest.exists(pattern):
+                readme_files.append(manifest.abspath(pattern))
                 break
         return readme_files
     
     def can_parse(self, repo_path: str) -> bool:
         """Check if README has bullet list BOF entries."""
-        readme_files = self.find_readme_files(repo_path)
-        if not readme_files:
-            return False
-        
-        for readme_path in readme_files:
-            try:
-                with open(readme_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    # Need at least 1 matching bullet point to consider this format
-                    matches = self.BULLET_PATTERN.findall(content)
-                    if len(matches) >= 1:
-                        return True
-            except:
-                pass
+        manifest = get_manifest(repo_path)
+        for readme_path in self.find_readme_files(repo_path):
+            # Need at least 1 matching bullet point to consider this format
+            doc = manifest.markdown(manifest.relpath(readme_path))
+            if doc and doc.has_bullet_items():
+                return True
         return False
     
     def parse(self, repo_path: str, repo_url: str) -> list[BOFEntry]:
         """Parse BOF entries from README bullet lists."""
         entries = []
-        readme_files = self.find_readme_files(repo_path)
+        manifest = get_manifest(repo_path)
         
-        for readme_path in readme_files:
-            try:
-                with open(readme_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    for line in f:
-                        match = self.BULLET_PATTERN.match(line)
-                        if match:
-                            # Group 1 is link text, Group 2 is plain name, Group 3 is description
-                            name = match.group(1) or match.group(2)
-                            description = match.group(3).strip()
-                            
-                            # Skip common non-BOF entries
-                            if self._is_generic_entry(name, description):
-                                continue
-                            
-                            entries.append(BOFEntry(
-                                name=name,
-                                description=description,
-                                repository=repo_url,
-                                source_file=os.path.basename(readme_path),
-                                source_format=self.name
-                            ))
-            except Exception as e:
-                print(f"  Error parsing {readme_path}: {e}", file=sys.stderr)
+        for readme_path in self.find_readme_files(repo_path):
+            doc = manifest.markdown(manifest.relpath(readme_path))
+            if not doc:
+                continue
+            for name, description in doc.bullets:
+                # Skip common non-BOF entries
+                if self._is_generic_entry(name, description):
+                    continue
+                
+                entries.append(BOFEntry(
+                    name=name,
+                    description=description,
+                    repository=repo_url,
+                    source_file=os.path.basename(readme_path),
+                    source_format=self.name
+                ))
         
         return entries
     
@@ -563,23 +2329,12 @@ class CNAParser(BOFParser):
     """Parse BOF information from Cobalt Strike Aggressor scripts (.cna files)."""
     
     name = "cna"
-    
-    # Patterns for CNA command definitions
-    ALIAS_PATTERN = re.compile(r'alias\s+["\']?(\w+)["\']?\s*{')
-    BEACON_CMD_PATTERN = re.compile(r'beacon_command_register\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']+)["\']')
-    HELP_PATTERN = re.compile(r'#\s*(.*)')  # Comments often contain descriptions
+    checkout_patterns = ['*.cna']
     
     def find_cna_files(self, repo_path: str) -> list[str]:
         """Find all .cna files in the repository."""
-        cna_files = []
-        for root, dirs, files in os.walk(repo_path):
-            # Skip .git directory
-            if '.git' in root:
-                continue
-            for f in files:
-                if f.endswith('.cna'):
-                    cna_files.append(os.path.join(root, f))
-        return cna_files
+        manifest = get_manifest(repo_path)
+        return [manifest.abspath(f.path) for f in manifest.by_extension('.cna')]
     
     def can_parse(self, repo_path: str) -> bool:
         """Check if repository has .cna files."""
@@ -588,50 +2343,45 @@ class CNAParser(BOFParser):
     def parse(self, repo_path: str, repo_url: str) -> list[BOFEntry]:
         """Parse BOF entries from CNA files."""
         entries = []
+        seen = set()  # (name, source file) already emitted
+        manifest = get_manifest(repo_path)
         cna_files = self.find_cna_files(repo_path)
         
+        def scan(rel_path: str) -> list:
+            with manifest.open_content(rel_path) as content:
+                if content is None:
+                    return []
+                if isinstance(content, str):
+                    commands = scan_aggressor(content)
+                else:
+                    commands = scan_aggressor_bytes(content)
+            return [astuple(cmd) for cmd in commands]
+        
         for cna_path in cna_files:
+            source_file = os.path.basename(cna_path)
+            rel_path = manifest.relpath(cna_path)
             try:
-                with open(cna_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                
-                # Look for beacon_command_register calls (most reliable)
-                for match in self.BEACON_CMD_PATTERN.finditer(content):
-                    name = match.group(1).strip()
-                    desc = match.group(2).strip()
+                commands = [AggressorCommand(*cmd) for cmd in
+                            manifest.extract(rel_path, self.name, lambda: scan(rel_path))]
+            except Exception as e:
+                print(f"  Error parsing {cna_path}: {e}", file=sys.stderr)
+                continue
+            
+            # beacon_command_register calls first (most reliable), then aliases
+            # that were not registered; aliases carry their comment as description
+            for kind in ("register", "alias"):
+                for cmd in commands:
+                    key = (cmd.name, source_file)
+                    if cmd.kind != kind or (kind == "alias" and key in seen):
+                        continue
+                    seen.add(key)
                     entries.append(BOFEntry(
-                        name=name,
-                        description=desc,
+                        name=cmd.name,
+                        description=cmd.description,
                         repository=repo_url,
-                        source_file=os.path.basename(cna_path),
+                        source_file=source_file,
                         source_format=self.name
                     ))
-                
-                # Also look for alias definitions with nearby help text
-                lines = content.split('\n')
-                for i, line in enumerate(lines):
-                    alias_match = self.ALIAS_PATTERN.search(line)
-                    if alias_match:
-                        name = alias_match.group(1)
-                        # Look for description in previous comment lines
-                        desc = ""
-                        for j in range(max(0, i-3), i):
-                            comment_match = self.HELP_PATTERN.match(lines[j].strip())
-                            if comment_match:
-                                desc = comment_match.group(1).strip()
-                                break
-                        
-                        # Only add if not already added via beacon_command_register
-                        if not any(e.name == name and e.source_file == os.path.basename(cna_path) for e in entries):
-                            entries.append(BOFEntry(
-                                name=name,
-                                description=desc,
-                                repository=repo_url,
-                                source_file=os.path.basename(cna_path),
-                                source_format=self.name
-                            ))
-            except Exception as e:
-                print(f"  Error parsing {cna_path}: {e}", file=sys.stderr)
         
         return entries
 
@@ -640,41 +2390,50 @@ class HavocPythonParser(BOFParser):
     """Parse BOF information from Havoc C2 Python extension files."""
     
     name = "havoc_py"
+    checkout_patterns = ['*.py']
     
     # Patterns for Havoc Python files
     HAVOC_IMPORT = re.compile(r'(from\s+havoc\s+import|import\s+havoc)')
+    # Regex fallbacks for files the ast module cannot parse (e.g. Python 2)
     # RegisterCommand( func, "module", "command", "description", ... )
     REGISTER_COMMAND_PATTERN = re.compile(
         r'RegisterCommand\s*\(\s*\w+\s*,\s*["\'][^"\']*["\']\s*,\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']*)["\']',
         re.IGNORECASE
     )
-    # RegisterModule( "name", "description", ... )
-    REGISTER_MODULE_PATTERN = re.compile(
-        r'RegisterModule\s*\(\s*["\']([^"\']+)["\']\s*,\s*["\']([^"\']*)["\']',
-        re.IGNORECASE
-    )
     # Older pattern: .register("name", "desc")
     REGISTER_PATTERN = re.compile(r'\.register\s*\(\s*["\']([^"\']+)["\']\s*,?\s*["\']?([^"\']*)["\']?')
     COMMAND_PATTERN = re.compile(r'["\']command["\']\s*:\s*["\']([^"\']+)["\']')
     DESCRIPTION_PATTERN = re.compile(r'["\']description["\']\s*:\s*["\']([^"\']+)["\']')
+    # How far (in characters) a description may be from its command
+    DESCRIPTION_WINDOW = 500
+    # Installed third-party packages (e.g. a committed virtualenv) never hold
+    # Havoc extensions, and files shorter than "import havoc" cannot import it
+    VENDORED_DIRS = frozenset({"site-packages", "dist-packages", "node_modules"})
+    MIN_SNIFF_BYTES = len("import havoc")
     
     def find_havoc_files(self, repo_path: str) -> list[str]:
-        """Find Python files that import from havoc."""
-        havoc_files = []
-        for root, dirs, files in os.walk(repo_path):
-            if '.git' in root:
-                continue
-            for f in files:
-                if f.endswith('.py'):
-                    file_path = os.path.join(root, f)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as fp:
-                            content = fp.read(2000)  # Just check the beginning
-                            if self.HAVOC_IMPORT.search(content):
-                                havoc_files.append(file_path)
-                    except:
-                        pass
-        return havoc_files
+        """Find Python files that import from havoc.
+
+        Candidates are narrowed by path and size from the manifest before
+        any file is opened, and only the head of each is read. The sniff
+        runs once per repo; can_parse and parse share the result.
+        """
+        manifest = get_manifest(repo_path)
+        
+        def sniff() -> list[str]:
+            havoc_files = []
+            for f in manifest.by_extension('.py'):
+                if f.size < self.MIN_SNIFF_BYTES \
+                        or self.VENDORED_DIRS.intersection(f.path.split('/')[:-1]):
+                    continue
+                def imports_havoc() -> bool:
+                    content = manifest.read_text(f.path, limit=2000)  # Just check the beginning
+                    return bool(content and self.HAVOC_IMPORT.search(content))
+                if manifest.extract(f.path, "havoc_sniff", imports_havoc, parsed=False):
+                    havoc_files.append(manifest.abspath(f.path))
+            return havoc_files
+        
+        return manifest.memo(self.name, sniff)
     
     def can_parse(self, repo_path: str) -> bool:
         """Check if repository has Havoc Python files."""
@@ -683,86 +2442,143 @@ class HavocPythonParser(BOFParser):
     def parse(self, repo_path: str, repo_url: str) -> list[BOFEntry]:
         """Parse BOF entries from Havoc Python files."""
         entries = []
+        all_names = set()
+        manifest = get_manifest(repo_path)
         havoc_files = self.find_havoc_files(repo_path)
         
+        def extract(rel_path: str) -> Optional[tuple[list, list, list]]:
+            with manifest.open_content(rel_path) as content:
+                if content is None:
+                    return None
+                if not isinstance(content, str):
+                    return self._extract_regex(content)
+                try:
+                    return self._extract_ast(ast.parse(content))
+                except (SyntaxError, ValueError, RecursionError, MemoryError):
+                    # Also raised for deeply nested or huge generated code
+                    return self._extract_regex(content)
+        
         for py_path in havoc_files:
+            rel_path = manifest.relpath(py_path)
             try:
-                with open(py_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
+                extracted = manifest.extract(rel_path, self.name, lambda: extract(rel_path))
+                if extracted is None:
+                    continue
+                commands, registers, dict_commands = extracted
                 
-                seen_names = set()
-                
-                # Try RegisterCommand pattern first (most common in Havoc)
-                for match in self.REGISTER_COMMAND_PATTERN.finditer(content):
-                    name = match.group(1).strip()
-                    desc = match.group(2).strip()
-                    if name.lower() not in seen_names:
-                        seen_names.add(name.lower())
-                        entries.append(BOFEntry(
-                            name=name,
-                            description=desc,
-                            repository=repo_url,
-                            source_file=os.path.basename(py_path),
-                            source_format=self.name
-                        ))
+                def add(name: str, desc: str) -> None:
+                    all_names.add(name)
+                    entries.append(BOFEntry(
+                        name=name,
+                        description=desc,
+                        repository=repo_url,
+                        source_file=os.path.basename(py_path),
+                        source_format=self.name
+                    ))
                 
-                # Try .register pattern
-                for match in self.REGISTER_PATTERN.finditer(content):
-                    name = match.group(1).strip()
-                    desc = match.group(2).strip() if match.group(2) else ""
+                # RegisterCommand first (most common in Havoc), then .register
+                seen_names = set()
+                for name, desc in commands + registers:
                     if name.lower() not in seen_names:
                         seen_names.add(name.lower())
-                        entries.append(BOFEntry(
-                            name=name,
-                            description=desc,
-                            repository=repo_url,
-                            source_file=os.path.basename(py_path),
-                            source_format=self.name
-                        ))
-                
-                # Also try dictionary-style definitions
-                cmd_matches = list(self.COMMAND_PATTERN.finditer(content))
-                desc_matches = list(self.DESCRIPTION_PATTERN.finditer(content))
+                        add(name, desc)
                 
-                for cmd_match in cmd_matches:
-                    name = cmd_match.group(1).strip()
-                    desc = ""
-                    # Try to find a nearby description
-                    cmd_pos = cmd_match.start()
-                    for desc_match in desc_matches:
-                        if abs(desc_match.start() - cmd_pos) < 500:
-                            desc = desc_match.group(1).strip()
-                            break
-                    
-                    if not any(e.name == name for e in entries):
-                        entries.append(BOFEntry(
-                            name=name,
-                            description=desc,
-                            repository=repo_url,
-                            source_file=os.path.basename(py_path),
-                            source_format=self.name
-                        ))
+                # Also dictionary-style definitions
+                for name, desc in dict_commands:
+                    if name not in all_names:
+                        add(name, desc)
             except Exception as e:
                 print(f"  Error parsing {py_path}: {e}", file=sys.stderr)
         
         return entries
+    
+    def _extract_ast(self, tree: ast.AST) -> tuple[list, list, list]:
+        """(name, description) lists for RegisterCommand calls, .register calls
+        and {"command": ..., "description": ...} dicts, each in source order."""
+        def text(node) -> Optional[str]:
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                return node.value
+            return None
+        
+        commands, registers, dict_commands = [], [], []
+        module_descriptions = {}
+        for node in ast.walk(tree):
+            pos = (getattr(node, 'lineno', 0), getattr(node, 'col_offset', 0))
+            if isinstance(node, ast.Call):
+                func = node.func
+                func_name = (func.id if isinstance(func, ast.Name)
+                             else func.attr if isinstance(func, ast.Attribute) else "")
+                args = [text(a) for a in node.args]
+                if func_name.lower() == "registercommand":
+                    # RegisterCommand( func, "module", "command", "description", ... )
+                    if len(args) >= 4 and args[1] is not None and args[2] and args[2].strip() \
+                            and args[3] is not None:
+                        commands.append((pos, args[2].strip(), args[3].strip(), args[1]))
+                elif func_name.lower() == "registermodule":
+                    # RegisterModule( "name", "description", ... )
+                    if len(args) >= 2 and args[0] and args[1]:
+                        module_descriptions[args[0]] = args[1].strip()
+                elif func_name == "register" and isinstance(func, ast.Attribute):
+                    if args and args[0] and args[0].strip():
+                        desc = args[1] if len(args) > 1 and args[1] else ""
+                        registers.append((pos, args[0].strip(), desc.strip()))
+            elif isinstance(node, ast.Dict):
+                fields = {text(k): text(v) for k, v in zip(node.keys, node.values)
+                          if k is not None and text(k) in ("command", "description")}
+                if fields.get("command") and fields["command"].strip():
+                    dict_commands.append((pos, fields["command"].strip(),
+                                          (fields.get("description") or "").strip()))
+        
+        # A command without its own description falls back to its module's
+        commands = [(pos, name, desc or module_descriptions.get(module, ""))
+                    for pos, name, desc, module in commands]
+        return tuple([(name, desc) for _, name, desc in sorted(found, key=lambda c: c[0])]
+                     for found in (commands, registers, dict_commands))
+    
+    def _extract_regex(self, content) -> tuple[list, list, list]:
+        """Same lists as _extract_ast, from regexes over the raw text.
+
+        content may also be bytes-like (a memory-mapped file); offsets are
+        then in bytes rather than characters.
+        """
+        def pattern(p: re.Pattern) -> re.Pattern:
+            return p if isinstance(content, str) else bytes_pattern(p)
+        
+        commands = [(group_text(m, 1).strip(), group_text(m, 2).strip())
+                    for m in pattern(self.REGISTER_COMMAND_PATTERN).finditer(content)]
+        registers = [(group_text(m, 1).strip(), group_text(m, 2).strip())
+                     for m in pattern(self.REGISTER_PATTERN).finditer(content)]
+        
+        # Pair each command with the first description within DESCRIPTION_WINDOW
+        # characters of it; finditer yields offsets in sorted order
+        desc_matches = list(pattern(self.DESCRIPTION_PATTERN).finditer(content))
+        desc_starts = [m.start() for m in desc_matches]
+        dict_commands = []
+        for cmd_match in pattern(self.COMMAND_PATTERN).finditer(content):
+            cmd_pos = cmd_match.start()
+            k = bisect.bisect_right(desc_starts, cmd_pos - self.DESCRIPTION_WINDOW)
+            desc = ""
+            if k < len(desc_starts) and desc_starts[k] - cmd_pos < self.DESCRIPTION_WINDOW:
+                desc = group_text(desc_matches[k]).strip()
+            dict_commands.append((group_text(cmd_match).strip(), desc))
+        return commands, registers, dict_commands
 
 
 class Stage1PythonParser(BOFParser):
     """Parse BOF information from Outflank C2 Stage1 Python files (*_bof.s1.py)."""
     
     name = "stage1_py"
+    checkout_patterns = ['*.s1.py', '*_bof.s1.py*']
+    
+    # Patterns for Stage1 format
+    NAME_PATTERN = re.compile(r'["\']?name["\']?\s*[=:]\s*["\']([^"\']+)["\']')
+    DESCRIPTION_PATTERN = re.compile(r'["\']?description["\']?\s*[=:]\s*["\']([^"\']+)["\']')
     
     def find_stage1_files(self, repo_path: str) -> list[str]:
         """Find Stage1 Python files."""
-        stage1_files = []
-        for root, dirs, files in os.walk(repo_path):
-            if '.git' in root:
-                continue
-            for f in files:
-                if f.endswith('.s1.py') or '_bof.s1.py' in f:
-                    stage1_files.append(os.path.join(root, f))
-        return stage1_files
+        manifest = get_manifest(repo_path)
+        return [manifest.abspath(f.path) for f in manifest.glob('*.s1.py*')
+                if f.name.endswith('.s1.py') or '_bof.s1.py' in f.name]
     
     def can_parse(self, repo_path: str) -> bool:
         """Check if repository has Stage1 Python files."""
@@ -771,24 +2587,32 @@ class Stage1PythonParser(BOFParser):
     def parse(self, repo_path: str, repo_url: str) -> list[BOFEntry]:
         """Parse BOF entries from Stage1 Python files."""
         entries = []
+        manifest = get_manifest(repo_path)
         stage1_files = self.find_stage1_files(repo_path)
         
-        # Patterns for Stage1 format
-        name_pattern = re.compile(r'["\']?name["\']?\s*[=:]\s*["\']([^"\']+)["\']')
-        desc_pattern = re.compile(r'["\']?description["\']?\s*[=:]\s*["\']([^"\']+)["\']')
+        def extract(rel_path: str) -> Optional[list[str]]:
+            """[name, description], [] without a name, None if unreadable."""
+            with manifest.open_content(rel_path) as content:
+                if content is None:
+                    return None
+                # Extract name and description
+                patterns = [self.NAME_PATTERN, self.DESCRIPTION_PATTERN]
+                if not isinstance(content, str):
+                    patterns = [bytes_pattern(p) for p in patterns]
+                name_match, desc_match = (p.search(content) for p in patterns)
+            if not name_match:
+                return []
+            return [group_text(name_match).strip(), group_text(desc_match).strip()]
         
         for s1_path in stage1_files:
+            rel_path = manifest.relpath(s1_path)
             try:
-                with open(s1_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
+                extracted = manifest.extract(rel_path, self.name, lambda: extract(rel_path))
+                if extracted is None:
+                    continue
                 
-                # Extract name and description
-                name_match = name_pattern.search(content)
-                desc_match = desc_pattern.search(content)
-                
-                if name_match:
-                    name = name_match.group(1).strip()
-                    desc = desc_match.group(1).strip() if desc_match else ""
+                if extracted:
+                    name, desc = extracted
                     entries.append(BOFEntry(
                         name=name,
                         description=desc,
@@ -821,6 +2645,8 @@ class DirectoryStructureParser(BOFParser):
     """
 
     name = "directory_structure"
+    # Source/object file names come from the tree listing; only READMEs are read
+    checkout_patterns = ['README.md', 'readme.md', 'README.txt']
 
     GENERIC_DIR_NAMES = {'src', 'source', 'bof', 'bofs', 'kit', 'tools', '.'}
     BOF_FILE_PATTERNS = [
@@ -843,18 +2669,16 @@ class DirectoryStructureParser(BOFParser):
         """
         # Collect source files grouped by their parent directory
         dir_files: dict[str, list[tuple[str, str]]] = defaultdict(list)
-
-        for root, dirs, files in os.walk(repo_path):
-            if '.git' in root:
-                continue
-            for f in files:
-                for pattern in self.BOF_FILE_PATTERNS:
-                    match = pattern.match(f)
-                    if match:
-                        name = match.group(1)
-                        if len(name) > 2:
-                            dir_files[root].append((f, name))
-                        break
+        manifest = get_manifest(repo_path)
+
+        for f in manifest.files:
+            for pattern in self.BOF_FILE_PATTERNS:
+                match = pattern.match(f.name)
+                if match:
+                    name = match.group(1)
+                    if len(name) > 2:
+                        dir_files[f.dir].append((f.name, name))
+                    break
 
         # Derive repo name from clone directory (owner__name format)
         repo_basename = os.path.basename(repo_path)
@@ -864,15 +2688,16 @@ class DirectoryStructureParser(BOFParser):
         seen_names = set()
 
         for dir_path, files_and_names in dir_files.items():
-            dir_name = os.path.basename(dir_path)
+            dir_name = dir_path.rsplit('/', 1)[-1] if dir_path else repo_basename
             name = self._pick_bof_name(dir_name, repo_name, files_and_names)
 
             if name.lower() not in seen_names:
                 seen_names.add(name.lower())
-                desc = self._find_description(dir_path, name)
+                desc = self._find_description(manifest, dir_path, name)
                 # If in a generic subdir like src/, also check parent for README
                 if not desc and dir_name.lower() in self.GENERIC_DIR_NAMES:
-                    desc = self._find_description(os.path.dirname(dir_path), name)
+                    parent = dir_path.rsplit('/', 1)[0] if '/' in dir_path else ""
+                    desc = self._find_description(manifest, parent, name)
 
                 entries.append(BOFEntry(
                     name=name,
@@ -913,37 +2738,340 @@ class DirectoryStructureParser(BOFParser):
         # 6. Repo name (last resort)
         return clean_repo or repo_name
 
-    def _find_description(self, dir_path: str, name: str) -> str:
-        """Try to find a description for the BOF."""
+    def _find_description(self, manifest: RepoManifest, dir_path: str, name: str) -> str:
+        """Try to find a description for the BOF in dir_path (relative to the repo)."""
         for readme_name in ['README.md', 'readme.md', 'README.txt']:
-            readme_path = os.path.join(dir_path, readme_name)
-            if os.path.exists(readme_path):
-                try:
-                    with open(readme_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        for line in f:
-                            line = line.strip()
-                            if line and not line.startswith('#'):
-                                return line[:200]
-                except:
-                    pass
+            readme_rel = f"{dir_path}/{readme_name}" if dir_path else readme_name
+            doc = manifest.markdown(readme_rel)
+            if doc:
+                line = doc.first_text_line()
+                if line:
+                    return line[:200]
         return ""
 
 
+PARSER_CLASSES = [
+    ReadmeTableParser,
+    CNAParser,
+    HavocPythonParser,
+    Stage1PythonParser,
+    ReadmeBulletParser,
+    DirectoryStructureParser,
+]
+
+
+# =============================================================================
+# Parse Cache
+# =============================================================================
+
+# Bump whenever parser output can change for an unchanged repository, so that
+# cached results from older parser logic are discarded.
+PARSER_VERSION = "4"
+
+
+class ParseCache:
+    """Persistent per-repo cache of format detection and parse results.
+
+    Records are keyed by repository URL and are only reused when the
+    clone's HEAD SHA, PARSER_VERSION and the read settings (the clone's
+    layout and the MAX_FILE_BYTES/MAX_REPO_BYTES caps, see read_settings)
+    all match what was recorded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.blob_dir = os.path.join(os.path.dirname(path), "blobs")  # see BlobCache
+        self.records: dict[str, dict] = {}
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+        self.blob_hits = 0
+        self.blob_misses = 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("parser_version") == PARSER_VERSION:
+                self.records = data.get("repos", {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            pass
+
+    @staticmethod
+    def read_settings(repo: RepoInfo) -> str:
+        """What besides the HEAD and parser code decides the parse results."""
+        return f"{clone_layout(repo.local_path)}:{MAX_FILE_BYTES}:{MAX_REPO_BYTES}"
+
+    def lookup(self, repo: RepoInfo, field_name: str):
+        """Return the cached value for this repo's HEAD, or None on a miss."""
+        record = self.records.get(repo.url.lower())
+        if (repo.head_sha and record and record.get("sha") == repo.head_sha
+                and record.get("settings") == self.read_settings(repo)
+                and field_name in record):
+            self.hits[field_name] += 1
+            return record[field_name]
+        self.misses[field_name] += 1
+        return None
+
+    def store(self, repo: RepoInfo, **fields) -> None:
+        """Record results for the repo's current HEAD."""
+        if not repo.head_sha:
+            return
+        key = repo.url.lower()
+        settings = self.read_settings(repo)
+        record = self.records.get(key)
+        if not record or record.get("sha") != repo.head_sha or record.get("settings") != settings:
+            record = {"sha": repo.head_sha, "settings": settings}
+            self.records[key] = record
+        record.update(fields)
+
+    def save(self, repos: Optional[list[RepoInfo]] = None) -> None:
+        """Write the cache to disk, dropping repos no longer in the catalog
+        and per-file results that have gone unused (BlobCache.prune)."""
+        if repos is not None:
+            keep = {r.url.lower() for r in repos}
+            self.records = {k: v for k, v in self.records.items() if k in keep}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"parser_version": PARSER_VERSION, "repos": self.records}, f)
+        os.replace(tmp_path, self.path)
+        BlobCache(self.blob_dir).prune()
+
+
+class BlobCache:
+    """Per-file parser output keyed by git blob SHA, shared across repos.
+
+    Forks and copies carry byte-identical .cna, README and Havoc files; each
+    distinct file is parsed once and its result reused by every repo, and
+    every later run, that has the same blob (see RepoManifest.extract). Each
+    result is its own small JSON file under v<PARSER_VERSION>/, so parse
+    worker processes share the cache without locking.
+    """
+
+    MAX_AGE_DAYS = 30
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.root = os.path.join(cache_dir, f"v{PARSER_VERSION}")
+
+    def _path(self, kind: str, blob: str) -> str:
+        return os.path.join(self.root, kind, blob[:2], f"{blob}.json")
+
+    def get(self, kind: str, blob: str) -> Optional[dict]:
+        """The stored {"value": ...} record, or None on a miss."""
+        path = self._path(kind, blob)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            os.utime(path)  # last use, for prune()
+        except (OSError, ValueError):
+            return None
+        return record if isinstance(record, dict) and "value" in record else None
+
+    def put(self, kind: str, blob: str, value) -> None:
+        path = self._path(kind, blob)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"value": value}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def prune(self, max_age_days: float = MAX_AGE_DAYS) -> int:
+        """Delete older parser versions' results and ones unused for
+        max_age_days. Returns the number of result files removed."""
+        try:
+            versions = os.listdir(self.cache_dir)
+        except OSError:
+            return 0
+        for name in versions:
+            if name != os.path.basename(self.root):
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+        
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for dir_path, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dir_path, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+
+# =============================================================================
+# Failure Ledger
+# =============================================================================
+
+# A first failure is retried on the next run. From the second consecutive
+# failure on, the stage is held back for this many days, doubling with each
+# further failure up to FAILURE_BACKOFF_MAX_DAYS.
+FAILURE_BACKOFF_DAYS = {"not_found": 14.0}
+FAILURE_BACKOFF_DEFAULT_DAYS = 1.0
+FAILURE_BACKOFF_MAX_DAYS = 90.0
+# A stage failing for more than this share of the repos tried is an outage
+# (no network, API down) rather than a property of each repo, and is not recorded.
+FAILURE_OUTAGE_RATIO = 0.5
+
+
+class FailureLedger:
+    """Persistent record of repos whose clone or metadata lookup keeps failing.
+
+    Each failing stage ("clone" or "metadata") of a repo records its last
+    failure kind, the number of consecutive failures and when it may be
+    tried again. A success clears the stage. Rate limiting is never
+    recorded, since it says nothing about the repo itself.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.records = json.load(f).get("repos", {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            pass
+
+    def entry(self, repo: RepoInfo, stage: str) -> Optional[dict]:
+        return self.records.get(repo.url.lower(), {}).get(stage)
+
+    def due(self, repo: RepoInfo, stage: str, now: Optional[float] = None) -> bool:
+        """Whether the stage may run now, i.e. it is not inside a backoff window."""
+        entry = self.entry(repo, stage)
+        return not entry or (now or time.time()) >= entry["retry_after"]
+
+    def record(self, repo: RepoInfo, stage: str, kind: str,
+               now: Optional[float] = None) -> None:
+        now = now or time.time()
+        stages = self.records.setdefault(repo.url.lower(), {})
+        previous = stages.get(stage, {})
+        count = previous.get("count", 0) + 1
+        days = 0.0
+        if count > 1:
+            days = min(FAILURE_BACKOFF_DAYS.get(kind, FAILURE_BACKOFF_DEFAULT_DAYS)
+                       * 2 ** (count - 2), FAILURE_BACKOFF_MAX_DAYS)
+        stages[stage] = {"kind": kind, "count": count,
+                         "first_failed": previous.get("first_failed", int(now)),
+                         "last_failed": int(now), "retry_after": int(now + days * 86400)}
+
+    def clear(self, repo: RepoInfo, stage: str) -> None:
+        stages = self.records.get(repo.url.lower(), {})
+        stages.pop(stage, None)
+        if not stages:
+            self.records.pop(repo.url.lower(), None)
+
+    def save(self, repos: list[RepoInfo]) -> None:
+        """Write the ledger, dropping repos no longer in the catalog."""
+        keep = {r.url.lower() for r in repos}
+        self.records = {k: v for k, v in self.records.items() if k in keep}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"repos": self.records}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def load_existing_index(index_path: str) -> tuple[dict, dict]:
+    """Each repo's entries and detected formats in an existing bof-index.json,
+    both keyed by _normalize_repo_url ({} for a missing or unreadable file)."""
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        formats = {_normalize_repo_url(r["url"]): r.get("formats", [])
+                   for r in index_repositories(index)}
+        return index_entries(index), formats
+    except (FileNotFoundError, json.JSONDecodeError, TypeError, AttributeError, KeyError):
+        return {}, {}
+
+
+def apply_failure_backoff(repos: list[RepoInfo], ledger: FailureLedger,
+                          cache: Optional[ParseCache] = None,
+                          index_path: str = "") -> list[RepoInfo]:
+    """Hold back the stages of repos that are inside their backoff window.
+
+    A repo held back from cloning keeps the entries and detected formats
+    it had last time: the parse cache's record if there is one, else its
+    record in the existing index. Returns the repos with any stage held back.
+    """
+    previous = None
+    held = []
+    for repo in repos:
+        repo.backoff = [stage for stage in ("clone", "metadata")
+                        if not ledger.due(repo, stage)]
+        if not repo.backoff:
+            continue
+        held.append(repo)
+        if "clone" not in repo.backoff:
+            continue
+        record = cache.records.get(repo.url.lower()) if cache else None
+        if record and "entries" in record:
+            repo.bofs_found = [BOFEntry(**e) for e in record["entries"]]
+            repo.parse_formats_found = record.get("formats", [])
+            repo.formats_detected = record.get("parseable", [])
+        else:
+            if previous is None:
+                previous = load_existing_index(index_path) if index_path else ({}, {})
+            key = _normalize_repo_url(repo.url)
+            repo.bofs_found = list(previous[0].get(key, []))
+            repo.formats_detected = list(previous[1].get(key, []))
+    return held
+
+
+def update_failure_ledger(repos: list[RepoInfo], ledger: FailureLedger) -> None:
+    """Record this run's clone and metadata failures and clear successes."""
+    outcomes = {
+        # stage: [(repo, failure kind or "")] for the repos the stage ran for
+        "clone": [(r, r.clone_error) for r in repos
+                  if "clone" not in r.backoff and (r.clone_success or r.clone_error)],
+        "metadata": [(r, r.metadata_error) for r in repos
+                     if r.metadata_source == "api" or r.metadata_error],
+    }
+    for stage, results in outcomes.items():
+        failed = [(r, kind) for r, kind in results if kind and kind != "rate_limited"]
+        if len(failed) > len(results) * FAILURE_OUTAGE_RATIO:
+            print(f"  {stage} failed for {len(failed)}/{len(results)} repos; "
+                  f"treated as an outage and not recorded in the failure ledger")
+            continue
+        for repo, kind in results:
+            if not kind:
+                ledger.clear(repo, stage)
+        for repo, kind in failed:
+            ledger.record(repo, stage, kind)
+
+
+def print_held_back_repos(held: list[RepoInfo], ledger: FailureLedger,
+                          top_n: int = 10) -> None:
+    if not held:
+        return
+    cloning = sum(1 for r in held if "clone" in r.backoff)
+    print(f"  Held back after repeated failures: {cloning} clones "
+          f"(previous entries kept), {len(held) - cloning} metadata-only "
+          f"(--retry-failed to try them anyway)")
+    for repo in held[:top_n]:
+        entry = ledger.entry(repo, repo.backoff[0])
+        retry = time.strftime('%Y-%m-%d', time.localtime(entry["retry_after"]))
+        print(f"    {repo.url}: {repo.backoff[0]} {entry['kind']} x{entry['count']}, "
+              f"retry after {retry}")
+
+
 # =============================================================================
 # Main Indexer Logic
 # =============================================================================
 
-def analyze_repos(repos: list[RepoInfo]) -> dict:
-    """Analyze repositories to find which parsers can handle them."""
-    parsers = [
-        ReadmeTableParser(),
-        CNAParser(),
-        HavocPythonParser(),
-        Stage1PythonParser(),
-        ReadmeBulletParser(),
-        DirectoryStructureParser(),
-    ]
-    
+def detect_formats(repo_path: str) -> list[str]:
+    """Names of all parsers whose can_parse() accepts this repository."""
+    formats = [parser_cls.name for parser_cls in PARSER_CLASSES
+               if parser_cls().can_parse(repo_path)]
+    get_manifest(repo_path).clear_documents()
+    return formats
+
+
+def build_format_stats(repos: list[RepoInfo]) -> dict:
+    """Summarize each repo's detected formats, in catalog order, counting
+    the carried-forward formats of repos held back from cloning."""
     stats = {
         "total_repos": len(repos),
         "cloned_repos": sum(1 for r in repos if r.clone_success),
@@ -951,73 +3079,298 @@ def analyze_repos(repos: list[RepoInfo]) -> dict:
         "repos_by_format": defaultdict(list),
     }
     
+    for repo in repos:
+        if not (repo.clone_success or "clone" in repo.backoff):
+            continue
+        for name in repo.formats_detected:
+            stats["parseable_by_format"][name] += 1
+            stats["repos_by_format"][name].append(repo.name)
+    
+    return stats
+
+
+def analyze_repos(repos: list[RepoInfo], cache: Optional[ParseCache] = None) -> dict:
+    """Analyze repositories to find which parsers can handle them.
+
+    Detection only, for --analyze-only; a full run gets the same stats from
+    the parse pass (see parse_repo).
+    """
     for repo in repos:
         if not repo.clone_success:
             continue
         
-        for parser in parsers:
-            if parser.can_parse(repo.local_path):
-                stats["parseable_by_format"][parser.name] += 1
-                stats["repos_by_format"][parser.name].append(repo.name)
+        formats = cache.lookup(repo, "parseable") if cache else None
+        if formats is None:
+            formats = detect_formats(repo.local_path)
+            if cache:
+                cache.store(repo, parseable=formats)
+        repo.formats_detected = formats
     
-    return stats
+    return build_format_stats(repos)
 
 
-def parse_all_repos(repos: list[RepoInfo], use_parsers: Optional[list[str]] = None) -> list[BOFEntry]:
-    """Parse all repositories and extract BOF entries."""
-    all_parsers = [
-        ReadmeTableParser(),
-        CNAParser(),
-        HavocPythonParser(),
-        Stage1PythonParser(),
-        DirectoryStructureParser(),
-    ]
+# Only tried when the primary parsers found nothing, in this order
+FALLBACK_PARSERS = ("readme_bullet", "directory_structure")
+
+
+@dataclass
+class ParseResult:
+    """Everything parse_repo() learned about one repository."""
+    entries: list[BOFEntry]
+    formats_used: list[str]  # formats that produced entries
+    detected: list[str]      # parsers whose can_parse matched
+    timings: list[tuple[str, float, int]]  # (parser, seconds, entry count)
+    skipped: list[dict]      # files skipped or only partially read
+    blobs: list[str]         # sorted blob SHAs of the files the parsers read
+    blob_hits: int = 0       # files whose output came from the blob cache
+    blob_misses: int = 0
+
+
+def parse_repo(repo_path: str, repo_url: str, use_parsers: Optional[list[str]] = None,
+               blob_cache_dir: Optional[str] = None) -> ParseResult:
+    """Detect formats and parse one repository in a single pass.
+
+    Every parser's can_parse() runs exactly once; the matches are the repo's
+    detected formats (what analyze_repos() reports) and decide which parsers
+    go on to parse(). With blob_cache_dir, files already parsed in another
+    repo or run (same git blob) are not parsed again.
+    Module-level so it can run in a worker process.
+    """
+    parsers = {parser_cls.name: parser_cls() for parser_cls in PARSER_CLASSES}
+    manifest = get_manifest(repo_path)
+    if blob_cache_dir:
+        manifest.blob_cache = BlobCache(blob_cache_dir)
     
-    if use_parsers:
-        parsers = [p for p in all_parsers if p.name in use_parsers]
-    else:
-        # Use all except directory_structure and readme_bullet (fallbacks only)
-        parsers = [p for p in all_parsers if p.name not in ("directory_structure", "readme_bullet")]
+    detected = []
+    seconds = {}
+    counts = {}
+    for name, parser in parsers.items():
+        started = time.perf_counter()
+        if parser.can_parse(repo_path):
+            detected.append(name)
+        seconds[name] = time.perf_counter() - started
     
-    # Fallback parsers in order of preference
-    readme_bullet_parser = ReadmeBulletParser()
-    directory_fallback_parser = DirectoryStructureParser()
-    all_entries = []
+    repo_entries = []
+    formats_used = []
+
+    def run(name: str) -> None:
+        started = time.perf_counter()
+        entries = parsers[name].parse(repo_path, repo_url)
+        seconds[name] += time.perf_counter() - started
+        counts[name] = len(entries)
+        if entries:
+            repo_entries.extend(entries)
+            formats_used.append(name)
     
+    # Primary parsers (the fallbacks are only primary when asked for by name;
+    # readme_bullet never is)
+    for name in ("readme_table", "cna", "havoc_py", "stage1_py", "directory_structure"):
+        selected = name in use_parsers if use_parsers else name not in FALLBACK_PARSERS
+        if selected and name in detected:
+            run(name)
+    
+    # If no entries found, try readme_bullet first, then directory fallback
+    if not repo_entries and "readme_bullet" in detected:
+        run("readme_bullet")
+    
+    if not repo_entries and "directory_structure" not in counts:
+        run("directory_structure")
+    
+    result = ParseResult(
+        entries=repo_entries,
+        formats_used=formats_used,
+        detected=detected,
+        timings=[(name, seconds[name], counts.get(name, 0)) for name in parsers],
+        skipped=list(manifest.skipped.values()),
+        blobs=sorted(manifest.parsed_blobs),
+        blob_hits=manifest.blob_hits,
+        blob_misses=manifest.blob_misses,
+    )
+    # File contents were only shared between this repo's parsers
+    manifest.clear_documents()
+    return result
+
+
+def parse_all_repos(repos: list[RepoInfo], use_parsers: Optional[list[str]] = None,
+                    cache: Optional[ParseCache] = None, workers: int = 1,
+                    profile: Optional[RunProfile] = None,
+                    timings: Optional[JobTimings] = None) -> list[BOFEntry]:
+    """Parse all repositories and extract BOF entries.
+
+    Format detection happens in the same pass and is left on each repo's
+    formats_detected, for build_format_stats().
+
+    When a cache is given, repos whose HEAD SHA is unchanged since the cached
+    run reuse their recorded entries instead of being parsed again, and
+    files shared with a repo parsed earlier reuse that file's result (see
+    BlobCache). The cache is bypassed when a custom parser selection is
+    requested.
+
+    With workers > 1 the repos that need parsing are spread over a process
+    pool, longest first (see longest_first); results are merged back in
+    catalog order, so the output is the same as a sequential run.
+    """
+    if use_parsers:
+        cache = None
+
+    pending = []
     for repo in repos:
         if not repo.clone_success:
             continue
+        if not (cache and _restore_cached_parse(repo, cache)):
+            pending.append(repo)
+    if workers > 1:
+        pending = longest_first(pending, "parse", timings)
+    
+    paths = [r.local_path for r in pending]
+    urls = [r.url for r in pending]
+    parsers_arg = [use_parsers] * len(pending)
+    blob_dirs = [cache.blob_dir if cache else None] * len(pending)
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_repo, paths, urls, parsers_arg, blob_dirs))
+    else:
+        results = list(map(parse_repo, paths, urls, parsers_arg, blob_dirs))
+    
+    for repo, result in zip(pending, results):
+        _apply_parse_result(repo, result, cache, profile)
+    
+    return collect_entries(repos)
+
+
+def _restore_cached_parse(repo: RepoInfo, cache: ParseCache) -> bool:
+    """Fill in a repo's parse results from the cache; False if it must be parsed."""
+    cached = cache.lookup(repo, "entries")
+    detected = cache.lookup(repo, "parseable") if cached is not None else None
+    blobs = cache.lookup(repo, "blobs") if detected is not None else None
+    if blobs is None:
+        return False
+    repo.bofs_found = [BOFEntry(**e) for e in cached]
+    repo.parse_formats_found = cache.records[repo.url.lower()].get("formats", [])
+    repo.formats_detected = detected
+    repo.files_skipped = cache.records[repo.url.lower()].get("skipped", [])
+    repo.parsed_blobs = blobs
+    return True
+
+
+def _apply_parse_result(repo: RepoInfo, result: ParseResult, cache: Optional[ParseCache],
+                        profile: Optional[RunProfile]) -> None:
+    repo.bofs_found = result.entries
+    repo.parse_formats_found = result.formats_used
+    repo.formats_detected = result.detected
+    repo.files_skipped = result.skipped
+    repo.parsed_blobs = result.blobs
+    if profile:
+        profile.record_parse(repo.url, result.timings)
+    if cache:
+        cache.blob_hits += result.blob_hits
+        cache.blob_misses += result.blob_misses
+        cache.store(repo, formats=result.formats_used, parseable=result.detected,
+                    skipped=result.skipped, blobs=result.blobs,
+                    entries=[asdict(e) for e in result.entries])
+
+
+def find_identical_repos(repos: list[RepoInfo]) -> list[list[RepoInfo]]:
+    """Groups of repos whose parsed files are byte-identical (same git blobs),
+    in catalog order; a strong sign that all but one are forks or copies."""
+    groups = defaultdict(list)
+    for repo in repos:
+        if repo.clone_success and repo.parsed_blobs:
+            groups[tuple(repo.parsed_blobs)].append(repo)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def collect_entries(repos: list[RepoInfo]) -> list[BOFEntry]:
+    """All parsed entries in catalog order, including those carried forward
+    for repos held back from cloning (apply_failure_backoff)."""
+    all_entries = []
+    for repo in repos:
+        if repo.clone_success or "clone" in repo.backoff:
+            all_entries.extend(repo.bofs_found)
+    return all_entries
+
+
+def run_pipeline(repos: list[RepoInfo], repos_dir: str, clone_workers: int = 8,
+                 parse_workers: int = 1, mode: str = "full", refresh: bool = False,
+                 skip_clone: bool = False, cache: Optional[ParseCache] = None,
+                 metadata_workers: int = 12, existing_index_path: str = "",
+                 profile: Optional[RunProfile] = None,
+                 timings: Optional[JobTimings] = None,
+                 metadata_store: Optional[MetadataStore] = None,
+                 metadata_budget: int = 0) -> dict:
+    """Clone, parse and enrich repositories as overlapping stages.
+
+    Each repo is handed to the parse pool as soon as its clone lands, and
+    metadata is fetched on its own pool in the background, so a slow clone
+    only delays its own repo. Results are kept on each RepoInfo and merged in
+    catalog order afterwards (collect_entries), matching the staged run.
+    Clones start longest first by the previous run's timings; sizes are
+    not known yet since metadata is still being fetched.
+    Returns the format stats from build_format_stats().
+    """
+    os.makedirs(repos_dir, exist_ok=True)
+    if not skip_clone:
+        _remove_stale_temp_dirs(repos_dir)
+    
+    pending = {}
+    if parse_workers > 1:
+        # Clone and metadata threads are already running when workers start;
+        # forking then can copy a held lock into the child, so spawn instead.
+        parse_pool = ProcessPoolExecutor(max_workers=parse_workers,
+                                         mp_context=multiprocessing.get_context("spawn"))
+    else:
+        parse_pool = ThreadPoolExecutor(max_workers=1)
+    
+    print(f"Cloning and parsing {len(repos)} repositories in {repos_dir}...")
+    
+    limiter = AdaptiveConcurrency(clone_workers, maximum=clone_workers * 2)
+    with ThreadPoolExecutor(max_workers=1) as metadata_pool, \
+            ThreadPoolExecutor(max_workers=limiter.maximum) as clone_pool, parse_pool:
+        metadata_future = metadata_pool.submit(
+            enrich_repo_metadata, repos, metadata_workers, existing_index_path,
+            metadata_store, metadata_budget)
         
-        repo_entries = []
-        formats_used = []
+        cloning = [r for r in repos if "clone" not in r.backoff]
+        if skip_clone:
+            clone_futures = {clone_pool.submit(use_local_clone, repo, repos_dir): repo
+                             for repo in cloning}
+        else:
+            clone_futures = {clone_pool.submit(fetch_repo, repo, repos_dir, mode, refresh,
+                                               profile, limiter): repo
+                             for repo in longest_first(cloning, "clone", timings)}
         
-        # Try each parser
-        for parser in parsers:
-            if parser.can_parse(repo.local_path):
-                entries = parser.parse(repo.local_path, repo.url)
-                if entries:
-                    repo_entries.extend(entries)
-                    formats_used.append(parser.name)
+        completed = 0
+        for future in as_completed(clone_futures):
+            repo = clone_futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                # Only this repo is lost, as in the staged run
+                print(f"  Error cloning {repo.url}: {e!r}")
+                repo.clone_success = False
+                repo.clone_error = "error"
+            completed += 1
+            if completed % 20 == 0:
+                print(f"  Progress: {completed}/{len(cloning)} repositories processed")
+            if not repo.clone_success:
+                continue
+            
+            if not (cache and _restore_cached_parse(repo, cache)):
+                pending[parse_pool.submit(parse_repo, repo.local_path, repo.url, None,
+                                          cache.blob_dir if cache else None)] = repo
         
-        # If no entries found, try readme_bullet first, then directory fallback
-        if not repo_entries:
-            if readme_bullet_parser.can_parse(repo.local_path):
-                entries = readme_bullet_parser.parse(repo.local_path, repo.url)
-                if entries:
-                    repo_entries.extend(entries)
-                    formats_used.append(readme_bullet_parser.name)
+        successful = sum(1 for r in repos if r.clone_success)
+        print(f"  {successful}/{len(cloning)} repositories available, "
+              f"{len(pending)} queued for parsing")
+        if not skip_clone:
+            print_clone_summary(repos, limiter)
         
-        if not repo_entries:
-            entries = directory_fallback_parser.parse(repo.local_path, repo.url)
-            if entries:
-                repo_entries.extend(entries)
-                formats_used.append(directory_fallback_parser.name)
+        for future in as_completed(pending):
+            _apply_parse_result(pending[future], future.result(), cache, profile)
         
-        repo.bofs_found = repo_entries
-        repo.parse_formats_found = formats_used
-        all_entries.extend(repo_entries)
+        metadata_future.result()
     
-    return all_entries
+    return build_format_stats(repos)
 
 
 def deduplicate_entries(entries: list[BOFEntry]) -> list[BOFEntry]:
@@ -1044,6 +3397,185 @@ def attach_repo_metadata(entries: list[BOFEntry], repos: list[RepoInfo]) -> None
         entry.repository_last_updated = last_updated
 
 
+def parse_shard(value: str) -> tuple[int, int]:
+    """argparse type for --shard: "i/N" with 1 <= i <= N."""
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"expected i/N with 1 <= i <= N, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def default_output_path(shard: Optional[tuple[int, int]]) -> str:
+    """The --output default: the index itself, or for --shard a partial index
+    file of its own, so a forgotten --output never replaces the real index."""
+    if shard:
+        return f"bof-index.shard-{shard[0]}-of-{shard[1]}.json"
+    return "bof-index.json"
+
+
+def select_shard(repos: list[RepoInfo], index: int, count: int) -> list[RepoInfo]:
+    """The repos of shard `index` (1-based) out of `count`, in catalog order.
+
+    Repos are assigned by a hash of their URL, so adding or removing catalog
+    rows does not move the other repos to a different shard.
+    """
+    return [r for r in repos
+            if int(hashlib.sha1(r.url.lower().encode("utf-8")).hexdigest(), 16) % count
+            == index - 1]
+
+
+def shard_metadata(repos: list[RepoInfo], catalog: list[RepoInfo],
+                   index: int, count: int) -> dict:
+    """Shard info for a partial index: which shard it is and the catalog
+    position of each of its repositories, for merge_indexes."""
+    positions = {id(r): position for position, r in enumerate(catalog)}
+    return {"index": index, "count": count, "positions": [positions[id(r)] for r in repos]}
+
+
+def repository_records(repos: list[RepoInfo]) -> list[dict]:
+    """Per-repo records kept in the index metadata: URL and detected formats."""
+    return [{"url": r.url,
+             "formats": r.formats_detected if r.clone_success or "clone" in r.backoff else []}
+            for r in repos]
+
+
+def build_index(entries: list[BOFEntry], repositories: list[dict]) -> dict:
+    """The bof-index.json document for entries and repository_records(), both
+    in catalog order. Totals and format stats are computed from them."""
+    format_stats = defaultdict(int)
+    for repo in repositories:
+        for name in repo["formats"]:
+            format_stats[name] += 1
+    return {
+        "metadata": {
+            "total_bofs": len(entries),
+            "total_repos": len(repositories),
+            "repos_parsed": len({e.repository.lower() for e in entries}),
+            "format_stats": dict(format_stats),
+            "repositories": repositories,
+        },
+        "bofs": [asdict(e) for e in entries]
+    }
+
+
+def _normalize_repo_url(url: str) -> str:
+    return url.strip().rstrip('/').lower()
+
+
+def index_entries(index: dict) -> dict[str, list[BOFEntry]]:
+    """Each repo's entries in a loaded index, keyed by _normalize_repo_url."""
+    entries = defaultdict(list)
+    names = {f.name for f in fields(BOFEntry)}
+    for bof in index.get("bofs", []):
+        entry = BOFEntry(**{k: v for k, v in bof.items() if k in names})
+        entries[_normalize_repo_url(entry.repository)].append(entry)
+    return entries
+
+
+def index_repositories(index: dict) -> list[dict]:
+    """The repository records of a loaded index (see repository_records).
+
+    Indexes written before the records were added only have the entries;
+    for those the records are rebuilt from bofs[].repository, in order of
+    first appearance, with each repo's entry formats as its formats. Repos
+    that had no entries are missing from such a list.
+    """
+    metadata = index.get("metadata", {})
+    if "repositories" in metadata:
+        return metadata["repositories"]
+    records = {}
+    for bof in index.get("bofs", []):
+        key = _normalize_repo_url(bof["repository"])
+        record = records.setdefault(key, {"url": bof["repository"], "formats": []})
+        if bof.get("source_format") and bof["source_format"] not in record["formats"]:
+            record["formats"].append(bof["source_format"])
+    return list(records.values())
+
+
+def merge_indexes(partials: list[dict]) -> dict:
+    """Combine the partial indexes of all shards of a run into one index.
+
+    Entries are put back in catalog order and deduplicated as in a single
+    run, and the metadata totals and format stats are recomputed, so the
+    result matches what one unsharded run would have written.
+    """
+    shards = [p.get("metadata", {}).get("shard") for p in partials]
+    if not shards or None in shards:
+        raise ValueError("only partial indexes written with --shard can be merged")
+    count = shards[0]["count"]
+    found = sorted(shard["index"] for shard in shards)
+    if any(shard["count"] != count for shard in shards) or found != list(range(1, count + 1)):
+        raise ValueError(f"expected shards 1-{count} of {count}, got {found}")
+
+    repos = sorted((position, record)
+                   for partial, shard in zip(partials, shards)
+                   for position, record in zip(shard["positions"],
+                                               partial["metadata"]["repositories"]))
+    by_repo = defaultdict(list)
+    for partial in partials:
+        for key, repo_entries in index_entries(partial).items():
+            by_repo[key].extend(repo_entries)
+    entries = [e for _, record in repos for e in by_repo[_normalize_repo_url(record["url"])]]
+    return build_index(deduplicate_entries(entries), [record for _, record in repos])
+
+
+def select_targets(catalog: list[RepoInfo], index: dict,
+                   requested: list[str]) -> tuple[list[RepoInfo], list[str]]:
+    """Repos a targeted run must index, and URLs of repos to drop.
+
+    The targets are the catalog repos missing from the index, those whose
+    last targeted fetch failed (see splice_index), and the requested ones;
+    the dropped repos are those in the index but no longer in the catalog.
+    Raises ValueError for a requested URL not in the catalog.
+    """
+    indexed = {_normalize_repo_url(r["url"]) for r in index_repositories(index)
+               if not r.get("fetch_failed")}
+    in_catalog = {_normalize_repo_url(r.url) for r in catalog}
+    unknown = [url for url in requested if _normalize_repo_url(url) not in in_catalog]
+    if unknown:
+        raise ValueError(f"not in the catalog: {', '.join(unknown)}")
+    wanted = {_normalize_repo_url(url) for url in requested}
+    targets = [r for r in catalog
+               if _normalize_repo_url(r.url) in wanted or _normalize_repo_url(r.url) not in indexed]
+    removed = [r["url"] for r in index_repositories(index)
+               if _normalize_repo_url(r["url"]) not in in_catalog]
+    return targets, removed
+
+
+def splice_index(index: dict, catalog: list[RepoInfo], targets: list[RepoInfo],
+                 entries: list[BOFEntry]) -> dict:
+    """The existing index with the targets' entries replaced by `entries`.
+
+    Every other catalog repo keeps its entries and record from the index;
+    repos no longer in the catalog are dropped. A target that could not be
+    fetched keeps its previous entries too, and its record is marked with
+    "fetch_failed" (the failure kind) so the next targeted run retries it.
+    """
+    previous = {_normalize_repo_url(r["url"]): r for r in index_repositories(index)}
+    previous_entries = index_entries(index)
+    fetched = [r for r in targets if r.clone_success or "clone" in r.backoff]
+    fresh = {_normalize_repo_url(r["url"]): r for r in repository_records(fetched)}
+    failed = {_normalize_repo_url(r.url): r.clone_error or "error"
+              for r in targets if not (r.clone_success or "clone" in r.backoff)}
+    fresh_entries = defaultdict(list)
+    for entry in entries:
+        fresh_entries[_normalize_repo_url(entry.repository)].append(entry)
+
+    records, spliced = [], []
+    for repo in catalog:
+        key = _normalize_repo_url(repo.url)
+        if key in fresh:
+            records.append(fresh[key])
+            spliced.extend(fresh_entries[key])
+        else:
+            record = previous.get(key, {"url": repo.url, "formats": []})
+            if key in failed:
+                record = {**record, "fetch_failed": failed[key]}
+            records.append(record)
+            spliced.extend(previous_entries[key])
+    return build_index(deduplicate_entries(spliced), records)
+
+
 # =============================================================================
 # Main Entry Point
 # =============================================================================
@@ -1052,6 +3584,18 @@ def main():
     parser = argparse.ArgumentParser(
         description="Index BOF repositories and extract BOF names/descriptions."
     )
+    subcommands = parser.add_subparsers(dest="command", metavar="{merge}")
+    merge_parser = subcommands.add_parser(
+        "merge",
+        help="Combine the partial indexes written with --shard i/N into one index",
+        description="Combine the partial indexes written with --shard i/N into one index."
+    )
+    merge_parser.add_argument("partials", nargs="+", help="Partial index files, one per shard")
+    merge_parser.add_argument(
+        "--output",
+        default="bof-index.json",
+        help="Output JSON file path"
+    )
     parser.add_argument(
         "--catalog",
         default="BOF-CATALOG.md",
@@ -1064,8 +3608,8 @@ def main():
     )
     parser.add_argument(
         "--output",
-        default="bof-index.json",
-        help="Output JSON file path"
+        help="Output JSON file path (default: bof-index.json, or "
+             "bof-index.shard-<i>-of-<N>.json with --shard)"
     )
     parser.add_argument(
         "--analyze-only",
@@ -1077,14 +3621,102 @@ def main():
         action="store_true",
         help="Skip cloning, assume repos are already present"
     )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Update existing clones whose remote HEAD has moved (probed with git ls-remote)"
+    )
+    parser.add_argument(
+        "--fetch-mode",
+        choices=["full", "sparse", "bare", "shared", "tarball"],
+        default="full",
+        help="full: shallow clone of the whole tree; sparse: blobless partial clone "
+             "that checks out only the files the parsers read; bare: bare clone whose "
+             "files are read straight from the object store; shared: bare clones that "
+             "share one object store in the cache dir, so forks download common "
+             "objects once; tarball: stream the "
+             "GitHub archive and extract only those files, without git (BOF_TARBALL_URL)"
+    )
     parser.add_argument(
         "--max-workers",
         type=int,
         default=8,
         help="Maximum parallel clone operations"
     )
+    parser.add_argument(
+        "--cache-dir",
+        default=".bof-cache",
+        help="Directory for state persisted between runs (parse cache, etc.)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-parse every repository instead of reusing cached results"
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=1,
+        help="Parse repositories in N worker processes (output is unchanged)"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Overlap clone, parse and metadata fetching instead of running them "
+             "as separate steps (output is unchanged)"
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="i/N",
+        help="Only index shard i of N (1-based) of the catalog and write a partial "
+             "index; combine all N with the merge subcommand"
+    )
+    parser.add_argument(
+        "--changed",
+        action="store_true",
+        help="Targeted reindex: index only catalog repos missing from the existing "
+             "index (plus any --repo), drop repos no longer in the catalog, and "
+             "update the index in place"
+    )
+    parser.add_argument(
+        "--repo",
+        action="append",
+        default=[],
+        metavar="URL",
+        help="Targeted reindex of this catalog repo (repeatable); implies --changed"
+    )
+    parser.add_argument(
+        "--metadata-budget",
+        type=int,
+        default=0,
+        help="Look up metadata for at most N due repos per run, most overdue first "
+             "(0 = all due repos)"
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Clone and look up repos in the failure ledger even if their backoff "
+             "window has not passed"
+    )
+    parser.add_argument(
+        "--profile-out",
+        help="Write per-stage, per-repo clone and per-parser timings to this JSON file"
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        help="Number of slowest clones/parser runs to print with --profile-out"
+    )
     
     args = parser.parse_args()
+    if args.command == "merge":
+        merge_main(args, merge_parser)
+        return
+    targeted = args.changed or bool(args.repo)
+    if targeted and (args.shard or args.analyze_only):
+        parser.error("--changed/--repo cannot be combined with --shard or --analyze-only")
     
     # Get script directory to resolve relative paths
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -1092,53 +3724,86 @@ def main():
     
     catalog_path = os.path.join(root_dir, args.catalog)
     repos_dir = os.path.join(root_dir, args.repos_dir)
-    output_path = os.path.join(root_dir, args.output)
+    output_path = os.path.join(root_dir, args.output or default_output_path(args.shard))
+    cache_dir = os.path.join(root_dir, args.cache_dir)
+    shared_objects.path = os.path.join(cache_dir, "objects.git")
+    parse_cache = None
+    if not args.no_cache:
+        parse_cache = ParseCache(os.path.join(cache_dir, "parse-cache.json"))
+    timings = JobTimings(os.path.join(cache_dir, "timings.json"))
+    ledger = FailureLedger(os.path.join(cache_dir, "failures.json"))
+    metadata_store = MetadataStore(os.path.join(cache_dir, "metadata.json"))
+    profile = RunProfile()
     
     # Step 1: Extract URLs
+    profile.begin("extract_urls")
     print("Step 1: Extracting repository URLs from catalog...")
-    repos = extract_repo_urls_from_catalog(catalog_path)
+    catalog = repos = extract_repo_urls_from_catalog(catalog_path)
     print(f"  Found {len(repos)} unique repositories")
+    if args.shard:
+        repos = select_shard(catalog, *args.shard)
+        print(f"  Shard {args.shard[0]}/{args.shard[1]}: {len(repos)} repositories")
+    if targeted:
+        try:
+            with open(output_path, 'r', encoding='utf-8') as f:
+                existing_index = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"--changed/--repo need an existing index at {output_path}; "
+                         f"run a full rebuild first ({e!r})")
+        if "repositories" not in existing_index.get("metadata", {}):
+            print("  Existing index has no repositories list; using the repos of its entries")
+        try:
+            repos, removed = select_targets(catalog, existing_index, args.repo)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"  Targeted reindex: {len(repos)} repositories to index, "
+              f"{len(removed)} removed from the catalog")
+        for url in removed:
+            print(f"    - {url}")
+    if not args.retry_failed:
+        held = apply_failure_backoff(repos, ledger, parse_cache, output_path)
+        print_held_back_repos(held, ledger)
     
-    # Step 2: Clone repositories
-    if not args.skip_clone:
-        print("\nStep 2: Cloning repositories...")
-        repos = clone_all_repos(repos, repos_dir, max_workers=args.max_workers)
+    if args.pipeline and not args.analyze_only:
+        # Steps 2-4 overlapped: each repo is parsed as soon as it is cloned
+        profile.begin("pipeline")
+        print("\nSteps 2-4: Cloning, fetching metadata and parsing as a pipeline...")
+        stats = run_pipeline(repos, repos_dir, clone_workers=args.max_workers,
+                             parse_workers=args.parse_workers, mode=args.fetch_mode,
+                             refresh=args.refresh, skip_clone=args.skip_clone,
+                             cache=parse_cache,
+                             metadata_workers=min(args.max_workers * 2, 24),
+                             existing_index_path=output_path, profile=profile,
+                             timings=timings, metadata_store=metadata_store,
+                             metadata_budget=args.metadata_budget)
+        print_format_coverage(stats)
+        entries = collect_entries(repos)
+        print(f"\n  Found {len(entries)} total BOF entries")
     else:
-        print("\nStep 2: Skipping clone, checking existing repos...")
-        for repo in repos:
-            local_path = os.path.join(repos_dir, f"{repo.owner}__{repo.name}")
-            repo.local_path = local_path
-            repo.clone_success = os.path.exists(local_path)
-        successful = sum(1 for r in repos if r.clone_success)
-        print(f"  Found {successful}/{len(repos)} repositories locally")
-
-    # Step 2.5: Repository metadata for UI sorting
-    print("\nStep 2.5: Fetching repository metadata (stars, last updated)...")
-    repos = enrich_repo_metadata(repos, max_workers=min(args.max_workers * 2, 24),
-                                 existing_index_path=output_path)
-    
-    # Step 3: Analyze formats
-    print("\nStep 3: Analyzing documentation formats...")
-    stats = analyze_repos(repos)
-    
-    print(f"\nFormat Coverage Analysis:")
-    print(f"  Total repositories: {stats['total_repos']}")
-    print(f"  Successfully cloned: {stats['cloned_repos']}")
-    print(f"\n  Parseable by format:")
-    for fmt, count in sorted(stats['parseable_by_format'].items(), key=lambda x: -x[1]):
-        pct = count / stats['cloned_repos'] * 100 if stats['cloned_repos'] > 0 else 0
-        print(f"    {fmt}: {count} repos ({pct:.1f}%)")
-    
-    if args.analyze_only:
-        print("\n--analyze-only specified, stopping here.")
-        return
+        entries, stats = run_stages(args, repos, catalog, repos_dir, output_path,
+                                    parse_cache, profile, timings, metadata_store)
+        if entries is None:
+            return
     
-    # Step 4: Parse all repositories
-    print("\nStep 4: Parsing BOF entries from all repositories...")
-    entries = parse_all_repos(repos)
-    print(f"  Found {len(entries)} total BOF entries")
+    # Stores are pruned against the whole catalog, so shards can share a cache dir
+    timings.update(profile)
+    timings.save(catalog)
+    update_failure_ledger(repos, ledger)
+    ledger.save(catalog)
+    metadata_store.save(catalog)
+    if os.path.isdir(shared_objects.path):
+        shared_objects.prune(catalog)
+    if parse_cache:
+        parse_cache.save(catalog)
+        print(f"  Parse cache: reused {parse_cache.hits['entries']} repos, "
+              f"parsed {parse_cache.misses['entries']} "
+              f"({parse_cache.blob_hits}/{parse_cache.blob_hits + parse_cache.blob_misses} "
+              f"files reused by git blob)")
+    print_skipped_files(repos)
+    print_identical_repos(repos)
     
     # Step 5: Deduplicate
+    profile.begin("deduplicate_sanitize")
     entries = deduplicate_entries(entries)
     print(f"  After deduplication: {len(entries)} unique BOF entries")
 
@@ -1151,23 +3816,157 @@ def main():
     attach_repo_metadata(entries, repos)
     
     # Step 6: Output JSON
+    profile.begin("write_output")
     print(f"\nStep 5: Writing output to {output_path}...")
-    output_data = {
-        "metadata": {
-            "total_bofs": len(entries),
-            "total_repos": len(repos),
-            "repos_parsed": sum(1 for r in repos if r.bofs_found),
-            "format_stats": dict(stats['parseable_by_format']),
-        },
-        "bofs": [asdict(e) for e in entries]
-    }
+    if targeted:
+        output_data = splice_index(existing_index, catalog, repos, entries)
+        kept = [r["url"] for r in output_data["metadata"]["repositories"] if r.get("fetch_failed")]
+        if kept:
+            print(f"  Kept the previous entries of {len(kept)} repos that could not be fetched:")
+            for url in kept:
+                print(f"    - {url}")
+    else:
+        output_data = build_index(entries, repository_records(repos))
+    if args.shard:
+        output_data["metadata"]["shard"] = shard_metadata(repos, catalog, *args.shard)
     
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(output_data, f, indent=2)
     
     print(f"\nDone! BOF index written to {output_path}")
-    print(f"  Total BOFs indexed: {len(entries)}")
-    print(f"  Repositories with BOFs: {sum(1 for r in repos if r.bofs_found)}")
+    print(f"  Total BOFs indexed: {output_data['metadata']['total_bofs']}")
+    print(f"  Repositories with BOFs: {output_data['metadata']['repos_parsed']}")
+    http_cache.print_summary(file=sys.stdout)
+    _finish_profile(profile, args)
+
+
+def merge_main(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    """The merge subcommand: write the index merged from args.partials."""
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    partials = []
+    for path in args.partials:
+        with open(os.path.join(root_dir, path), 'r', encoding='utf-8') as f:
+            partials.append(json.load(f))
+    try:
+        output_data = merge_indexes(partials)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output_path = os.path.join(root_dir, args.output)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(output_data, f, indent=2)
+    print(f"Merged {len(partials)} shards into {output_path}: "
+          f"{output_data['metadata']['total_bofs']} BOFs from "
+          f"{output_data['metadata']['repos_parsed']} repositories")
+
+
+def run_stages(args: argparse.Namespace, repos: list[RepoInfo], catalog: list[RepoInfo],
+               repos_dir: str, output_path: str, parse_cache: Optional[ParseCache],
+               profile: RunProfile, timings: JobTimings,
+               metadata_store: MetadataStore) -> tuple[Optional[list[BOFEntry]], dict]:
+    """Steps 2-4 as separate steps: fetch all metadata, clone all, then parse.
+
+    Metadata comes first so clone timeouts can scale with repo size.
+    Returns (None, stats) when --analyze-only stopped the run early.
+    """
+    # Step 2: Repository metadata for UI sorting and clone timeouts
+    profile.begin("metadata")
+    print("\nStep 2: Fetching repository metadata (stars, last updated, size)...")
+    enrich_repo_metadata(repos, max_workers=min(args.max_workers * 2, 24),
+                         existing_index_path=output_path, store=metadata_store,
+                         budget=args.metadata_budget)
+
+    # Step 2.5: Clone repositories
+    profile.begin("clone")
+    if not args.skip_clone:
+        print("\nStep 2.5: Cloning repositories...")
+        clone_all_repos(repos, repos_dir, max_workers=args.max_workers,
+                        refresh=args.refresh, mode=args.fetch_mode, profile=profile,
+                        timings=timings)
+    else:
+        print("\nStep 2.5: Skipping clone, checking existing repos...")
+        cloning = [r for r in repos if "clone" not in r.backoff]
+        for repo in cloning:
+            use_local_clone(repo, repos_dir)
+        successful = sum(1 for r in cloning if r.clone_success)
+        print(f"  Found {successful}/{len(cloning)} repositories locally")
+    
+    if args.analyze_only:
+        # Step 3: Detection only, without parsing
+        profile.begin("analyze")
+        print("\nStep 3: Analyzing documentation formats...")
+        stats = analyze_repos(repos, cache=parse_cache)
+        print_format_coverage(stats)
+        if parse_cache:
+            parse_cache.save(catalog)
+        print("\n--analyze-only specified, stopping here.")
+        http_cache.print_summary(file=sys.stdout)
+        _finish_profile(profile, args)
+        return None, stats
+    
+    # Steps 3-4: Detect formats and parse all repositories in one pass
+    profile.begin("parse")
+    print("\nSteps 3-4: Analyzing formats and parsing BOF entries from all repositories...")
+    entries = parse_all_repos(repos, cache=parse_cache, workers=args.parse_workers,
+                              profile=profile, timings=timings)
+    stats = build_format_stats(repos)
+    print_format_coverage(stats)
+    print(f"\n  Found {len(entries)} total BOF entries")
+    return entries, stats
+
+
+def print_format_coverage(stats: dict) -> None:
+    print(f"\nFormat Coverage Analysis:")
+    print(f"  Total repositories: {stats['total_repos']}")
+    print(f"  Successfully cloned: {stats['cloned_repos']}")
+    print(f"\n  Parseable by format:")
+    for fmt, count in sorted(stats['parseable_by_format'].items(), key=lambda x: -x[1]):
+        pct = count / stats['cloned_repos'] * 100 if stats['cloned_repos'] > 0 else 0
+        print(f"    {fmt}: {count} repos ({pct:.1f}%)")
+
+
+SKIP_REASONS = {
+    "binary": "binary",
+    "mapped": "scanned without decoding (over per-file limit)",
+    "truncated": "README head only (over per-file limit)",
+    "too_large": "over per-file limit",
+    "repo_budget": "repo read budget exhausted",
+}
+
+
+def print_skipped_files(repos: list[RepoInfo], top_n: int = 10) -> None:
+    """Summarize files the parsers skipped or only partially read."""
+    skipped = [(repo, f) for repo in repos if repo.clone_success for f in repo.files_skipped]
+    if not skipped:
+        return
+    counts = defaultdict(int)
+    for _, f in skipped:
+        counts[f["reason"]] += 1
+    print(f"  Files not fully read: {len(skipped)} ("
+          + ", ".join(f"{n} {SKIP_REASONS.get(reason, reason)}" for reason, n in counts.items())
+          + ")")
+    for repo, f in sorted(skipped, key=lambda item: -item[1]["bytes"])[:top_n]:
+        print(f"    {f['bytes'] / (1024 * 1024):8.1f} MB  {f['reason']:<12} {repo.url}  {f['path']}")
+
+
+def print_identical_repos(repos: list[RepoInfo]) -> None:
+    """List repos whose parsed file set is identical to another repo's."""
+    groups = find_identical_repos(repos)
+    if not groups:
+        return
+    print(f"  Repos with identical parsed files (likely forks): {len(groups)} groups")
+    for group in groups:
+        print("    " + " = ".join(repo.url for repo in group))
+
+
+def _finish_profile(profile: RunProfile, args: argparse.Namespace) -> None:
+    """Write and summarize the run profile if --profile-out was given."""
+    if not args.profile_out:
+        return
+    profile.end()
+    profile.write(args.profile_out)
+    profile.print_report(args.profile_top)
+    print(f"\nProfile written to {args.profile_out}")
 
 
 if __name__ == "__main__":
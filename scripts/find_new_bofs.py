@@ -29,6 +29,7 @@ _SEARCH_RETRY_BACKOFF_SEC = 1
 
 sys.path.insert(0, str(Path(__file__).parent))
 from sanitize import sanitize_description
+import http_cache
 from repo_checks import (
     build_github_headers,
     check_binary_files,
@@ -69,7 +70,7 @@ def _github_api_get(url: str, headers: dict, params: dict = None):
     """
     for attempt in range(_SEARCH_REQUEST_RETRIES):
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = http_cache.get(url, headers=headers, params=params, timeout=30)
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
             reason = f"network error: {exc}"
         else:
@@ -565,6 +566,8 @@ def main():
         if not args.markdown:
             print()  # Blank line between entries
 
+    http_cache.print_summary()
+
 
 if __name__ == "__main__":
     main()
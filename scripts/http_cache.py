@@ -0,0 +1,269 @@
+"""Persistent conditional-request HTTP cache shared by the catalog scripts.
+
+Responses carrying an ETag or Last-Modified validator are stored on disk and
+revalidated with If-None-Match / If-Modified-Since on the next request.
+Unchanged resources come back as 304 Not Modified, which GitHub does not
+count against the API rate limit, and are served from the stored copy.
+
+The cache lives in .bof-cache/http/ by default. Set BOF_HTTP_CACHE_DIR to move
+it, BOF_HTTP_CACHE_MAX_MB to change the size bound (least recently used
+entries are evicted first), or BOF_HTTP_CACHE=0 to disable it.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".bof-cache" / "http"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Response headers kept with a cached body; rate-limit headers always come
+# from the live (304) response instead.
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+
+class HTTPCache:
+    """On-disk store of validated responses with size-bounded LRU eviction."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._size = None  # total bytes on disk, computed lazily
+
+    def get(self, url, headers=None, params=None, timeout=30, allow_redirects=True):
+        """Conditional GET; same call shape and return type as requests.get."""
+        return self._request("GET", url, headers, params, timeout, allow_redirects)
+
+    def head(self, url, headers=None, timeout=30, allow_redirects=True):
+        """Conditional HEAD; same call shape and return type as requests.head."""
+        return self._request("HEAD", url, headers, None, timeout, allow_redirects)
+
+    def _request(self, method, url, headers, params, timeout, allow_redirects=True):
+        headers = dict(headers or {})
+        if not self.enabled:
+            return self._send(method, url, headers, params, timeout, allow_redirects)
+
+        key = self._key(method, url, headers, params, allow_redirects)
+        entry = self._load(key)
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self._send(method, url, headers, params, timeout, allow_redirects)
+
+        if entry and response.status_code == 304:
+            cached = self._from_entry(key, entry, response)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                self._touch(key)
+                return cached
+            # The body was evicted after _load; drop the entry and fetch in full
+            self._drop(key)
+            headers.pop("If-None-Match", None)
+            headers.pop("If-Modified-Since", None)
+            response = self._send(method, url, headers, params, timeout, allow_redirects)
+
+        with self._lock:
+            self.misses += 1
+        if response.status_code == 200:
+            self._store(key, url, response)
+        return response
+
+    @staticmethod
+    def _send(method, url, headers, params, timeout, allow_redirects):
+        if method == "HEAD":
+            return requests.head(url, headers=headers, timeout=timeout,
+                                 allow_redirects=allow_redirects)
+        return requests.get(url, headers=headers, params=params, timeout=timeout,
+                            allow_redirects=allow_redirects)
+
+    @staticmethod
+    def _key(method, url, headers, params, allow_redirects=True):
+        # Responses differ by media type, by whether redirects were followed
+        # and by credential, so Accept, allow_redirects and a hash of the
+        # Authorization header are part of the key.
+        accept = next((v for k, v in headers.items() if k.lower() == "accept"), "")
+        auth = next((v for k, v in headers.items() if k.lower() == "authorization"), "")
+        auth_hash = hashlib.sha256(auth.encode("utf-8")).hexdigest() if auth else ""
+        raw = json.dumps([method, url, sorted((params or {}).items()), accept, allow_redirects,
+                          auth_hash], default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = self.cache_dir / key[:2] / key
+        return base.with_suffix(".json"), base.with_suffix(".body")
+
+    def _load(self, key):
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not body_path.exists():
+            return None
+        return entry
+
+    def _from_entry(self, key, entry, live_response):
+        """Rebuild a 200 response from the cache, keeping the live headers.
+
+        Returns None if the stored body can no longer be read.
+        """
+        _, body_path = self._paths(key)
+        try:
+            content = body_path.read_bytes()
+        except OSError:
+            return None
+        response = requests.Response()
+        response.status_code = entry.get("status", 200)
+        response.url = entry.get("url", live_response.url)
+        response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+        response.headers.update(getattr(live_response, "headers", {}) or {})
+        response.encoding = entry.get("encoding")
+        response._content = content
+        response.request = getattr(live_response, "request", None)
+        return response
+
+    def _store(self, key, url, response):
+        resp_headers = getattr(response, "headers", None) or {}
+        etag = resp_headers.get("ETag")
+        last_modified = resp_headers.get("Last-Modified")
+        if not isinstance(etag, str) and not isinstance(last_modified, str):
+            return
+        content = response.content if isinstance(response.content, bytes) else b""
+        entry = {
+            "url": url,
+            "status": response.status_code,
+            "etag": etag if isinstance(etag, str) else "",
+            "last_modified": last_modified if isinstance(last_modified, str) else "",
+            "encoding": response.encoding if isinstance(response.encoding, str) else None,
+            "headers": {h: resp_headers[h] for h in _STORED_HEADERS
+                        if isinstance(resp_headers.get(h), str)},
+        }
+        meta_path, body_path = self._paths(key)
+        try:
+            meta_path.parent.mkdir(parents=True, exist_ok=True)
+            _atomic_write(body_path, content)
+            _atomic_write(meta_path, json.dumps(entry).encode("utf-8"))
+        except OSError:
+            return
+        with self._lock:
+            self.stored += 1
+            if self._size is not None:
+                self._size += len(content)
+        self._evict_if_needed()
+
+    def _drop(self, key):
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        with self._lock:
+            self._size = None  # recounted on the next store
+
+    def _touch(self, key):
+        meta_path, _ = self._paths(key)
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """(last_used, bytes, meta_path, body_path) for every cached response."""
+        entries = []
+        for meta_path in self.cache_dir.glob("*/*.json"):
+            body_path = meta_path.with_suffix(".body")
+            try:
+                size = meta_path.stat().st_size + body_path.stat().st_size
+                entries.append((meta_path.stat().st_mtime, size, meta_path, body_path))
+            except OSError:
+                continue
+        return entries
+
+    def _evict_if_needed(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(e[1] for e in self._entries())
+            if self._size <= self.max_bytes:
+                return
+            # Evict down to 90% of the bound so we don't rescan on every store
+            for _, size, meta_path, body_path in sorted(self._entries()):
+                if self._size <= self.max_bytes * 0.9:
+                    break
+                for path in (meta_path, body_path):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+                self._size -= size
+                self.evicted += 1
+
+    def summary(self):
+        total = self.hits + self.misses
+        if not self.enabled:
+            return "HTTP cache: disabled"
+        line = (f"HTTP cache: {self.hits}/{total} requests served from cache (304), "
+                f"{self.misses} misses, {self.stored} stored")
+        if self.evicted:
+            line += f", {self.evicted} evicted"
+        return line
+
+
+def _atomic_write(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _default_cache():
+    cache_dir = os.environ.get("BOF_HTTP_CACHE_DIR") or DEFAULT_CACHE_DIR
+    try:
+        max_bytes = int(float(os.environ.get("BOF_HTTP_CACHE_MAX_MB", "")) * 1024 * 1024)
+    except ValueError:
+        max_bytes = DEFAULT_MAX_BYTES
+    enabled = os.environ.get("BOF_HTTP_CACHE", "1") != "0"
+    return HTTPCache(cache_dir, max_bytes=max_bytes, enabled=enabled)
+
+
+_cache = _default_cache()
+
+
+def get(url, headers=None, params=None, timeout=30, allow_redirects=True):
+    """requests.get through the shared cache."""
+    return _cache.get(url, headers=headers, params=params, timeout=timeout,
+                      allow_redirects=allow_redirects)
+
+
+def head(url, headers=None, timeout=30, allow_redirects=True):
+    """requests.head through the shared cache."""
+    return _cache.head(url, headers=headers, timeout=timeout, allow_redirects=allow_redirects)
+
+
+def print_summary(file=sys.stderr):
+    """Print the shared cache's hit/miss counts for this run."""
+    print(_cache.summary(), file=file)
@@ -15,6 +15,9 @@ from pathlib import Path
 
 import requests
 
+sys.path.insert(0, str(Path(__file__).parent))
+import http_cache
+
 CATALOG_PATH = Path(__file__).parent.parent / "BOF-CATALOG.md"
 REPO_URL_RE = re.compile(
     r"\|\s*\[[^\]]+\]\((https?://github\.com/([^/\s\)]+)/([^/\s\)]+))\)"
@@ -36,7 +39,7 @@ def check_repo_alive(owner, name, headers):
     """
     url = f"https://api.github.com/repos/{owner}/{name}"
     try:
-        resp = requests.head(url, headers=headers, timeout=15, allow_redirects=True)
+        resp = http_cache.head(url, headers=headers, timeout=15, allow_redirects=True)
     except requests.RequestException:
         return True  # network error — assume alive, don't remove
     if resp.status_code in _DEAD_STATUSES:
@@ -93,6 +96,8 @@ def main():
             if not alive:
                 dead_lines.append((line_idx, owner, name, url))
 
+    http_cache.print_summary()
+
     if not dead_lines:
         print("No dead repos found.")
         return
@@ -1,7 +1,8 @@
 """Shared repository suspicion checks used by audit_catalog.py and find_new_bofs.py.
 
 Provides reusable functions for detecting copycat repos, pre-compiled binaries,
-suspicious account signals, and rate-limited GitHub API access.
+suspicious account signals, and rate-limited GitHub API access (served through
+the shared conditional-request cache in http_cache.py).
 """
 
 import re
@@ -10,6 +11,8 @@ import time
 
 import requests
 
+import http_cache
+
 # Suffixes commonly appended to copied repo names
 _STRIP_SUFFIXES = re.compile(
     r"[-_]?(fork|copy|clone|mod|modified|updated|new|v2|ag|port)$", re.IGNORECASE
@@ -28,7 +31,7 @@ def rate_limited_get(url, headers, params=None, timeout=30, retries=3):
     response = None
     for attempt in range(retries):
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=timeout)
+            response = http_cache.get(url, headers=headers, params=params, timeout=timeout)
             break
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
             if attempt == retries - 1:
@@ -50,7 +53,7 @@ def rate_limited_get(url, headers, params=None, timeout=30, retries=3):
                 print(f"  Rate limited, waiting {wait}s...", file=sys.stderr)
                 time.sleep(wait + 1)
                 try:
-                    response = requests.get(
+                    response = http_cache.get(
                         url, headers=headers, params=params, timeout=timeout
                     )
                 except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
@@ -7,6 +7,10 @@ import argparse
 from urllib.parse import urlparse, urljoin
 import os
 import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+import http_cache
 
 # --- Configuration ---
 REQUEST_DELAY_SECONDS = 0.5
@@ -32,7 +36,7 @@ def fetch_readme_content(repo_url):
     for branch in ['main', 'master']:
         readme_path = 'README.md'; raw_url = get_raw_file_url(user, repo, readme_path, branch);
         try:
-            response = requests.get(raw_url, headers=headers, timeout=15);
+            response = http_cache.get(raw_url, headers=headers, timeout=15);
             if response.status_code == 200: content = response.text; found_branch = branch; break;
             elif response.status_code != 404: print(f"[!] Warning: Fetch '{branch}' for {repo_url}: Status {response.status_code}", file=sys.stderr)
         except requests.exceptions.Timeout: print(f"[!] Warning: Timeout fetch '{branch}' for {repo_url}", file=sys.stderr)
@@ -188,4 +192,5 @@ if __name__ == "__main__":
 
 
     print("\n" + "=" * 60)
-    print("[*] Processing Complete.")
\ No newline at end of file
+    print("[*] Processing Complete.")
+    http_cache.print_summary()
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from scripts.bench_indexer import REPO_KINDS, compare_results, generate_corpus, run_benchmark
+
+
+def _snapshot(root):
+    files = {}
+    for dir_path, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dir_path, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+class BenchIndexerTests(unittest.TestCase):
+    def test_corpus_is_deterministic_for_a_seed(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            generate_corpus(a, repos=len(REPO_KINDS), seed=5)
+            generate_corpus(b, repos=len(REPO_KINDS), seed=5)
+
+            self.assertEqual(_snapshot(a), _snapshot(b))
+
+    def test_benchmark_finds_entries_for_every_parser(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repos = generate_corpus(tmp, repos=len(REPO_KINDS))
+
+            results = run_benchmark(repos, repeat=1)
+
+            cna_files = sum(name.endswith(".cna") for name in _snapshot(tmp))
+
+        for stage in ("readme_table", "readme_bullet", "cna", "havoc_py", "stage1_py",
+                      "directory_structure", "parse_all_repos"):
+            self.assertGreater(results[stage]["entries"], 0, stage)
+        # Each parser is credited only with the files it read
+        self.assertEqual(results["cna"]["files"], cna_files)
+        self.assertLess(results["parse_all_repos"]["files"], results["manifest"]["files"])
+
+    def test_compare_flags_throughput_drop_and_entry_changes(self):
+        baseline = {"results": {
+            "cna": {"entries": 100, "entries_per_sec": 1000.0, "files_per_sec": 50.0},
+            "manifest": {"entries": 0, "entries_per_sec": 0.0, "files_per_sec": 500.0},
+        }}
+        current = {
+            "cna": {"entries": 90, "entries_per_sec": 950.0, "files_per_sec": 50.0},
+            "manifest": {"entries": 0, "entries_per_sec": 0.0, "files_per_sec": 300.0},
+        }
+
+        regressions = compare_results(current, baseline, threshold=0.15)
+
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("entry count changed 100 -> 90", regressions[0])
+        self.assertIn("manifest: files_per_sec", regressions[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,1120 @@
+import functools
+import io
+import json
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+import unittest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+from scripts import bof_indexer
+from scripts.bof_indexer import (
+    AdaptiveConcurrency,
+    BOFEntry,
+    CNAParser,
+    DirectoryStructureParser,
+    FailureLedger,
+    HavocPythonParser,
+    JobTimings,
+    MarkdownDocument,
+    MetadataStore,
+    ParseCache,
+    RepoInfo,
+    RepoManifest,
+    RunProfile,
+    analyze_repos,
+    apply_failure_backoff,
+    build_format_stats,
+    build_index,
+    classify_git_failure,
+    clear_manifests,
+    clone_all_repos,
+    collect_entries,
+    default_output_path,
+    enrich_repo_metadata,
+    find_identical_repos,
+    get_head_sha,
+    get_manifest,
+    longest_first,
+    merge_indexes,
+    parse_all_repos,
+    parse_repo,
+    refresh_repo,
+    repository_records,
+    run_pipeline,
+    scan_aggressor,
+    select_shard,
+    select_targets,
+    shard_metadata,
+    shared_objects,
+    splice_index,
+    update_failure_ledger,
+)
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def _git(*args):
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+        check=True,
+        capture_output=True,
+    )
+
+
+def _make_remote(path, files):
+    for rel, content in files.items():
+        _write(os.path.join(path, rel), content)
+    _git("init", "-q", path)
+    _git("-C", path, "add", "-A")
+    _git("-C", path, "commit", "-qm", "init")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ParseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+        self.repo_path = os.path.join(self.tmp, "owner__pack")
+        _write(
+            os.path.join(self.repo_path, "pack.cna"),
+            'beacon_command_register("whoami", "Show the current user", "");\n',
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _repo(self, sha):
+        return RepoInfo(
+            url="https://github.com/owner/pack",
+            owner="owner",
+            name="pack",
+            local_path=self.repo_path,
+            clone_success=True,
+            head_sha=sha,
+        )
+
+    def test_unchanged_head_reuses_cached_entries(self):
+        cache_path = os.path.join(self.tmp, "cache", "parse-cache.json")
+        cache = ParseCache(cache_path)
+        parse_all_repos([self._repo("a" * 40)], cache=cache)
+        cache.save()
+
+        # A change on disk is invisible while the recorded HEAD is unchanged.
+        os.remove(os.path.join(self.repo_path, "pack.cna"))
+        cache = ParseCache(cache_path)
+        entries = parse_all_repos([self._repo("a" * 40)], cache=cache)
+
+        self.assertEqual([e.name for e in entries], ["whoami"])
+        self.assertEqual(cache.hits["entries"], 1)
+
+    def test_moved_head_reparses_repo(self):
+        cache_path = os.path.join(self.tmp, "parse-cache.json")
+        cache = ParseCache(cache_path)
+        parse_all_repos([self._repo("a" * 40)], cache=cache)
+        cache.save()
+
+        _write(
+            os.path.join(self.repo_path, "pack.cna"),
+            'beacon_command_register("klist", "List Kerberos tickets", "");\n',
+        )
+        cache = ParseCache(cache_path)
+        entries = parse_all_repos([self._repo("b" * 40)], cache=cache)
+
+        self.assertEqual([e.name for e in entries], ["klist"])
+        self.assertEqual(cache.misses["entries"], 1)
+
+    def test_changed_read_settings_reparse_repo(self):
+        cache_path = os.path.join(self.tmp, "parse-cache.json")
+        cache = ParseCache(cache_path)
+        parse_all_repos([self._repo("a" * 40)], cache=cache)
+        cache.save()
+
+        os.remove(os.path.join(self.repo_path, "pack.cna"))
+        # A smaller file cap changes what gets read, as does a clone made
+        # in another layout (here a tarball listing).
+        with patch.object(bof_indexer, "MAX_FILE_BYTES", 16):
+            cache = ParseCache(cache_path)
+            self.assertEqual(parse_all_repos([self._repo("a" * 40)], cache=cache), [])
+            self.assertEqual(cache.misses["entries"], 1)
+
+        _write(os.path.join(self.repo_path, bof_indexer.TREE_LISTING_FILE), "[]")
+        cache = ParseCache(cache_path)
+        self.assertIsNone(cache.lookup(self._repo("a" * 40), "entries"))
+
+
+class ParseAllReposTests(unittest.TestCase):
+    def test_parse_workers_preserve_catalog_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repos = []
+            for i in range(4):
+                path = os.path.join(tmp, f"owner__pack{i}")
+                _write(
+                    os.path.join(path, "pack.cna"),
+                    "".join(
+                        f'beacon_command_register("cmd{i}_{j}", "Command {j}", "");\n'
+                        for j in range(3)
+                    ),
+                )
+                repos.append(RepoInfo(
+                    url=f"https://github.com/owner/pack{i}",
+                    owner="owner",
+                    name=f"pack{i}",
+                    local_path=path,
+                    clone_success=True,
+                ))
+
+            sequential = parse_all_repos(repos)
+            parallel = parse_all_repos(repos, workers=2)
+
+            self.assertEqual(parallel, sequential)
+            self.assertEqual(parallel[0].name, "cmd0_0")
+
+    def test_formats_detected_in_parse_pass_with_one_can_parse_each(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "owner__pack")
+            _write(os.path.join(path, "pack.cna"), 'beacon_command_register("a", "A", "");\n')
+            repo = RepoInfo(url="https://github.com/owner/pack", owner="owner", name="pack",
+                            local_path=path, clone_success=True)
+            can_parse = CNAParser.can_parse
+
+            with patch.object(CNAParser, "can_parse", autospec=True,
+                              side_effect=can_parse) as spy:
+                parse_all_repos([repo])
+
+            self.assertEqual(spy.call_count, 1)
+            self.assertEqual(repo.formats_detected, ["cna", "directory_structure"])
+            self.assertEqual(build_format_stats([repo])["parseable_by_format"],
+                             analyze_repos([repo])["parseable_by_format"])
+
+    def test_profile_records_parser_timings_per_repo(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "owner__pack")
+            _write(os.path.join(path, "pack.cna"), 'beacon_command_register("a", "A", "");\n')
+            repo = RepoInfo(url="https://github.com/owner/pack", owner="owner", name="pack",
+                            local_path=path, clone_success=True)
+            profile = RunProfile()
+
+            parse_all_repos([repo], profile=profile)
+
+            report = profile.to_dict()
+            cna = [p for p in report["parses"] if p["parser"] == "cna"]
+            self.assertEqual(len(cna), 1)
+            self.assertEqual(cna[0]["entries"], 1)
+            self.assertEqual(cna[0]["repository"], repo.url)
+
+
+class RepoManifestTests(unittest.TestCase):
+    def test_manifest_skips_git_directories_and_indexes_extensions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            _write(os.path.join(tmp, "a.cna"), "x")
+            _write(os.path.join(tmp, "sub", "b.cna"), "xyz")
+            _write(os.path.join(tmp, "sub", "b_bof.s1.py"), "")
+            _write(os.path.join(tmp, ".github", "c.cna"), "x")
+            _write(os.path.join(tmp, ".git", "d.cna"), "x")
+
+            manifest = RepoManifest.from_directory(tmp)
+
+            self.assertEqual(
+                sorted(f.path for f in manifest.by_extension(".cna")),
+                ["a.cna", "sub/b.cna"],
+            )
+            self.assertEqual([f.path for f in manifest.glob("*.s1.py")], ["sub/b_bof.s1.py"])
+            self.assertTrue(manifest.exists("sub/b.cna"))
+            self.assertEqual(
+                {f.path: f.size for f in manifest.files}["sub/b.cna"], 3
+            )
+
+
+class FileAccessTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "owner__pack")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _parse(self):
+        return parse_repo(self.path, "https://github.com/owner/pack")
+
+    def test_binary_files_are_skipped_and_reported(self):
+        _write(os.path.join(self.path, "pack.cna"), 'beacon_command_register("ok", "Fine", "");\n')
+        with open(os.path.join(self.path, "blob.cna"), "wb") as f:
+            f.write(b'\x7fELF\0\0beacon_command_register("bad", "Binary", "");')
+
+        result = self._parse()
+
+        self.assertEqual([e.name for e in result.entries], ["ok"])
+        self.assertEqual([(f["path"], f["reason"]) for f in result.skipped],
+                         [("blob.cna", "binary")])
+
+    def test_oversized_script_is_scanned_through_mmap(self):
+        _write(os.path.join(self.path, "big.cna"),
+               "# filler\n" * 50
+               + 'beacon_command_register("big", "Found by the bytes scan", "");\n'
+               + "alias other {\n}\n")
+
+        with patch("scripts.bof_indexer.MAX_FILE_BYTES", 128):
+            result = self._parse()
+
+        self.assertEqual([(e.name, e.description) for e in result.entries],
+                         [("big", "Found by the bytes scan"), ("other", "")])
+        self.assertEqual([f["reason"] for f in result.skipped], ["mapped"])
+
+    def test_repo_budget_stops_reading_further_files(self):
+        for i in range(3):
+            _write(os.path.join(self.path, f"s{i}", "pack.cna"),
+                   f'beacon_command_register("cmd{i}", "Command {i}", "");\n')
+
+        with patch("scripts.bof_indexer.MAX_REPO_BYTES", 100):
+            result = self._parse()
+
+        self.assertEqual(len(result.entries), 2)
+        self.assertEqual([f["reason"] for f in result.skipped], ["repo_budget"])
+
+
+class MarkdownDocumentTests(unittest.TestCase):
+    def test_tables_and_bullets_tokenized_once(self):
+        doc = MarkdownDocument(
+            "# Pack\n\n"
+            "| Command | Description |\n"
+            "|---------|-------------|\n"
+            "| whoami | Show the user |\n"
+            "|--|--|\n"
+            "| ls | List files |\n"
+            "\n"
+            "| Repo | Notes |\n"
+            "|---|---|\n"
+            "| **BOF** | **Use** |\n"
+            "- dcsync: Dump hashes\n"
+            "- C: Single letter names are not bullets\n"
+        )
+
+        self.assertTrue(doc.has_table_header())
+        self.assertEqual([t.header[1].strip() for t in doc.tables], ["Command", "**BOF**"])
+        self.assertEqual([r[1].strip() for r in doc.tables[0].rows], ["whoami", "ls"])
+        self.assertEqual(doc.tables[1].rows, [])
+        self.assertEqual(doc.bullets, [("dcsync", "Dump hashes")])
+        self.assertIs(doc.tables, doc.tables)
+
+    def test_readme_parsers_share_one_read(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            _write(os.path.join(tmp, "owner__pack", "README.md"),
+                   "| Tool | Description |\n|-|-|\n| one | First |\n- two: Second\n")
+            path = os.path.join(tmp, "owner__pack")
+
+            with patch.object(RepoManifest, "read_text", autospec=True,
+                              side_effect=RepoManifest.read_text) as read:
+                result = parse_repo(path, "https://github.com/owner/pack")
+
+            self.assertEqual([c.args[1] for c in read.call_args_list], ["README.md"])
+            self.assertEqual([e.name for e in result.entries], ["one"])
+            self.assertIn("readme_bullet", result.detected)
+
+
+class AggressorLexerTests(unittest.TestCase):
+    def test_registrations_split_across_lines_and_concatenated(self):
+        commands = scan_aggressor(
+            'beacon_command_register(\n'
+            '    "sa-whoami",\n'
+            '    "Show the user\'s " . \'groups\',   # trailing comment\n'
+            '    "Usage: sa-whoami");\n'
+            'beacon_command_register("quoted", "Say \\"hi\\"", "");\n'
+            'beacon_command_register("dynamic", $desc, "");\n'
+        )
+
+        self.assertEqual(
+            [(c.kind, c.name, c.description, c.line) for c in commands],
+            [("register", "sa-whoami", "Show the user's groups", 0),
+             ("register", "quoted", 'Say "hi"', 4)],
+        )
+
+    def test_aliases_take_comment_above_and_ignore_comments_and_strings(self):
+        commands = scan_aggressor(
+            "# Dump credentials\n"
+            "alias dumper {\n"
+            '    println("alias fake {");\n'
+            "}\n"
+            "# alias commented {\n"
+            "alias 'quoted-name' { }\n"
+        )
+
+        self.assertEqual(
+            [(c.name, c.description) for c in commands],
+            [("dumper", "Dump credentials"), ("quoted-name", "alias commented {")],
+        )
+
+    def test_cna_parser_prefers_registration_and_dedupes_aliases(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            _write(os.path.join(tmp, "pack.cna"),
+                   "# Old help\nalias whoami { }\nalias ls { }\nalias ls { }\n"
+                   'beacon_command_register("whoami", "Show the user", "");\n')
+
+            entries = CNAParser().parse(tmp, "https://github.com/owner/pack")
+
+        self.assertEqual([(e.name, e.description) for e in entries],
+                         [("whoami", "Show the user"), ("ls", "Old help")])
+
+
+class HavocParserTests(unittest.TestCase):
+    def _parse(self, source):
+        with tempfile.TemporaryDirectory() as tmp:
+            _write(os.path.join(tmp, "ext.py"), source)
+            _write(os.path.join(tmp, "other.py"), "print('not havoc')\n")
+            _write(os.path.join(tmp, ".venv", "lib", "site-packages", "dep.py"),
+                   "import havoc\nRegisterCommand(run, '', 'vendored', '', 0, '', '')\n")
+            return [(e.name, e.description)
+                    for e in HavocPythonParser().parse(tmp, "https://github.com/owner/ext")]
+
+    def test_ast_extracts_calls_and_dict_literals_exactly(self):
+        entries = self._parse(
+            "from havoc import Demon, RegisterCommand, RegisterModule\n"
+            "RegisterModule('kerb', 'Kerberos tooling', '', '', '', '')\n"
+            "RegisterCommand(run, 'kerb', 'klist', '', 0, '', '')\n"
+            "RegisterCommand(run, '', 'whoami', \"Show the user's groups\", 0, '', '')\n"
+            "COMMANDS = [\n"
+            "    {'command': 'ls', 'description': 'List files'},\n"
+            "    {'command': 'pwd'},\n"
+            "]\n"
+        )
+
+        self.assertEqual(entries, [
+            ("klist", "Kerberos tooling"),
+            ("whoami", "Show the user's groups"),
+            ("ls", "List files"),
+            ("pwd", ""),
+        ])
+
+    def test_regex_fallback_for_files_ast_cannot_parse(self):
+        entries = self._parse(
+            "import havoc\n"
+            "print 'python 2'\n"
+            "cmds = [{'command': 'ls', 'description': 'List files'}]\n"
+            + "#" * 600 + "\n"
+            "cmds.append({'command': 'far'})\n"
+        )
+
+        self.assertEqual(entries, [("ls", "List files"), ("far", "")])
+
+    def test_regex_fallback_for_code_too_deeply_nested_for_ast(self):
+        entries = self._parse(
+            "from havoc import RegisterCommand\n"
+            "RegisterCommand(run, '', 'klist', 'List tickets', 0, '', '')\n"
+            "TABLE = " + "+".join(["1"] * 200000) + "\n"
+        )
+
+        self.assertEqual(entries, [("klist", "List tickets")])
+
+
+class BlobCacheTests(unittest.TestCase):
+    def test_identical_files_parsed_once_and_forks_reported(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fork_files = {
+                "README.md": "| Tool | Description |\n|-|-|\n| one | First |\n",
+                "pack.cna": 'beacon_command_register("whoami", "Show user", "");\n',
+            }
+            _make_remote(os.path.join(tmp, "remotes", "upstream"), fork_files)
+            _make_remote(os.path.join(tmp, "remotes", "fork"), {**fork_files, "LICENSE": "MIT\n"})
+            _make_remote(os.path.join(tmp, "remotes", "other"), {
+                **fork_files, "pack.cna": 'beacon_command_register("klist", "Tickets", "");\n',
+            })
+            repos = [RepoInfo(url=f"file://{tmp}/remotes/{name}", owner="owner", name=name)
+                     for name in ("upstream", "fork", "other")]
+            clone_all_repos(repos, os.path.join(tmp, "repos"), max_workers=1)
+            cache = ParseCache(os.path.join(tmp, "cache", "parse-cache.json"))
+
+            with patch("scripts.bof_indexer.scan_aggressor",
+                       side_effect=scan_aggressor) as scan:
+                entries = parse_all_repos(repos, cache=cache)
+
+            self.assertEqual(scan.call_count, 2)
+            self.assertEqual([(e.name, e.repository.rsplit("/", 1)[1]) for e in entries], [
+                ("one", "upstream"), ("whoami", "upstream"),
+                ("one", "fork"), ("whoami", "fork"),
+                ("one", "other"), ("klist", "other"),
+            ])
+            self.assertEqual((cache.blob_hits, cache.blob_misses), (3, 3))
+            self.assertEqual([[r.name for r in group] for group in find_identical_repos(repos)],
+                             [["upstream", "fork"]])
+
+    def test_repo_budget_is_charged_for_cached_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            files = {
+                "README.md": "| Tool | Description |\n|-|-|\n| one | First |\n",
+                "pack.cna": 'beacon_command_register("whoami", "Show user", "");\n',
+            }
+            for name in ("upstream", "fork"):
+                _make_remote(os.path.join(tmp, "remotes", name), files)
+            repos = [RepoInfo(url=f"file://{tmp}/remotes/{name}", owner="owner", name=name)
+                     for name in ("upstream", "fork")]
+            clone_all_repos(repos, os.path.join(tmp, "repos"), max_workers=1)
+            cache = ParseCache(os.path.join(tmp, "cache", "parse-cache.json"))
+
+            with patch("scripts.bof_indexer.MAX_REPO_BYTES", 60):
+                entries = parse_all_repos(repos, cache=cache)
+
+            upstream, fork = ([(e.name, e.source_file) for e in entries if e.repository == r.url]
+                              for r in repos)
+            self.assertEqual(len(upstream), 1)
+            self.assertEqual(fork, upstream)
+            self.assertEqual(repos[1].files_skipped, repos[0].files_skipped)
+            self.assertEqual([s["reason"] for s in repos[1].files_skipped], ["repo_budget"])
+
+
+class CloneTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = self._tmp.name
+        self.remote = os.path.join(self.tmp, "remote")
+        _make_remote(self.remote, {"README.md": "# pack\n"})
+        self.repos_dir = os.path.join(self.tmp, "repos")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _repo(self):
+        return RepoInfo(url=f"file://{self.remote}", owner="owner", name="pack")
+
+    def test_partial_clone_directory_is_replaced(self):
+        os.makedirs(os.path.join(self.repos_dir, "owner__pack"))
+
+        repo = clone_all_repos([self._repo()], self.repos_dir, max_workers=1)[0]
+
+        self.assertTrue(repo.clone_success)
+        self.assertEqual(repo.head_sha, get_head_sha(self.remote))
+        self.assertEqual(os.listdir(self.repos_dir), ["owner__pack"])
+
+    def test_refresh_updates_clone_when_remote_moves(self):
+        clone_all_repos([self._repo()], self.repos_dir, max_workers=1)
+        _write(os.path.join(self.remote, "new.cna"), "alias x {}\n")
+        _git("-C", self.remote, "add", "-A")
+        _git("-C", self.remote, "commit", "-qm", "more")
+
+        stale = clone_all_repos([self._repo()], self.repos_dir, max_workers=1)[0]
+        self.assertNotEqual(stale.head_sha, get_head_sha(self.remote))
+
+        fresh = clone_all_repos([self._repo()], self.repos_dir, max_workers=1, refresh=True)[0]
+        self.assertEqual(fresh.head_sha, get_head_sha(self.remote))
+        self.assertTrue(os.path.exists(os.path.join(fresh.local_path, "new.cna")))
+
+    def test_sparse_clone_checks_out_only_parser_inputs(self):
+        remote = os.path.join(self.tmp, "sparse-remote")
+        _make_remote(remote, {
+            "README.md": "# pack\n",
+            "pack.cna": 'beacon_command_register("whoami", "Show user", "");\n',
+            "src/dcsync/dcsync.c": "int go() {}\n",
+            "dist/dcsync.x64.o": "\0binary",
+        })
+        _git("-C", remote, "config", "uploadpack.allowFilter", "true")
+        repo = RepoInfo(url=f"file://{remote}", owner="owner", name="sparse")
+
+        repo = clone_all_repos([repo], self.repos_dir, max_workers=1, mode="sparse")[0]
+
+        self.assertTrue(repo.clone_success)
+        self.assertTrue(os.path.exists(os.path.join(repo.local_path, "pack.cna")))
+        self.assertFalse(os.path.exists(os.path.join(repo.local_path, "src", "dcsync", "dcsync.c")))
+        self.assertFalse(os.path.exists(os.path.join(repo.local_path, "dist")))
+        entries = DirectoryStructureParser().parse(repo.local_path, repo.url)
+        self.assertEqual([e.name for e in entries], ["dcsync"])
+
+    def test_bare_clone_is_parsed_from_the_object_store(self):
+        _write(os.path.join(self.remote, "pack.cna"),
+               'beacon_command_register("whoami", "Show user", "");\n')
+        _write(os.path.join(self.remote, "src", "dcsync", "dcsync.c"), "int go() {}\n")
+        _git("-C", self.remote, "add", "-A")
+        _git("-C", self.remote, "commit", "-qm", "more")
+
+        repo = clone_all_repos([self._repo()], self.repos_dir, max_workers=1, mode="bare")[0]
+
+        self.assertTrue(repo.clone_success)
+        self.assertEqual(repo.head_sha, get_head_sha(self.remote))
+        self.assertFalse(os.path.exists(os.path.join(repo.local_path, "pack.cna")))
+        result = parse_repo(repo.local_path, repo.url, ["cna", "directory_structure"])
+        self.assertEqual([e.name for e in result.entries], ["whoami", "dcsync"])
+        self.assertIsNone(get_manifest(repo.local_path).object_store._process)
+
+        _write(os.path.join(self.remote, "pack.cna"),
+               'beacon_command_register("klist", "Tickets", "");\n')
+        _git("-C", self.remote, "commit", "-qam", "update")
+        clear_manifests()
+        repo = clone_all_repos([self._repo()], self.repos_dir, max_workers=1,
+                               refresh=True, mode="bare")[0]
+
+        self.assertEqual(repo.head_sha, get_head_sha(self.remote))
+        result = parse_repo(repo.local_path, repo.url, ["cna"])
+        self.assertEqual([e.name for e in result.entries], ["klist"])
+
+    def test_bare_clone_reads_of_oversized_blobs_stop_at_the_cap(self):
+        lines = [f'beacon_command_register("cmd{i}", "Command {i}", "");\n' for i in range(100)]
+        _write(os.path.join(self.remote, "pack.cna"), "".join(lines))
+        _git("-C", self.remote, "add", "-A")
+        _git("-C", self.remote, "commit", "-qm", "big")
+        repo = clone_all_repos([self._repo()], self.repos_dir, max_workers=1, mode="bare")[0]
+        manifest = get_manifest(repo.local_path)
+        reads = []
+        real_read = manifest.object_store.read
+
+        def read(sha, limit=None):
+            data = real_read(sha, limit)
+            reads.append(len(data))
+            return data
+        manifest.object_store.read = read
+
+        with patch("scripts.bof_indexer.MAX_FILE_BYTES", 1000):
+            self.assertIsNone(manifest.read_text("pack.cna"))
+            self.assertEqual(manifest.skipped["pack.cna"]["reason"], "too_large")
+            with manifest.open_content("pack.cna") as content:
+                self.assertEqual(len(content), 1000)
+            self.assertEqual(manifest.skipped["pack.cna"],
+                             {"path": "pack.cna", "reason": "truncated", "bytes": len("".join(lines))})
+            self.assertEqual(manifest.bytes_decoded, 1000)
+            with patch("scripts.bof_indexer.MAX_REPO_BYTES", 1500), \
+                    manifest.open_content("pack.cna") as content:
+                self.assertIsNone(content)
+        self.assertLessEqual(max(reads), 8192)
+        manifest.clear_documents()
+
+    def test_bare_clone_sniff_reads_only_the_head_of_blobs(self):
+        _write(os.path.join(self.remote, "ext.py"),
+               "from havoc import RegisterCommand\n"
+               "RegisterCommand(run, '', 'klist', 'Tickets', 0, '', '')\n")
+        _write(os.path.join(self.remote, "big.py"), "x = 1\n" * 50000)
+        _git("-C", self.remote, "add", "-A")
+        _git("-C", self.remote, "commit", "-qm", "havoc")
+        repo = clone_all_repos([self._repo()], self.repos_dir, max_workers=1, mode="bare")[0]
+        manifest = get_manifest(repo.local_path)
+        reads = []
+        real_read = manifest.object_store.read
+
+        def read(sha, limit=None):
+            data = real_read(sha, limit)
+            reads.append(len(data))
+            return data
+        manifest.object_store.read = read
+
+        parser = HavocPythonParser()
+        self.assertEqual(sorted(manifest.relpath(p) for p in parser.find_havoc_files(repo.local_path)),
+                         ["ext.py"])
+        self.assertLessEqual(max(reads), bof_indexer.BINARY_SNIFF_BYTES)
+        self.assertEqual([e.name for e in parser.parse(repo.local_path, repo.url)], ["klist"])
+        manifest.clear_documents()
+
+    def test_shared_clones_store_fork_objects_once(self):
+        upstream = os.path.join(self.tmp, "upstream")
+        _make_remote(upstream, {
+            "README.md": "# pack\n",
+            "pack.cna": 'beacon_command_register("whoami", "Show user", "");\n',
+            "src/dcsync/dcsync.c": "int go() {}\n",
+        })
+        fork = os.path.join(self.tmp, "fork")
+        _git("clone", "-q", upstream, fork)
+        _write(os.path.join(fork, "extra.cna"), 'beacon_command_register("klist", "Tickets", "");\n')
+        _git("-C", fork, "add", "-A")
+        _git("-C", fork, "commit", "-qm", "fork")
+        store = os.path.join(self.tmp, "cache", "objects.git")
+
+        def objects_in_store():
+            out = subprocess.run(["git", "--git-dir", store, "count-objects", "-v"],
+                                 capture_output=True, text=True).stdout
+            return int(out.split("in-pack: ")[1].split()[0])
+
+        def clone(repos_dir):
+            repos = [RepoInfo(url=f"file://{path}", owner="owner", name=os.path.basename(path))
+                     for path in (upstream, fork)]
+            return clone_all_repos(repos, repos_dir, max_workers=1, mode="shared")
+
+        with patch("scripts.bof_indexer.shared_objects.path", store):
+            repos = clone(self.repos_dir)
+            # 7 objects upstream; the fork adds only a commit, a tree and a blob
+            self.assertEqual(objects_in_store(), 10)
+            self.assertEqual([r.head_sha for r in repos],
+                             [get_head_sha(upstream), get_head_sha(fork)])
+            entries = parse_all_repos(repos)
+            self.assertEqual([e.name for e in entries], ["whoami", "klist", "whoami"])
+
+            # A fresh repos dir (e.g. a new CI runner) downloads nothing new
+            clone(os.path.join(self.tmp, "repos2"))
+            self.assertEqual(objects_in_store(), 10)
+
+            # Once the fork leaves the catalog its ref and shallow commit go
+            shared_objects.prune(repos[:1])
+            refs = subprocess.run(["git", "--git-dir", store, "for-each-ref",
+                                   "--format=%(refname)", "refs/bof/"],
+                                  capture_output=True, text=True).stdout.split()
+            self.assertEqual(refs, ["refs/bof/owner__upstream"])
+            with open(os.path.join(store, "shallow")) as f:
+                self.assertEqual(f.read().split(), [get_head_sha(upstream)])
+            # The repack keeps only what the remaining ref reaches in packs
+            self.assertEqual(objects_in_store(), 7)
+            self.assertEqual([e.name for e in parse_all_repos(repos[:1])], ["whoami"])
+
+    def test_shared_clone_recloned_on_refresh_keeps_its_store_ref(self):
+        store = os.path.join(self.tmp, "cache", "objects.git")
+        with patch("scripts.bof_indexer.shared_objects.path", store):
+            repo = clone_all_repos([self._repo()], self.repos_dir, max_workers=1,
+                                   mode="shared")[0]
+            _write(os.path.join(self.remote, "pack.cna"), "alias x {}\n")
+            _git("-C", self.remote, "add", "-A")
+            _git("-C", self.remote, "commit", "-qm", "more")
+            # Make the in-place fetch fail so the repo is cloned again
+            _git("-C", repo.local_path, "config", "remote.origin.url", self.tmp + "/nowhere")
+
+            refresh_repo(repo, get_head_sha(self.remote), mode="shared")
+
+            refs = subprocess.run(["git", "--git-dir", store, "for-each-ref",
+                                   "--format=%(refname) %(objectname)", "refs/bof/"],
+                                  capture_output=True, text=True).stdout.split("\n")[:-1]
+            self.assertEqual(refs, [f"refs/bof/owner__pack {get_head_sha(self.remote)}"])
+            self.assertEqual(repo.head_sha, get_head_sha(self.remote))
+
+    def _serve_tarballs(self, directory):
+        """Serve directory over HTTP; returns a TARBALL_URL_TEMPLATE for it."""
+        handler = functools.partial(_QuietHandler, directory=directory)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/{{owner}}/{{name}}.tar.gz"
+
+    def test_tarball_members_escaping_the_repo_are_skipped(self):
+        served = os.path.join(self.tmp, "served", "owner")
+        os.makedirs(served)
+        with tarfile.open(os.path.join(served, "pack.tar.gz"), "w:gz",
+                          pax_headers={"comment": "a" * 40}) as archive:
+            for name in ("owner-pack-a/README.md", "owner-pack-a/../evil.md",
+                         "owner-pack-a/docs/../../evil.md", "owner-pack-a//abs/evil.md"):
+                data = b"# evil\n"
+                member = tarfile.TarInfo(name)
+                member.size = len(data)
+                archive.addfile(member, io.BytesIO(data))
+        template = self._serve_tarballs(os.path.dirname(served))
+        repo = RepoInfo(url="https://github.com/owner/pack", owner="owner", name="pack")
+
+        with patch("scripts.bof_indexer.TARBALL_URL_TEMPLATE", template):
+            repo = clone_all_repos([repo], self.repos_dir, max_workers=1, mode="tarball")[0]
+
+        self.assertTrue(repo.clone_success)
+        self.assertEqual(os.listdir(self.repos_dir), ["owner__pack"])
+        self.assertEqual(sorted(os.listdir(repo.local_path)), [".bof-tree.json", "README.md"])
+        self.assertEqual([f.path for f in RepoManifest.from_listing(repo.local_path).files],
+                         ["README.md"])
+
+    def test_tarball_fetch_extracts_only_parser_inputs(self):
+        remote = os.path.join(self.tmp, "tar-remote")
+        _make_remote(remote, {
+            "README.md": "# pack\n",
+            "pack.cna": 'beacon_command_register("whoami", "Show user", "");\n',
+            "src/dcsync/dcsync.c": "int go() {}\n",
+            "dist/dcsync.x64.o": "\0binary",
+        })
+        served = os.path.join(self.tmp, "served", "owner")
+        os.makedirs(served)
+        _git("-C", remote, "archive", "--format=tar.gz", "--prefix=owner-pack-0123abc/",
+             "-o", os.path.join(served, "pack.tar.gz"), "HEAD")
+        template = self._serve_tarballs(os.path.dirname(served))
+        repo = RepoInfo(url="https://github.com/owner/pack", owner="owner", name="pack")
+
+        with patch("scripts.bof_indexer.TARBALL_URL_TEMPLATE", template):
+            repo = clone_all_repos([repo], self.repos_dir, max_workers=1, mode="tarball")[0]
+
+        self.assertTrue(repo.clone_success)
+        self.assertEqual(repo.head_sha, get_head_sha(remote))
+        self.assertFalse(os.path.exists(os.path.join(repo.local_path, ".git")))
+        self.assertTrue(os.path.exists(os.path.join(repo.local_path, "pack.cna")))
+        self.assertFalse(os.path.exists(os.path.join(repo.local_path, "src")))
+        result = parse_repo(repo.local_path, repo.url, ["cna", "directory_structure"])
+        self.assertEqual([e.name for e in result.entries], ["whoami", "dcsync"])
+        cna_blob = subprocess.run(["git", "-C", remote, "rev-parse", "HEAD:pack.cna"],
+                                  capture_output=True, text=True).stdout.strip()
+        self.assertIn(cna_blob, result.blobs)
+
+    def test_transient_failures_are_retried_and_missing_repos_are_not(self):
+        real_clone_into = bof_indexer._clone_into
+        outcomes = ["network"]
+
+        def flaky_clone_into(*args):
+            return outcomes.pop() if outcomes else real_clone_into(*args)
+
+        missing = RepoInfo(url=f"file://{self.tmp}/missing", owner="owner", name="gone")
+        with patch.object(bof_indexer, "CLONE_RETRY_BASE_DELAY", 0), \
+                patch.object(bof_indexer, "_clone_into", side_effect=flaky_clone_into):
+            repo, gone = clone_all_repos([self._repo(), missing], self.repos_dir, max_workers=1)
+
+        self.assertTrue(repo.clone_success)
+        self.assertEqual(repo.clone_attempts, 2)
+        self.assertFalse(gone.clone_success)
+        self.assertEqual((gone.clone_error, gone.clone_attempts), ("not_found", 1))
+        self.assertEqual(classify_git_failure(
+            "fatal: unable to access 'https://github.com/a/b/': Could not resolve host"),
+            "network")
+
+    def test_repeated_failures_are_held_back_with_previous_entries(self):
+        flaky_remote = os.path.join(self.tmp, "flaky")
+        _make_remote(flaky_remote, {
+            "pack.cna": 'beacon_command_register("whoami", "Show the current user", "");\n',
+        })
+
+        def catalog():
+            return [self._repo(),
+                    RepoInfo(url=f"file://{flaky_remote}", owner="owner", name="flaky")]
+
+        cache = ParseCache(os.path.join(self.tmp, "cache", "parse-cache.json"))
+        ledger = FailureLedger(os.path.join(self.tmp, "cache", "failures.json"))
+        repos = clone_all_repos(catalog(), self.repos_dir, max_workers=1)
+        parse_all_repos(repos, cache=cache)
+        update_failure_ledger(repos, ledger)
+
+        # The first failure is retried on the next run, the second starts a backoff
+        shutil.move(flaky_remote, f"{flaky_remote}.gone")
+        for _ in range(2):
+            shutil.rmtree(self.repos_dir)
+            repos = catalog()
+            self.assertEqual(apply_failure_backoff(repos, ledger, cache), [])
+            clone_all_repos(repos, self.repos_dir, max_workers=1)
+            update_failure_ledger(repos, ledger)
+        ledger.save(repos)
+        ledger = FailureLedger(ledger.path)
+        self.assertEqual(ledger.entry(repos[1], "clone")["count"], 2)
+
+        shutil.rmtree(self.repos_dir)
+        repos = catalog()
+        self.assertEqual(apply_failure_backoff(repos, ledger, cache), [repos[1]])
+        clone_all_repos(repos, self.repos_dir, max_workers=1)
+        self.assertEqual(os.listdir(self.repos_dir), ["owner__pack"])
+        self.assertEqual([e.name for e in collect_entries(repos)], ["whoami"])
+        self.assertEqual(repository_records(repos)[1]["formats"], ["cna", "directory_structure"])
+        self.assertEqual(build_format_stats(repos)["repos_by_format"]["cna"], ["flaky"])
+
+
+class AdaptiveConcurrencyTests(unittest.TestCase):
+    def test_transient_failure_halves_limit_and_successes_grow_it_back(self):
+        limiter = AdaptiveConcurrency(8, maximum=16)
+        limiter.record(transient_failure=True)
+        self.assertEqual(limiter.limit, 4)
+
+        for _ in range(4):
+            limiter.record(transient_failure=False)
+        self.assertEqual(limiter.limit, 5)
+        self.assertEqual((limiter.lowest, limiter.highest, limiter.retries), (4, 8, 1))
+
+        with limiter.slot():
+            self.assertEqual(limiter._in_flight, 1)
+        self.assertEqual(limiter._in_flight, 0)
+
+
+class SchedulingTests(unittest.TestCase):
+    def test_longest_first_uses_recorded_times_then_scaled_size(self):
+        repos = [RepoInfo(url=f"https://github.com/o/r{i}", owner="o", name=f"r{i}", size_kb=kb)
+                 for i, kb in enumerate([100, 0, 5000, 0, 1000])]
+        profile = RunProfile()
+        repos[0].clone_success, repos[0].clone_attempts = True, 1
+        profile.record_clone(repos[0], 2.0)  # 0.02s per KB
+        profile.record_parse(repos[3].url, [("cna", 1.5, 3)])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "timings.json")
+            timings = JobTimings(path)
+            timings.update(profile)
+            timings.save(repos)
+            timings = JobTimings(path)
+
+        # r2 and r4 are estimated at 100s and 20s from their size; r1 and r3
+        # have nothing to go on and get the median (20s), ahead of r4 by catalog order
+        self.assertEqual([r.name for r in longest_first(repos, "clone", timings)],
+                         ["r2", "r1", "r3", "r4", "r0"])
+        self.assertEqual(timings.seconds(repos[3], "parse"), 1.5)
+        self.assertEqual([r.name for r in longest_first(repos[:2], "clone")], ["r0", "r1"])
+
+
+class ShardTests(unittest.TestCase):
+    def test_shards_partition_catalog_and_merge_back_in_catalog_order(self):
+        catalog = [RepoInfo(url=f"https://github.com/o/r{i}", owner="o", name=f"r{i}",
+                            clone_success=True, formats_detected=["cna"] if i % 2 else ["readme_table"])
+                   for i in range(12)]
+        shards = [select_shard(catalog, i, 3) for i in (1, 2, 3)]
+        self.assertEqual(sorted(r.name for shard in shards for r in shard),
+                         sorted(r.name for r in catalog))
+        self.assertTrue(all(shards))
+
+        partials = []
+        for index, repos in enumerate(shards, 1):
+            bofs = [{"name": f"{r.name}-{n}", "description": "d", "repository": r.url}
+                    for r in repos for n in ("a", "b")]
+            partial = build_index([BOFEntry(**b) for b in bofs], repository_records(repos))
+            partial["metadata"]["shard"] = shard_metadata(repos, catalog, index, 3)
+            partials.append(partial)
+
+        merged = merge_indexes(list(reversed(partials)))
+        self.assertEqual([b["name"] for b in merged["bofs"]],
+                         [f"r{i}-{n}" for i in range(12) for n in ("a", "b")])
+        self.assertEqual(merged["metadata"], build_index([], repository_records(catalog))["metadata"]
+                         | {"total_bofs": 24, "repos_parsed": 12})
+        self.assertEqual(merged["metadata"]["format_stats"], {"readme_table": 6, "cna": 6})
+        with self.assertRaises(ValueError):
+            merge_indexes(partials[:2])
+        self.assertEqual(default_output_path((2, 3)), "bof-index.shard-2-of-3.json")
+        self.assertEqual(default_output_path(None), "bof-index.json")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, f"shard{i}.json") for i in range(3)]
+            for path, partial in zip(paths, partials):
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(partial, f)
+            output = os.path.join(tmp, "merged.json")
+            with patch("sys.argv", ["bof_indexer.py", "merge", *paths, "--output", output]):
+                bof_indexer.main()
+            with open(output, encoding="utf-8") as f:
+                self.assertEqual(json.load(f), merged)
+            with patch("sys.argv", ["bof_indexer.py", "merge", *paths[:2]]), \
+                    patch("sys.stderr"), self.assertRaises(SystemExit):
+                bof_indexer.main()
+
+
+class TargetedReindexTests(unittest.TestCase):
+    def _repo(self, name, formats=("cna",)):
+        return RepoInfo(url=f"https://github.com/o/{name}", owner="o", name=name,
+                        clone_success=True, formats_detected=list(formats))
+
+    def _entries(self, *names):
+        return [BOFEntry(name=f"{n}-cmd", description="d", repository=f"https://github.com/o/{n}")
+                for n in names]
+
+    def test_only_added_and_requested_repos_are_reindexed_and_spliced(self):
+        old_catalog = [self._repo("a"), self._repo("b"), self._repo("gone")]
+        index = build_index(self._entries("a", "b", "gone"), repository_records(old_catalog))
+
+        catalog = [self._repo("new"), self._repo("a"), self._repo("b")]
+        targets, removed = select_targets(catalog, index, ["https://github.com/o/B/"])
+        self.assertEqual([r.name for r in targets], ["new", "b"])
+        self.assertEqual(removed, ["https://github.com/o/gone"])
+        with self.assertRaises(ValueError):
+            select_targets(catalog, index, ["https://github.com/o/elsewhere"])
+
+        targets[1].formats_detected = ["readme_table"]
+        spliced = splice_index(index, catalog, targets, self._entries("b", "new"))
+        self.assertEqual([b["repository"] for b in spliced["bofs"]],
+                         [f"https://github.com/o/{n}" for n in ("new", "a", "b")])
+        self.assertEqual(spliced["metadata"], build_index(
+            self._entries("new", "a", "b"), repository_records(catalog))["metadata"])
+        self.assertEqual(spliced["metadata"]["format_stats"], {"cna": 2, "readme_table": 1})
+
+    def test_target_that_fails_to_fetch_keeps_its_previous_entries(self):
+        catalog = [self._repo("a"), self._repo("b")]
+        index = build_index(self._entries("a", "b"), repository_records(catalog))
+
+        targets, _ = select_targets(catalog, index, ["https://github.com/o/a"])
+        targets[0].clone_success, targets[0].clone_error = False, "network"
+        spliced = splice_index(index, catalog, targets, [])
+
+        self.assertEqual([b["name"] for b in spliced["bofs"]], ["a-cmd", "b-cmd"])
+        self.assertEqual(spliced["metadata"]["repositories"][0],
+                         {"url": "https://github.com/o/a", "formats": ["cna"],
+                          "fetch_failed": "network"})
+        self.assertEqual(spliced["metadata"]["format_stats"], {"cna": 2})
+        # The next targeted run retries it without being asked
+        self.assertEqual([r.name for r in select_targets(catalog, spliced, [])[0]], ["a"])
+
+    def test_index_without_repository_records_falls_back_to_entry_repos(self):
+        entries = self._entries("a", "gone")
+        entries[0].repository += "/"
+        for entry in entries:
+            entry.source_format = "cna"
+        index = build_index(entries, [])
+        del index["metadata"]["repositories"]
+
+        catalog = [self._repo("a"), self._repo("b")]
+        targets, removed = select_targets(catalog, index, [])
+        self.assertEqual([r.name for r in targets], ["b"])
+        self.assertEqual(removed, ["https://github.com/o/gone"])
+
+        spliced = splice_index(index, catalog, targets, self._entries("b"))
+        self.assertEqual([b["name"] for b in spliced["bofs"]], ["a-cmd", "b-cmd"])
+        self.assertEqual(spliced["metadata"]["format_stats"], {"cna": 2})
+
+
+class PipelineTests(unittest.TestCase):
+    def test_pipeline_matches_staged_run_in_catalog_order(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(3):
+                _make_remote(os.path.join(tmp, "remotes", f"pack{i}"), {
+                    "pack.cna": f'beacon_command_register("cmd{i}", "Command {i}", "");\n',
+                    f"src/tool{i}/tool{i}.c": "int go() {}\n",
+                })
+
+            def repos():
+                urls = [f"file://{tmp}/remotes/pack{i}" for i in range(3)]
+                urls.insert(1, f"file://{tmp}/remotes/missing")
+                return [RepoInfo(url=url, owner="owner", name=url.rsplit("/", 1)[1])
+                        for url in urls]
+
+            staged = clone_all_repos(repos(), os.path.join(tmp, "staged"), max_workers=2)
+            staged_stats = analyze_repos(staged)
+            staged_entries = parse_all_repos(staged)
+
+            piped = repos()
+            stats = run_pipeline(piped, os.path.join(tmp, "piped"), clone_workers=2)
+
+            self.assertEqual(collect_entries(piped), staged_entries)
+            self.assertEqual([e.name for e in staged_entries], ["cmd0", "cmd1", "cmd2"])
+            self.assertEqual(stats["parseable_by_format"], staged_stats["parseable_by_format"])
+            self.assertFalse(piped[1].clone_success)
+
+    def test_pipeline_clone_exception_fails_only_that_repo(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repos = []
+            for i in range(2):
+                _make_remote(os.path.join(tmp, "remotes", f"pack{i}"), {
+                    "pack.cna": f'beacon_command_register("cmd{i}", "Command {i}", "");\n',
+                })
+                repos.append(RepoInfo(url=f"file://{tmp}/remotes/pack{i}",
+                                      owner="owner", name=f"pack{i}"))
+            real_fetch = bof_indexer.fetch_repo
+
+            def fetch(repo, *args):
+                if repo.name == "pack0":
+                    raise OSError("rename failed")
+                return real_fetch(repo, *args)
+
+            with patch("scripts.bof_indexer.fetch_repo", side_effect=fetch):
+                run_pipeline(repos, os.path.join(tmp, "repos"), clone_workers=2)
+
+            self.assertEqual([e.name for e in collect_entries(repos)], ["cmd1"])
+            self.assertEqual((repos[0].clone_success, repos[0].clone_error), (False, "error"))
+
+
+class MetadataTests(unittest.TestCase):
+    def _repos(self):
+        return [
+            RepoInfo(url="https://github.com/owner/one", owner="owner", name="one"),
+            RepoInfo(url="https://github.com/owner/renamed", owner="owner", name="renamed"),
+        ]
+
+    def test_graphql_batch_with_rest_fallback_for_failures(self):
+        graphql = Mock(status_code=200)
+        graphql.json.return_value = {
+            "data": {"r0": {"stargazerCount": 42, "pushedAt": "2026-05-01T10:00:00Z"}, "r1": None},
+            "errors": [{"type": "NOT_FOUND", "path": ["r1"]}],
+        }
+        rest = Mock(status_code=200, headers={})
+        rest.json.return_value = {"stargazers_count": 7, "pushed_at": "2025-01-02T00:00:00Z"}
+
+        with patch.dict(os.environ, {"GITHUB_TOKEN": "t"}), patch(
+            "scripts.bof_indexer.requests.post", return_value=graphql
+        ) as post, patch("scripts.bof_indexer.requests.get", return_value=rest) as get:
+            repos = enrich_repo_metadata(self._repos(), max_workers=1)
+
+        self.assertEqual(post.call_count, 1)
+        self.assertIn('r1: repository(owner: "owner", name: "renamed")', post.call_args.kwargs["json"]["query"])
+        get.assert_called_once()
+        self.assertIn("/repos/owner/renamed", get.call_args.args[0])
+        self.assertEqual((repos[0].stars, repos[0].last_updated), (42, "2026-05-01"))
+        self.assertEqual((repos[1].stars, repos[1].last_updated), (7, "2025-01-02"))
+
+    def test_without_token_uses_rest_only(self):
+        rest = Mock(status_code=200, headers={})
+        rest.json.return_value = {"stargazers_count": 1, "pushed_at": ""}
+
+        with patch.dict(os.environ, {"GITHUB_TOKEN": ""}), patch(
+            "scripts.bof_indexer.requests.post"
+        ) as post, patch("scripts.bof_indexer.requests.get", return_value=rest) as get:
+            enrich_repo_metadata(self._repos(), max_workers=1)
+
+        post.assert_not_called()
+        self.assertEqual(get.call_count, 2)
+
+    def test_store_refreshes_only_repos_whose_ttl_has_passed(self):
+        day = 86400
+        now = time.time()
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MetadataStore(os.path.join(tmp, "metadata.json"))
+            one, dormant = self._repos()
+            # Pushed 5 days before a fetch 2 days ago: 1-day TTL, due again
+            one.stars, one.last_updated = 3, time.strftime("%Y-%m-%d", time.localtime(now - 7 * day))
+            store.put(one, now=now - 2 * day)
+            # Pushed 400 days before a fetch yesterday: 30-day TTL, still fresh
+            dormant.stars, dormant.size_kb = 9, 120
+            dormant.last_updated = time.strftime("%Y-%m-%d", time.localtime(now - 401 * day))
+            store.put(dormant, now=now - day)
+            store.save(self._repos())
+
+            rest = Mock(status_code=200, headers={})
+            rest.json.return_value = {"stargazers_count": 5, "pushed_at": "2026-05-01T00:00:00Z"}
+            with patch.dict(os.environ, {"GITHUB_TOKEN": ""}), patch(
+                "scripts.bof_indexer.requests.get", return_value=rest
+            ) as get:
+                repos = enrich_repo_metadata(self._repos(), max_workers=1,
+                                             store=MetadataStore(store.path))
+                get.assert_called_once()
+                self.assertIn("/repos/owner/one", get.call_args.args[0])
+                self.assertEqual([r.stars for r in repos], [5, 9])
+                self.assertEqual(repos[1].size_kb, 120)
+
+                # With both due, a budget of one looks up the most overdue
+                enrich_repo_metadata(self._repos(), max_workers=1,
+                                     store=MetadataStore(os.path.join(tmp, "empty.json")),
+                                     budget=1)
+                self.assertEqual(get.call_count, 2)
+
+    def test_failed_lookup_keeps_stored_metadata_and_bad_records_are_due(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metadata.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"repos": {
+                    "https://github.com/owner/one": {"stars": 6, "last_updated": "2024-01-01",
+                                                     "size_kb": 50, "fetched_at": 1},
+                    "https://github.com/owner/renamed": {"stars": 2},
+                }}, f)
+            store = MetadataStore(path)
+            one, malformed = self._repos()
+            self.assertGreater(store.due_at(one), 0)
+            self.assertEqual(store.due_at(malformed), 0.0)
+            self.assertFalse(store.restore(malformed))
+
+            with patch.dict(os.environ, {"GITHUB_TOKEN": ""}), patch(
+                "scripts.bof_indexer.requests.get", return_value=Mock(status_code=500, headers={})
+            ) as get:
+                repos = enrich_repo_metadata(self._repos(), max_workers=1, store=store)
+
+            self.assertEqual(get.call_count, 2)
+            self.assertEqual((repos[0].stars, repos[0].last_updated, repos[0].size_kb),
+                             (6, "2024-01-01", 50))
+            self.assertEqual(repos[0].metadata_source, "store")
+            self.assertTrue(repos[0].metadata_error)
+            self.assertEqual(repos[1].stars, 0)
+
+    def test_held_back_repos_keep_their_stored_metadata(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MetadataStore(os.path.join(tmp, "metadata.json"))
+            one, renamed = self._repos()
+            renamed.stars, renamed.last_updated, renamed.size_kb = 4, "2025-03-01", 80
+            store.put(renamed, now=time.time() - 365 * 86400)
+
+            repos = self._repos()
+            repos[1].backoff = ["metadata"]
+            rest = Mock(status_code=200, headers={})
+            rest.json.return_value = {"stargazers_count": 1, "pushed_at": ""}
+            with patch.dict(os.environ, {"GITHUB_TOKEN": ""}), patch(
+                "scripts.bof_indexer.requests.get", return_value=rest
+            ) as get:
+                enrich_repo_metadata(repos, max_workers=1, store=store)
+
+            get.assert_called_once()
+            self.assertEqual((repos[1].stars, repos[1].last_updated, repos[1].size_kb),
+                             (4, "2025-03-01", 80))
+            self.assertEqual(repos[1].metadata_source, "store")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scripts.http_cache import HTTPCache
+
+
+class _ETagHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        etag = f'"{self.path}"'
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/moved":
+            self.send_response(302)
+            self.send_header("Location", "/repos/a/b")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = json.dumps({"path": self.path, "pad": "x" * 200}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTPCacheTests(unittest.TestCase):
+    def setUp(self):
+        _ETagHandler.requests_seen = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _ETagHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._tmp.cleanup()
+
+    def test_revalidates_with_etag_and_serves_304_from_cache(self):
+        cache = HTTPCache(self._tmp.name)
+
+        first = cache.get(f"{self.base}/repos/a/b", headers={"Accept": "application/json"})
+        second = cache.get(f"{self.base}/repos/a/b", headers={"Accept": "application/json"})
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(_ETagHandler.requests_seen[1], ("/repos/a/b", '"/repos/a/b"'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertIn("1/2 requests served from cache", cache.summary())
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = HTTPCache(self._tmp.name, max_bytes=1000)
+
+        for name in ("one", "two", "three", "four"):
+            cache.get(f"{self.base}/{name}")
+
+        self.assertGreater(cache.evicted, 0)
+        cache.get(f"{self.base}/four")
+        self.assertEqual(cache.hits, 1)
+        cache.get(f"{self.base}/one")
+        self.assertEqual(_ETagHandler.requests_seen[-1], ("/one", None))
+
+    def test_entry_whose_body_was_evicted_is_refetched_in_full(self):
+        cache = HTTPCache(self._tmp.name)
+        first = cache.get(f"{self.base}/repos/a/b")
+        _, body_path = cache._paths(cache._key("GET", f"{self.base}/repos/a/b", {}, None))
+        # Simulate another process evicting the body between _load and the 304
+        real_load = cache._load
+
+        def load_then_evict(key):
+            entry = real_load(key)
+            body_path.unlink()
+            return entry
+        cache._load = load_then_evict
+
+        second = cache.get(f"{self.base}/repos/a/b")
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(_ETagHandler.requests_seen[1:],
+                         [("/repos/a/b", '"/repos/a/b"'), ("/repos/a/b", None)])
+        self.assertEqual(cache.hits, 0)
+        self.assertTrue(body_path.exists())
+
+    def test_redirect_handling_is_part_of_the_key(self):
+        url = f"{self.base}/repos/a/b"
+        self.assertNotEqual(HTTPCache._key("HEAD", url, {}, None, True),
+                            HTTPCache._key("HEAD", url, {}, None, False))
+
+    def test_get_passes_allow_redirects_through(self):
+        cache = HTTPCache(self._tmp.name)
+
+        response = cache.get(f"{self.base}/moved", allow_redirects=False)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([path for path, _ in _ETagHandler.requests_seen], ["/moved"])
+
+    def test_authenticated_response_is_not_served_without_the_credential(self):
+        cache = HTTPCache(self._tmp.name)
+        url = f"{self.base}/repos/a/b"
+
+        cache.get(url, headers={"Authorization": "token secret"})
+        cache.get(url)
+
+        self.assertEqual(_ETagHandler.requests_seen[1], ("/repos/a/b", None))
+        self.assertEqual(cache.hits, 0)
+        self.assertNotEqual(HTTPCache._key("GET", url, {"authorization": "token one"}, None),
+                            HTTPCache._key("GET", url, {"Authorization": "token two"}, None))
+
+
+if __name__ == "__main__":
+    unittest.main()